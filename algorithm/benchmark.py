@@ -0,0 +1,268 @@
+"""
+Benchmarks for the matching algorithm on synthetic cohorts.
+
+Cohorts are generated from a seed so every run sees the same students,
+opportunities and rankings. Each benchmark records the wall time, the peak
+memory reported by tracemalloc and the number of proposals made, and the result
+is checked for blocking pairs.
+
+The counters of a seeded run (proposals, matched and unmatched students) are
+the same on every machine and are kept in the committed benchmark_baseline.json,
+which the tests compare exactly. Wall time and peak memory depend on the
+machine, they are saved to the untracked benchmark_timings.json and only
+compared by the command line.
+
+Run from the project root:
+    python -m algorithm.benchmark            # compare against the baselines
+    python -m algorithm.benchmark --save     # write new baselines
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from algorithm.matching import Matching
+from algorithm.stability import verify_matching
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+TIMINGS_PATH = os.path.join(os.path.dirname(__file__), "benchmark_timings.json")
+
+# Results that are the same for a seed on every machine, compared exactly
+COUNTERS = ("proposals", "matched", "unmatched")
+# Results that depend on the machine, compared with a tolerance
+MEASUREMENTS = ("wall_time", "peak_memory")
+
+# (students, opportunities, preferences per student)
+DEFAULT_SIZES = [
+    (2000, 300, 5),
+    (2000, 300, 10),
+    (10000, 1500, 5),
+    (10000, 1500, 10),
+    (50000, 8000, 5),
+]
+
+# Allowed slowdown before a run is reported as a regression
+TIME_TOLERANCE = 1.5
+MEMORY_TOLERANCE = 1.25
+# Timings below this many seconds are too noisy to compare
+MIN_COMPARABLE_SECONDS = 0.05
+
+
+def _uuid(rng: random.Random) -> str:
+    """Generate a uuid4 style hex string from the given generator."""
+    return f"{rng.getrandbits(128):032x}"
+
+
+def generate_cohort(
+    num_students: int,
+    num_opportunities: int,
+    preferences_per_student: int,
+    seed: int = 0,
+    max_spots: int = 10,
+    employer_rank_density: float = 1.0,
+) -> Tuple[Dict[str, List[str]], Dict[str, Dict[str, int]]]:
+    """Generate a seeded cohort in the shape the matching route builds.
+
+    Opportunities have between 1 and max_spots spots available and some are far
+    more popular than others. Each student ranks preferences_per_student distinct
+    opportunities and each employer ranks employer_rank_density of the students
+    that ranked their opportunity.
+
+    Returns:
+        tuple: (students_preference, opportunities_preference)
+    """
+    rng = random.Random(seed)
+    opportunity_ids = [_uuid(rng) for _ in range(num_opportunities)]
+    student_ids = [_uuid(rng) for _ in range(num_students)]
+    # Zipf like popularity so a few placements attract most of the applicants
+    weights = [1 / (i + 1) ** 0.8 for i in range(num_opportunities)]
+    rng.shuffle(weights)
+    preferences_per_student = min(preferences_per_student, num_opportunities)
+
+    students_preference: Dict[str, List[str]] = {}
+    applicants: Dict[str, List[str]] = {opp: [] for opp in opportunity_ids}
+    for student in student_ids:
+        chosen: List[str] = []
+        seen = set()
+        while len(chosen) < preferences_per_student:
+            for opp in rng.choices(opportunity_ids, weights=weights, k=4):
+                if opp not in seen and len(chosen) < preferences_per_student:
+                    seen.add(opp)
+                    chosen.append(opp)
+        students_preference[student] = chosen
+        for opp in chosen:
+            applicants[opp].append(student)
+
+    opportunities_preference: Dict[str, Dict[str, int]] = {}
+    for opp in opportunity_ids:
+        ranked = applicants[opp]
+        rng.shuffle(ranked)
+        ranked = ranked[: int(len(ranked) * employer_rank_density)]
+        temp: Dict[str, int] = {"positions": rng.randint(1, max_spots)}
+        for i, student in enumerate(ranked):
+            temp[student] = i + 1
+        opportunities_preference[opp] = temp
+
+    return students_preference, opportunities_preference
+
+
+def benchmark_key(num_students, num_opportunities, preferences_per_student):
+    """Key identifying a benchmark size in the baseline file."""
+    return f"{num_students}x{num_opportunities}x{preferences_per_student}"
+
+
+def run_benchmark(
+    num_students: int,
+    num_opportunities: int,
+    preferences_per_student: int,
+    seed: int = 0,
+    employer_rank_density: float = 1.0,
+) -> Dict[str, float]:
+    """Run the matching on a generated cohort and collect its measurements.
+
+    The timed run and the tracemalloc run are separate so tracing does not
+    inflate the wall time.
+    """
+    students, opportunities = generate_cohort(
+        num_students,
+        num_opportunities,
+        preferences_per_student,
+        seed,
+        employer_rank_density=employer_rank_density,
+    )
+
+    match = Matching(students, opportunities)
+    start_time = time.perf_counter()
+    unmatched, matches = match.find_best_match()
+    wall_time = time.perf_counter() - start_time
+
+    tracemalloc.start()
+    Matching(students, opportunities).find_best_match()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start_time = time.perf_counter()
+    report = verify_matching(students, opportunities, matches)
+    verify_time = time.perf_counter() - start_time
+
+    return {
+        "students": num_students,
+        "opportunities": num_opportunities,
+        "preferences_per_student": preferences_per_student,
+        "seed": seed,
+        "employer_rank_density": employer_rank_density,
+        "wall_time": wall_time,
+        "peak_memory": peak_memory,
+        "proposals": match.proposals,
+        "matched": sum(len(students) for students in matches.values()),
+        "unmatched": len(unmatched),
+        "verify_time": verify_time,
+        "stable": report["stable"],
+    }
+
+
+def run_benchmarks(sizes=None, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    """Run every benchmark size and return the results keyed by size."""
+    results = {}
+    for size in sizes or DEFAULT_SIZES:
+        results[benchmark_key(*size)] = run_benchmark(*size, seed=seed)
+    return results
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Dict[str, float]]:
+    """Load a saved baseline, returns an empty dict if there is none."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_baseline(results, path: str = BASELINE_PATH, fields=COUNTERS):
+    """Merge the given fields of the results into a baseline file."""
+    baseline = load_baseline(path)
+    for key, result in results.items():
+        baseline[key] = {field: result[field] for field in fields}
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(baseline, file, indent=4, sort_keys=True)
+
+
+def compare_to_baseline(result, baseline_result) -> List[str]:
+    """Compare a single result with its baseline.
+
+    The counters must be equal when the baseline is for the same seed, the
+    measurements are only compared when the baseline has them.
+
+    Returns:
+        list: Human readable descriptions of every regression found.
+    """
+    regressions = []
+    if baseline_result.get("seed", result["seed"]) == result["seed"]:
+        regressions = [
+            f"{counter} {baseline_result[counter]} -> {result[counter]}"
+            for counter in COUNTERS
+            if counter in baseline_result
+            and result[counter] != baseline_result[counter]
+        ]
+    if (
+        "wall_time" in baseline_result
+        and result["wall_time"] > MIN_COMPARABLE_SECONDS
+        and result["wall_time"] > baseline_result["wall_time"] * TIME_TOLERANCE
+    ):
+        regressions.append(
+            f"wall time {baseline_result['wall_time']:.3f}s -> "
+            f"{result['wall_time']:.3f}s"
+        )
+    if (
+        "peak_memory" in baseline_result
+        and result["peak_memory"] > baseline_result["peak_memory"] * MEMORY_TOLERANCE
+    ):
+        regressions.append(
+            f"peak memory {baseline_result['peak_memory']} -> "
+            f"{result['peak_memory']} bytes"
+        )
+    return regressions
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark the matching algorithm")
+    parser.add_argument("--save", action="store_true", help="write a new baseline")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--timings", default=TIMINGS_PATH)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(seed=args.seed)
+    baseline = load_baseline(args.baseline)
+    timings = load_baseline(args.timings)
+    failed = False
+    for key, result in results.items():
+        print(
+            f"{key}: {result['wall_time']:.3f}s, "
+            f"{result['peak_memory'] / 1024 / 1024:.1f}MB peak, "
+            f"{result['proposals']} proposals, {result['unmatched']} unmatched, "
+            f"verified in {result['verify_time']:.3f}s"
+        )
+        if not result["stable"]:
+            failed = True
+            print("  UNSTABLE matching")
+        if not args.save:
+            expected = {**timings.get(key, {}), **baseline.get(key, {})}
+            for regression in compare_to_baseline(result, expected):
+                failed = True
+                print(f"  REGRESSION {regression}")
+
+    if args.save:
+        save_baseline(results, args.baseline, ("seed", *COUNTERS))
+        save_baseline(results, args.timings, MEASUREMENTS)
+        print(f"Baselines saved to {args.baseline} and {args.timings}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,9 +2,97 @@
 The matching algorithm is a stable marriage algorithm that matches students
 to placements based on their preferences. The algorithm is implemented in the
 `Matching` class. The `find_best_match` method finds the best match for students and placements.
+
+Free students are kept in a deque, each student keeps a cursor into their own
+preference list instead of popping from it, and each placement keeps a max-heap
+of its current matches keyed by the employer's rank so the weakest match can be
+found and evicted in O(log capacity).
+
+Every proposal and eviction is logged per placement so that when a single
+preference list changes, `update` can undo only the proposals whose outcome
+depended on it and resume the algorithm from there. The result is the same student optimal
+matching a full rerun would give. If too much would have to be undone the
+matching is simply rerun.
+
+A `MatchingStats` collector can be attached to count proposals, rejections,
+evictions and the proposals each placement received, and to time the phases
+of the last run. It is off by default.
 """
 
-from typing import List, Dict, Tuple
+from collections import deque
+import contextlib
+import heapq
+import time
+from typing import Deque, Iterator, List, Dict, Optional, Set, Tuple
+
+from algorithm.stability import verify_matching
+
+# Share of students that can be rolled back before a full rerun is cheaper
+REPAIR_LIMIT = 0.01
+
+# Phases timed by MatchingStats, in the order they run
+PHASES = ("build_input", "solve", "build_result")
+
+
+class MatchingStats:
+    """Counters and phase timings of the last matching run or repair."""
+
+    def __init__(self):
+        self.mode = ""
+        self.proposals = 0
+        # Proposals turned down straight away, not counting evictions
+        self.rejections = 0
+        self.evictions = 0
+        # Proposals received per placement
+        self.contention: Dict[str, int] = {}
+        # Seconds spent in each phase
+        self.phases: Dict[str, float] = {}
+
+    def reset(self, mode: str):
+        """Clear the counters before a full run ("full") or a repair ("repair")."""
+        self.mode = mode
+        self.proposals = 0
+        self.rejections = 0
+        self.evictions = 0
+        self.contention = {}
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Add the time spent in the block to a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (
+                time.perf_counter() - start
+            )
+
+    def to_dict(self, top: Optional[int] = None) -> dict:
+        """Export the stats as plain data.
+
+        Args:
+            top: Only keep this many of the most contended placements
+        """
+        contention = sorted(
+            self.contention.items(), key=lambda item: item[1], reverse=True
+        )
+        if top is not None:
+            contention = contention[:top]
+        return {
+            "mode": self.mode,
+            "proposals": self.proposals,
+            "rejections": self.rejections,
+            "evictions": self.evictions,
+            "placements_proposed_to": len(self.contention),
+            "max_contention": max(self.contention.values(), default=0),
+            "contention": [
+                {"placement": placement, "proposals": proposals}
+                for placement, proposals in contention
+            ],
+            "phases": {name: self.phases.get(name, 0.0) for name in PHASES},
+            "total_time": sum(self.phases.values()),
+        }
 
 
 class Matching:
@@ -14,8 +102,10 @@ class Matching:
         self,
         student_rank: Dict[str, List[str]],
         placement_rank: Dict[str, Dict[str, int]],
+        validate: bool = False,
+        stats: bool = False,
     ):
-        # Students' preferences
+        # Students' preferences, never modified by the matching
         self.student_rank = student_rank
         # Employers' rankings, includes "positions" key
         self.placement_rank = placement_rank
@@ -23,110 +113,497 @@ class Matching:
         self.potential_match: Dict[str, List[str]] = {}
         # To store the final matches (Unmatched, Matched)
         self.final_result: Tuple[List[str], Dict[str, List[str]]] = ([], {})
+        # Number of proposals made in the last run
+        self.proposals = 0
+        # Check every result for blocking pairs, report of the last check
+        self.validate = validate
+        self.validation: Optional[Dict[str, list]] = None
+        # Counters and timings of the last run, None when not collected
+        self.stats: Optional[MatchingStats] = MatchingStats() if stats else None
+
+        # State kept from the last run so it can be repaired by `update`
+        self._has_run = False
+        self._owns_input = False
+        self._next_choice: Dict[str, int] = {}
+        self._assigned: Dict[str, str] = {}
+        self._unmapped: Dict[str, None] = {}
+        self._capacity: Dict[str, int] = {}
+        # Per placement max-heap of (-employer rank, slot index) of current matches
+        self._placement_heap: Dict[str, List[Tuple[int, int]]] = {}
+        self._step = 0
+        # Per placement log of (step, student, evicted) in the order they happened
+        self._events: Dict[str, List[Tuple[int, str, bool]]] = {}
+
+    @classmethod
+    def residual(
+        cls,
+        first_round: Tuple[List[str], Dict[str, List[str]]],
+        student_rank: Dict[str, List[str]],
+        placement_rank: Dict[str, Dict[str, int]],
+        validate: bool = False,
+    ) -> "Matching":
+        """Create a second round matching from a frozen first round result.
+
+        Only the students left unmatched take part, against the placements
+        with positions left, so the work depends on what is left over rather
+        than the whole cohort.
+
+        Args:
+            first_round: (unmatched, matches) result of the first round
+            student_rank: Students' preferences for the second round
+            placement_rank: Employers' rankings, "positions" is the total
+                number of positions including the ones filled in the first round
+        """
+        unmatched, matches = first_round
+        residual_placements: Dict[str, Dict[str, int]] = {}
+        residual_students: Dict[str, List[str]] = {}
+        full: Set[str] = set()
+        for student in unmatched:
+            preferences = []
+            for placement in student_rank.get(student, []):
+                ranking = placement_rank.get(placement)
+                if ranking is None or student not in ranking or placement in full:
+                    continue
+                if placement not in residual_placements:
+                    left = int(ranking["positions"]) - len(matches.get(placement, []))
+                    if left <= 0:
+                        full.add(placement)
+                        continue
+                    residual_placements[placement] = {"positions": left}
+                residual_placements[placement][student] = ranking[student]
+                preferences.append(placement)
+            residual_students[student] = preferences
+        return cls(residual_students, residual_placements, validate)
 
     def find_best_match(self) -> Tuple[List[str], Dict[str, List[str]]]:
         """Find the best match for students and placements."""
-        students = list(self.student_rank.keys())  # List of unmatched students
-        unmapped = []  # List of students who cannot be matched (no more preferences)
-        # Keep track of employers' current engagements
-        placement_current_match: Dict[str, List[str]] = {
-            placement: [] for placement in self.placement_rank.keys()
+        if self.stats is not None:
+            self.stats.reset("full")
+        return self._run()
+
+    def _phase(self, name: str):
+        """Time a phase if stats are collected."""
+        if self.stats is None:
+            return contextlib.nullcontext()
+        return self.stats.phase(name)
+
+    def _run(self) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Run the matching from scratch."""
+        with self._phase("build_input"):
+            self._reset_state()
+        with self._phase("solve"):
+            self._propose(deque(self.student_rank.keys()))
+        with self._phase("build_result"):
+            return self._build_result()
+
+    def _reset_state(self):
+        """Clear the state of the last run."""
+        self._next_choice = dict.fromkeys(self.student_rank, 0)
+        self._assigned = {}
+        self._unmapped = {}  # Students who cannot be matched (no more preferences)
+        self._capacity = {
+            placement: int(ranking["positions"])
+            for placement, ranking in self.placement_rank.items()
+        }
+        self._placement_heap = {}
+        self._step = 0
+        self._events = {}
+        self.potential_match = {}
+        self.proposals = 0
+        self._has_run = True
+
+    def get_matches(self) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Get final result."""
+        return self.final_result
+
+    def update(
+        self,
+        student_rank: Dict[str, List[str]],
+        placement_rank: Dict[str, Dict[str, int]],
+    ) -> Tuple[Set[str], Set[str]]:
+        """Repair the last matching for new preferences.
+
+        Only students and placements whose preferences differ from the last
+        run are repaired. Runs a full matching if there is no previous run.
+
+        Returns:
+            tuple: (students whose match changed, placements whose matches changed)
+        """
+        if not self._has_run:
+            self.student_rank = student_rank
+            self.placement_rank = placement_rank
+            self.find_best_match()
+            return set(self._assigned), set(self.potential_match)
+
+        student_changes: Dict[str, Optional[List[str]]] = {
+            student: preferences
+            for student, preferences in student_rank.items()
+            if self.student_rank.get(student) != preferences
+        }
+        for student in self.student_rank:
+            if student not in student_rank:
+                student_changes[student] = None
+
+        placement_changes: Dict[str, Optional[Dict[str, int]]] = {
+            placement: ranking
+            for placement, ranking in placement_rank.items()
+            if self.placement_rank.get(placement) != ranking
         }
+        for placement in self.placement_rank:
+            if placement not in placement_rank:
+                placement_changes[placement] = None
+
+        return self._repair(student_changes, placement_changes)
+
+    def update_student_preferences(
+        self, student: str, preferences: Optional[List[str]]
+    ) -> Tuple[Set[str], Set[str]]:
+        """Repair the last matching after one student's preferences changed.
+
+        Passing None removes the student from the matching.
+        """
+        return self._repair({student: preferences}, {})
+
+    def update_placement_preferences(
+        self, placement: str, ranking: Optional[Dict[str, int]]
+    ) -> Tuple[Set[str], Set[str]]:
+        """Repair the last matching after one placement's ranking changed.
 
-        # print("Initial state:")
-        # print(f"Students: {students}")
-        # print(f"Employers' current matches: {placement_current_match}")
+        The ranking includes the "positions" key. Passing None removes the
+        placement from the matching.
+        """
+        return self._repair({}, {placement: ranking})
 
-        while students:
-            student = students.pop(0)  # Pick the next unmatched student
-            # print(f"\nProcessing student: {student}")
+    def _propose(
+        self,
+        free_students: Deque[str],
+        touched: Optional[Dict[str, object]] = None,
+        resumed: Optional[Set[str]] = None,
+    ):
+        """Run proposals until every free student is matched or out of choices.
+
+        Students evicted along the way are recorded in touched with the
+        placement they held before. Students in resumed repeat a proposal that
+        is still logged, so only its new outcome is logged.
+        """
+        events = self._events
+        resumed = resumed if resumed is not None else set()
+        stats = self.stats
+        contention = stats.contention if stats is not None else None
+        proposals = self.proposals
+        rejections = 0
+        evictions = 0
+        while free_students:
+            student = free_students.popleft()
+            preferences = self.student_rank[student]
+            cursor = self._next_choice[student]
 
-            if not self.student_rank[student]:  # If student has no more preferences
-                # print(f"Student {student} has no more preferences and is unmapped.")
-                unmapped.append(student)
+            if cursor >= len(preferences):  # If student has no more preferences
+                self._unmapped[student] = None
                 continue
 
-            choice = self.student_rank[student].pop(0)
-            # print(f"{student} prefers placement: {choice}")
+            choice = preferences[cursor]
+            self._next_choice[student] = cursor + 1
+            self.proposals += 1
+            self._step += 1
+            if contention is not None:
+                contention[choice] = contention.get(choice, 0) + 1
+            log = events.setdefault(choice, [])
+            repeated = student in resumed
+            if repeated:
+                resumed.discard(student)
+            else:
+                log.append((self._step, student, False))
+
+            ranking = self.placement_rank.get(choice)
+            if ranking is None or student not in ranking:
+                # Not ranked by the employer, try the next preference
+                rejections += 1
+                free_students.appendleft(student)
+                continue
 
-            # Check current matches of the chosen employer
-            current_matches = placement_current_match[choice]
-            positions = int(self.placement_rank[choice]["positions"])
+            rank = ranking[student]
+            heap = self._placement_heap.setdefault(choice, [])
+            slots = self.potential_match.get(choice, [])
 
             # If there are positions available, add the student
-            if (
-                len(current_matches) < positions
-                and student in self.placement_rank[choice]
-            ):
-                # print(f"{choice} has available positions. Adding {student}.")
-                placement_current_match[choice].append(student)
-                self.potential_match[choice] = placement_current_match[choice]
+            if len(slots) < self._capacity[choice]:
+                heapq.heappush(heap, (-rank, len(slots)))
+                slots.append(student)
+                self.potential_match[choice] = slots
+                self._assigned[student] = choice
+                continue
 
+            # If new student is ranked higher (lower number), replace the weakest match
+            if heap and rank < -heap[0][0]:
+                slot = heap[0][1]
+                heapq.heapreplace(heap, (-rank, slot))
+                evicted = slots[slot]
+                evictions += 1
+                if touched is not None:
+                    touched.setdefault(evicted, choice)
+                log.append((self._step, evicted, True))
+                del self._assigned[evicted]
+                free_students.appendleft(evicted)
+                slots[slot] = student
+                self._assigned[student] = choice
             else:
-                # print(f"{choice} is full or {student} is not ranked by the employer.")
-                if current_matches:
-                    # print(f"Current matches at {choice}: {current_matches}")
-
-                    # Find the weakest match using the employer's ranking
-                    weakest_match = current_matches[-1]  # Get the least preferred match
-                    weakest_match_rank = self.placement_rank[choice][weakest_match]
-                    index = len(current_matches) - 1
-
-                    for match in current_matches:
-                        if self.placement_rank[choice][match] > weakest_match_rank:
-                            weakest_match = match
-                            weakest_match_rank = self.placement_rank[choice][match]
-                            index = current_matches.index(weakest_match)
-
-                    # Check if the student is in the employer's ranking
-                    if student in self.placement_rank[choice]:
-                        new_candidate_rank = self.placement_rank[choice][student]
-                        # print(
-                        #     f"Comparing {student} (rank {new_candidate_rank}) with
-                        # weakest match {weakest_match} (rank {weakest_match_rank})."
-                        # )
-
-                        # If new student is ranked higher (lower number), replace the weakest match
-                        if new_candidate_rank < weakest_match_rank:
-                            # print(
-                            #     f"{student} is ranked higher than {weakest_match}. Replacing."
-                            # )
-                            placement_current_match[choice][
-                                index
-                            ] = student  # Replace weakest match
-                            self.potential_match[choice] = placement_current_match[
-                                choice
-                            ]
-                            students.insert(
-                                0, weakest_match
-                            )  # Re-add the replaced student to the unmatched list
-                        else:
-                            # print(
-                            #     f"{student} is ranked lower than {weakest_match}. Rejected."
-                            # )
-                            students.insert(
-                                0, student
-                            )  # Add student back to the unmatched list
-                    else:
-                        # print(f"{student} is not ranked by {choice}. Rejected.")
-                        students.insert(
-                            0, student
-                        )  # Re-add student to the unmatched list
-                else:
-                    # print(
-                    # f"{choice} has no current matches. {student} has not been ranked by {choice}."
-                    # )
-                    students.insert(0, student)
-
-        self.final_result = (unmapped, self.potential_match)
-        # print("\nFinal result:")
-        # print(f"Unmapped students: {self.final_result[0]}")
-        # print(f"Matched students: {self.final_result[1]}")
-        return self.final_result
+                if repeated:
+                    log.append((self._step, student, True))
+                rejections += 1
+                free_students.appendleft(student)
 
-    def get_matches(self) -> Tuple[List[str], Dict[str, List[str]]]:
-        """Get final result."""
-        # print("\nReturning final matches:")
-        # print(f"Unmapped: {self.final_result[0]}")
-        # print(f"Matched: {self.final_result[1]}")
+        if stats is not None:
+            stats.proposals += self.proposals - proposals
+            stats.rejections += rejections
+            stats.evictions += evictions
+
+    def _position(self, student: str, placement: str) -> int:
+        """Index of a placement in a student's preference list."""
+        return self.student_rank[student].index(placement)
+
+    def _rollback_closure(
+        self,
+        student_changes: Dict[str, Optional[List[str]]],
+        placement_changes: Dict[str, Optional[Dict[str, int]]],
+    ) -> Optional[Dict[str, int]]:
+        """Find every student whose proposals must be redone.
+
+        A rejection stays valid while the placement still has at least as many
+        better ranked proposals made before it as positions. Proposals are only
+        counted if they are kept or about to be repeated, and only earlier ones
+        so two rejections can never justify each other. When a student's
+        proposals are undone each placement they proposed to is checked again,
+        and the first rejection there that is no longer justified is undone too,
+        until nothing changes.
+
+        Returns:
+            dict: student -> index in their preferences to resume from, -1 for
+            students whose own preferences changed, or None if more than
+            REPAIR_LIMIT of the students would have to be rolled back
+        """
+        rolled: Dict[str, int] = {}
+        dirty: Set[str] = set()
+        limit = max(len(self._next_choice) * REPAIR_LIMIT, len(student_changes))
+
+        def roll(student: str, index: int):
+            if student in rolled:
+                if index >= rolled[student]:
+                    return
+                # The proposal that was going to be repeated is undone too
+                end = rolled[student] + 1
+            else:
+                end = self._next_choice[student]
+                if index >= end:
+                    return
+            rolled[student] = index
+            dirty.update(self.student_rank[student][max(index, 0) : end])
+
+        for student in student_changes:
+            if student in self._next_choice:
+                roll(student, -1)
+        for placement in placement_changes:
+            for _, student, _ in self._events.get(placement, []):
+                roll(student, self._position(student, placement))
+
+        while dirty:
+            if len(rolled) > limit:
+                return None
+            placement = dirty.pop()
+            ranking = self.placement_rank.get(placement)
+            capacity = self._capacity.get(placement, 0)
+            if ranking is None or placement in placement_changes or not capacity:
+                continue
+            log = self._events.get(placement, [])
+            evicted_here = {student for _, student, evicted in log if evicted}
+            # Max-heap of the best ranks proposed so far, at most capacity long
+            best: List[int] = []
+            for _, student, evicted in log:
+                if student in student_changes or student not in ranking:
+                    continue
+                position = self._position(student, placement)
+                index = rolled.get(student, self._next_choice[student])
+                if index < position or (index == position and evicted):
+                    continue
+                rank = ranking[student]
+                rejected_now = index > position and (
+                    evicted
+                    or (
+                        student not in evicted_here
+                        and self._assigned.get(student) != placement
+                    )
+                )
+                if rejected_now and (len(best) < capacity or -best[0] >= rank):
+                    roll(student, position)
+                if not evicted:
+                    if len(best) < capacity:
+                        heapq.heappush(best, -rank)
+                    elif rank < -best[0]:
+                        heapq.heapreplace(best, -rank)
+            # Students rolled back to this placement still count as proposing here
+            dirty.discard(placement)
+        return rolled
+
+    def _repair(
+        self,
+        student_changes: Dict[str, Optional[List[str]]],
+        placement_changes: Dict[str, Optional[Dict[str, int]]],
+    ) -> Tuple[Set[str], Set[str]]:
+        """Undo the proposals affected by the changes and resume matching."""
+        if self.stats is not None:
+            self.stats.reset("repair")
+        with self._phase("build_input"):
+            rolled = self._rollback(student_changes, placement_changes)
+        if rolled is None:
+            return self._rerun(student_changes, placement_changes)
+        touched, rolled, resumed = rolled
+
+        with self._phase("solve"):
+            self._propose(deque(rolled), touched, resumed)
+        with self._phase("build_result"):
+            self._build_result()
+
+        changed_students = set()
+        changed_placements = set()
+        for student, before in touched.items():
+            after = self._assigned.get(student)
+            if before != after:
+                changed_students.add(student)
+                changed_placements.update(
+                    placement for placement in (before, after) if placement is not None
+                )
+        return changed_students, changed_placements
+
+    def _rollback(
+        self,
+        student_changes: Dict[str, Optional[List[str]]],
+        placement_changes: Dict[str, Optional[Dict[str, int]]],
+    ) -> Optional[Tuple[Dict[str, object], Dict[str, int], Set[str]]]:
+        """Undo the affected proposals and apply the changes.
+
+        Returns:
+            tuple: (students freed with the placement they held, their
+            preference cursors, students repeating a logged proposal), or None
+            if the matching should be rerun instead
+        """
+        if not self._owns_input:
+            # Copy so the caller's dicts are never modified
+            self.student_rank = dict(self.student_rank)
+            self.placement_rank = dict(self.placement_rank)
+            self._owns_input = True
+
+        rolled = self._rollback_closure(student_changes, placement_changes)
+        if rolled is None:
+            return None
+
+        # Forget the undone proposals and free the students. The first undone
+        # proposal of a student is repeated, so it stays logged without its outcome
+        touched: Dict[str, object] = {}
+        purge: Dict[str, Set[str]] = {}
+        repeat: Dict[str, Set[str]] = {}
+        resumed: Set[str] = set()
+        for student, index in rolled.items():
+            touched[student] = self._assigned.pop(student, None)
+            self._unmapped.pop(student, None)
+            preferences = self.student_rank[student]
+            start = max(index, 0)
+            if index >= 0 and preferences[index] not in placement_changes:
+                repeat.setdefault(preferences[index], set()).add(student)
+                resumed.add(student)
+                start += 1
+            index = max(index, 0)
+            for position in range(start, self._next_choice[student]):
+                purge.setdefault(preferences[position], set()).add(student)
+            self._next_choice[student] = index
+            rolled[student] = index
+        for placement in purge.keys() | repeat.keys():
+            students = purge.get(placement, set())
+            repeated = repeat.get(placement, set())
+            self._events[placement] = [
+                event
+                for event in self._events[placement]
+                if event[1] not in students and not (event[2] and event[1] in repeated)
+            ]
+            students = students | repeated
+            slots = self.potential_match.get(placement)
+            if slots is not None:
+                self._set_slots(
+                    placement, [student for student in slots if student not in students]
+                )
+
+        for placement, ranking in placement_changes.items():
+            self._events.pop(placement, None)
+            if ranking is None:
+                self.placement_rank.pop(placement, None)
+                self._capacity.pop(placement, None)
+            else:
+                self.placement_rank[placement] = ranking
+                self._capacity[placement] = int(ranking["positions"])
+
+        for student, preferences in student_changes.items():
+            touched.setdefault(student, None)
+            if preferences is None:
+                self.student_rank.pop(student, None)
+                self._next_choice.pop(student, None)
+                rolled.pop(student, None)
+                continue
+            self.student_rank[student] = preferences
+            self._next_choice[student] = 0
+            rolled[student] = 0
+            resumed.discard(student)
+        return touched, rolled, resumed
+
+    def _rerun(
+        self,
+        student_changes: Dict[str, Optional[List[str]]],
+        placement_changes: Dict[str, Optional[Dict[str, int]]],
+    ) -> Tuple[Set[str], Set[str]]:
+        """Apply the changes and run the matching from scratch."""
+        if self.stats is not None:
+            self.stats.mode = "rerun"
+        for placement, ranking in placement_changes.items():
+            if ranking is None:
+                self.placement_rank.pop(placement, None)
+            else:
+                self.placement_rank[placement] = ranking
+        for student, preferences in student_changes.items():
+            if preferences is None:
+                self.student_rank.pop(student, None)
+            else:
+                self.student_rank[student] = preferences
+
+        before = self._assigned
+        self._run()
+        changed_students = set()
+        changed_placements = set()
+        for student in before.keys() | self._assigned.keys():
+            if before.get(student) != self._assigned.get(student):
+                changed_students.add(student)
+                changed_placements.update(
+                    placement
+                    for placement in (before.get(student), self._assigned.get(student))
+                    if placement is not None
+                )
+        return changed_students, changed_placements
+
+    def _set_slots(self, placement: str, slots: List[str]):
+        """Replace the matches of a placement and rebuild its heap."""
+        ranking = self.placement_rank[placement]
+        self.potential_match[placement] = slots
+        heap = [(-ranking[student], slot) for slot, student in enumerate(slots)]
+        heapq.heapify(heap)
+        self._placement_heap[placement] = heap
+
+    def _build_result(self) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Store and return the (unmatched, matches) result."""
+        self.potential_match = {
+            placement: slots
+            for placement, slots in self.potential_match.items()
+            if slots
+        }
+        self.final_result = (list(self._unmapped), self.potential_match)
+        if self.validate:
+            self.validation = verify_matching(
+                self.student_rank, self.placement_rank, self.potential_match
+            )
         return self.final_result
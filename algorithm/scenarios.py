@@ -0,0 +1,251 @@
+"""
+What-if scenarios for the matching.
+
+A scenario is a list of perturbations applied to a base snapshot of the
+students' preferences and the opportunities' rankings, capacities and required
+modules. Every scenario is matched in its own process and summarised, so
+admins can compare the effect of changes without editing live data.
+
+The base snapshot is built from the same matching input as the matching runs,
+so the unchanged "base" scenario gives the same matching as the matching page.
+
+Snapshot format:
+    {
+        "students": {student: {"preferences": [...], "modules": [...]}},
+        "opportunities": {
+            opportunity: {"positions": int, "ranking": [...], "modules_required": [...]}
+        },
+    }
+
+Perturbations:
+    {"type": "positions", "opportunity": id, "change": int}
+    {"type": "add_module", "opportunity": id, "module": module}
+    {"type": "drop_module", "opportunity": id, "module": module}
+    {"type": "remove_opportunity", "opportunity": id}
+
+Students can only rank opportunities whose required modules they have, so the
+preferences already respect the current requirements. Adding a module removes
+the opportunity from the preferences of the students without it. Dropping a
+module can only undo a module added earlier in the same scenario, a module the
+opportunity already requires is rejected as the students it would let in have
+not ranked the opportunity.
+
+Every student of the snapshot counts towards a scenario's totals, those left
+without preferences are unmatched.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import os
+from typing import Dict, List, Optional, Tuple
+
+from algorithm.matching import Matching
+
+PERTURBATION_TYPES = {"positions", "add_module", "drop_module", "remove_opportunity"}
+
+# Most processes used to run scenarios, whatever the CPU count
+MAX_WORKERS = 4
+
+# Snapshot shared by every scenario run in a worker process
+_worker_snapshot: Optional[dict] = None
+
+
+def validate_scenarios(snapshot: dict, scenarios: List[dict]):
+    """Check every scenario can be applied to the snapshot.
+
+    Raises:
+        ValueError: If a scenario or perturbation is malformed.
+    """
+    if not isinstance(scenarios, list):
+        raise ValueError("Scenarios must be a list")
+    for scenario in scenarios:
+        if not isinstance(scenario, dict) or not isinstance(scenario.get("name"), str):
+            raise ValueError("Every scenario needs a name")
+        name = scenario["name"]
+        perturbations = scenario.get("perturbations", [])
+        if not isinstance(perturbations, list):
+            raise ValueError(f"Perturbations must be a list in {name}")
+        # Opportunity -> modules added by the scenario so far
+        added_modules: Dict[str, set] = {}
+        for perturbation in perturbations:
+            if not isinstance(perturbation, dict):
+                raise ValueError(f"Every perturbation must be an object in {name}")
+            if perturbation.get("type") not in PERTURBATION_TYPES:
+                raise ValueError(
+                    f"Unknown perturbation type in {name}: {perturbation.get('type')}"
+                )
+            opportunity = perturbation.get("opportunity")
+            if (
+                not isinstance(opportunity, str)
+                or opportunity not in snapshot["opportunities"]
+            ):
+                raise ValueError(f"Unknown opportunity in {name}: {opportunity}")
+            change = perturbation.get("change")
+            if perturbation["type"] == "positions" and (
+                not isinstance(change, int) or isinstance(change, bool)
+            ):
+                raise ValueError(f"Positions change must be a number in {name}")
+            module = perturbation.get("module")
+            if perturbation["type"] in ("add_module", "drop_module") and (
+                not isinstance(module, str) or not module
+            ):
+                raise ValueError(f"Missing module in {name}")
+            added = added_modules.setdefault(opportunity, set())
+            if perturbation["type"] == "add_module" and module not in (
+                snapshot["opportunities"][opportunity]["modules_required"]
+            ):
+                added.add(module)
+            elif perturbation["type"] == "drop_module":
+                if module not in added:
+                    raise ValueError(
+                        f"Cannot drop {module} from {opportunity} in {name}, only "
+                        "a module added by the scenario can be dropped"
+                    )
+                added.discard(module)
+
+
+def apply_scenario(
+    snapshot: dict, scenario: dict
+) -> Tuple[Dict[str, List[str]], Dict[str, Dict[str, int]]]:
+    """Apply a scenario's perturbations and build the matching input.
+
+    Returns:
+        tuple: (students_preference, opportunities_preference)
+    """
+    opportunities = {
+        opportunity: {
+            "positions": data["positions"],
+            "modules_required": set(data["modules_required"]),
+            "added_modules": set(),
+        }
+        for opportunity, data in snapshot["opportunities"].items()
+    }
+    for perturbation in scenario.get("perturbations", []):
+        opportunity = opportunities.get(perturbation["opportunity"])
+        if opportunity is None:
+            continue
+        if perturbation["type"] == "positions":
+            opportunity["positions"] = max(
+                0, opportunity["positions"] + perturbation["change"]
+            )
+        elif perturbation["type"] == "add_module":
+            if perturbation["module"] not in opportunity["modules_required"]:
+                opportunity["added_modules"].add(perturbation["module"])
+        elif perturbation["type"] == "drop_module":
+            opportunity["added_modules"].discard(perturbation["module"])
+        elif perturbation["type"] == "remove_opportunity":
+            del opportunities[perturbation["opportunity"]]
+
+    students_preference = {}
+    for student, data in snapshot["students"].items():
+        modules = set(data["modules"])
+        preferences = [
+            opportunity
+            for opportunity in data["preferences"]
+            if opportunity in opportunities
+            and opportunities[opportunity]["added_modules"].issubset(modules)
+        ]
+        if preferences:
+            students_preference[student] = preferences
+
+    opportunities_preference = {}
+    for opportunity, data in opportunities.items():
+        temp = {"positions": data["positions"]}
+        for i, student in enumerate(snapshot["opportunities"][opportunity]["ranking"]):
+            temp[student] = i + 1
+        opportunities_preference[opportunity] = temp
+    return students_preference, opportunities_preference
+
+
+def summarise(
+    students_preference: Dict[str, List[str]],
+    matches: Dict[str, List[str]],
+    total: int,
+) -> dict:
+    """Summarise a matching for comparison between scenarios.
+
+    Args:
+        students_preference: The matching input of the scenario
+        matches: The resulting matches
+        total: Students in the snapshot, including those left without
+            preferences by the scenario
+    """
+    ranks = [
+        students_preference[student].index(opportunity) + 1
+        for opportunity, students in matches.items()
+        for student in students
+    ]
+    return {
+        "students": total,
+        "matched": len(ranks),
+        "unmatched": total - len(ranks),
+        "match_rate": len(ranks) / total if total else 0.0,
+        "average_rank": sum(ranks) / len(ranks) if ranks else None,
+        "assignments": {
+            student: opportunity
+            for opportunity, students in matches.items()
+            for student in students
+        },
+    }
+
+
+def run_scenario(scenario: dict, snapshot: Optional[dict] = None) -> dict:
+    """Match a single scenario, using the worker's snapshot if none is given."""
+    snapshot = snapshot if snapshot is not None else _worker_snapshot
+    students_preference, opportunities_preference = apply_scenario(snapshot, scenario)
+    _, matches = Matching(
+        students_preference, opportunities_preference
+    ).find_best_match()
+    result = summarise(students_preference, matches, len(snapshot["students"]))
+    result["name"] = scenario["name"]
+    return result
+
+
+def _init_worker(snapshot: dict):
+    """Keep the snapshot in the worker so it is only sent once per process."""
+    global _worker_snapshot  # pylint: disable=global-statement
+    _worker_snapshot = snapshot
+
+
+def run_scenarios(
+    snapshot: dict, scenarios: List[dict], max_workers: Optional[int] = None
+) -> List[dict]:
+    """Run the base snapshot and every scenario in a process pool.
+
+    The pool has max_workers processes, by default the CPU count up to
+    MAX_WORKERS, and never more than there are scenarios to run.
+
+    Returns:
+        list: One summary per scenario, starting with the unchanged "base"
+        scenario, with the difference to the base and the number of students
+        whose match changed.
+    """
+    validate_scenarios(snapshot, scenarios)
+    scenarios = [{"name": "base", "perturbations": []}] + copy.deepcopy(scenarios)
+    if max_workers is None:
+        max_workers = min(MAX_WORKERS, os.cpu_count() or 1)
+    max_workers = max(1, min(max_workers, len(scenarios)))
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(snapshot,)
+    ) as executor:
+        results = list(executor.map(run_scenario, scenarios))
+
+    base = results[0]
+    for result in results:
+        result["match_rate_change"] = result["match_rate"] - base["match_rate"]
+        result["unmatched_change"] = result["unmatched"] - base["unmatched"]
+        result["average_rank_change"] = (
+            result["average_rank"] - base["average_rank"]
+            if result["average_rank"] is not None and base["average_rank"] is not None
+            else None
+        )
+        assignments = result["assignments"]
+        result["changed_students"] = sum(
+            1
+            for student in assignments.keys() | base["assignments"].keys()
+            if assignments.get(student) != base["assignments"].get(student)
+        )
+    for result in results:
+        del result["assignments"]
+    return results
@@ -0,0 +1,165 @@
+"""
+Stability verifier for matchings.
+
+The students' preferences and the employers' rankings are turned into NumPy
+arrays with one entry per (student, placement) pair the student ranked, using
+dense indexes instead of uuids. Blocking pairs and capacity violations are then
+found with array operations instead of looping over every preference and every
+match in Python.
+
+A pair (student, placement) is blocking if both ranked each other, the student
+prefers the placement to their match, and the placement has a free position or
+ranks the student above its worst match.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Position given to unmatched students, after every preference
+UNMATCHED = np.iinfo(np.int64).max
+
+
+class RankTables:
+    """Preferences and rankings as dense integer arrays."""
+
+    def __init__(
+        self,
+        student_rank: Dict[str, List[str]],
+        placement_rank: Dict[str, Dict[str, int]],
+    ):
+        self.students = list(student_rank)
+        self.placements = list(placement_rank)
+        self.student_index = {student: i for i, student in enumerate(self.students)}
+        self.placement_index = {
+            placement: i for i, placement in enumerate(self.placements)
+        }
+        self.capacity = np.array(
+            [
+                int(placement_rank[placement]["positions"])
+                for placement in self.placements
+            ],
+            dtype=np.int64,
+        )
+
+        # One entry per pair that both sides ranked
+        pair_student: List[int] = []
+        pair_placement: List[int] = []
+        pair_position: List[int] = []
+        pair_rank: List[int] = []
+        for i, student in enumerate(self.students):
+            for position, placement in enumerate(student_rank[student]):
+                j = self.placement_index.get(placement)
+                if j is None:
+                    continue
+                rank = placement_rank[placement].get(student)
+                if rank is None:
+                    continue
+                pair_student.append(i)
+                pair_placement.append(j)
+                pair_position.append(position)
+                pair_rank.append(int(rank))
+
+        self.pair_student = np.array(pair_student, dtype=np.int64)
+        self.pair_placement = np.array(pair_placement, dtype=np.int64)
+        self.pair_position = np.array(pair_position, dtype=np.int64)
+        self.pair_rank = np.array(pair_rank, dtype=np.int64)
+        # Sorted pair keys so pairs can be looked up with searchsorted
+        self.pair_key = self.pair_student * len(self.placements) + self.pair_placement
+        order = np.argsort(self.pair_key, kind="stable")
+        self.sorted_keys = self.pair_key[order]
+        self.sorted_pairs = order
+
+    def find_pairs(self, students: np.ndarray, placements: np.ndarray) -> np.ndarray:
+        """Index of each (student, placement) pair, -1 if it was not ranked by both."""
+        keys = students * len(self.placements) + placements
+        if not len(self.sorted_keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        found = np.searchsorted(self.sorted_keys, keys)
+        found = np.minimum(found, len(self.sorted_keys) - 1)
+        exists = self.sorted_keys[found] == keys
+        return np.where(exists, self.sorted_pairs[found], -1)
+
+
+def verify_matching(
+    student_rank: Dict[str, List[str]],
+    placement_rank: Dict[str, Dict[str, int]],
+    matches: Dict[str, List[str]],
+    tables: Optional[RankTables] = None,
+) -> Dict[str, list]:
+    """Check a matching for blocking pairs and capacity violations.
+
+    Args:
+        student_rank: Students' preferences
+        placement_rank: Employers' rankings, includes "positions" key
+        matches: placement -> matched students, as returned by `Matching`
+        tables: Rank tables already built for the same preferences
+
+    Returns:
+        dict: "stable" and lists of "blocking_pairs" (student, placement),
+        "over_capacity" placements, "invalid_matches" (student, placement) for
+        matches either side did not rank and "duplicate_students" matched more
+        than once
+    """
+    if tables is None:
+        tables = RankTables(student_rank, placement_rank)
+    num_students = len(tables.students)
+
+    matched_students: List[int] = []
+    matched_placements: List[int] = []
+    invalid_matches: List[Tuple[str, str]] = []
+    for placement, students in matches.items():
+        j = tables.placement_index.get(placement)
+        for student in students:
+            i = tables.student_index.get(student)
+            if i is None or j is None:
+                invalid_matches.append((student, placement))
+                continue
+            matched_students.append(i)
+            matched_placements.append(j)
+    match_student = np.array(matched_students, dtype=np.int64)
+    match_placement = np.array(matched_placements, dtype=np.int64)
+
+    times_matched = np.bincount(match_student, minlength=num_students)
+    duplicate_students = [tables.students[i] for i in np.flatnonzero(times_matched > 1)]
+    count = np.bincount(match_placement, minlength=len(tables.placements))
+    over_capacity = [
+        tables.placements[j] for j in np.flatnonzero(count > tables.capacity)
+    ]
+
+    pairs = tables.find_pairs(match_student, match_placement)
+    invalid = pairs < 0
+    invalid_matches.extend(
+        (tables.students[i], tables.placements[j])
+        for i, j in zip(match_student[invalid], match_placement[invalid])
+    )
+    pairs = pairs[~invalid]
+
+    # Position of each student's match in their preferences
+    match_position = np.full(num_students, UNMATCHED, dtype=np.int64)
+    np.minimum.at(
+        match_position, tables.pair_student[pairs], tables.pair_position[pairs]
+    )
+    # Rank of the worst match of each placement, -1 if it has none
+    worst_rank = np.full(len(tables.placements), -1, dtype=np.int64)
+    np.maximum.at(worst_rank, tables.pair_placement[pairs], tables.pair_rank[pairs])
+
+    placement = tables.pair_placement
+    blocking = (tables.pair_position < match_position[tables.pair_student]) & (
+        (count[placement] < tables.capacity[placement])
+        | (tables.pair_rank < worst_rank[placement])
+    )
+    blocking_pairs = [
+        (tables.students[i], tables.placements[j])
+        for i, j in zip(tables.pair_student[blocking], tables.pair_placement[blocking])
+    ]
+
+    return {
+        "stable": not (
+            blocking_pairs or over_capacity or invalid_matches or duplicate_students
+        ),
+        "blocking_pairs": blocking_pairs,
+        "over_capacity": over_capacity,
+        "invalid_matches": invalid_matches,
+        "duplicate_students": duplicate_students,
+    }
@@ -15,13 +15,18 @@ from flask_caching import Cache
 from flask_compress import Compress  # type: ignore
 
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from core.cache_versions import watch_tables  # noqa: E402
 from core.configuration_settings import Config  # noqa: E402
-from core.database_mongo_manager import DatabaseMongoManager  # noqa: E402
+from core.database_backends import create_database_manager  # noqa: E402
 from core import handlers, shared  # noqa: E402
+from core.indexes import format_report  # noqa: E402
+from core.lookup_keys import backfill, check_backfilled  # noqa: E402
 
 DATABASE_MANAGER = None
 DEADLINE_MANAGER = None
 CONFIG_MANAGER = None
+CACHE_VERSIONS = None
+READ_CACHE = None
 
 load_dotenv()
 
@@ -35,7 +40,11 @@ else:
     print("In production mode")
     DATABASE = shared.getenv("MONGO_DB_PROD", "")
 
-DATABASE_MANAGER = DatabaseMongoManager(shared.getenv("MONGO_URI"), DATABASE)
+# Lazy so the client is created in each gunicorn worker after it is forked.
+# Importing the app does no database I/O, see startup below.
+DATABASE_MANAGER = create_database_manager(
+    shared.getenv("MONGO_URI"), DATABASE, lazy=True
+)
 
 tables = [
     "users",
@@ -48,12 +57,105 @@ tables = [
     "employers",
     "deadline",
     "config",
+    "matching_runs",
+    "scenario_runs",
+    "cache_versions",
 ]
 
+# Indexes of each table, reconciled at startup, see core/indexes.py
+indexes = {
+    "users": [{"fields": ["email_key"], "unique": True, "sparse": True}],
+    "students": [
+        {"fields": ["student_id"], "unique": True},
+        {"fields": ["email"]},
+        {"fields": ["email_key"]},
+        {"fields": ["course"]},
+        {"fields": ["preferences"]},
+        {"fields": ["modules"]},
+        {"fields": ["skills"]},
+        {"fields": ["attempted_skills"]},
+    ],
+    "opportunities": [
+        {"fields": ["employer_id"]},
+        {"fields": ["duration"]},
+        {"fields": ["preferences"]},
+        {"fields": ["courses_required"]},
+        {"fields": ["modules_required"]},
+        {"fields": ["title", "description"], "text": True},
+    ],
+    "employers": [
+        {"fields": ["email"], "unique": True},
+        {"fields": ["company_name"]},
+        {"fields": ["email_key"]},
+        {"fields": ["company_name_key"]},
+    ],
+    "skills": [{"fields": ["skill_name"]}],
+    "attempted_skills": [{"fields": ["skill_name"]}],
+    "modules": [{"fields": ["module_id"], "unique": True}],
+    "courses": [{"fields": ["course_id"], "unique": True}],
+    "deadline": [{"fields": ["type"], "unique": True}],
+    "config": [{"fields": ["name"], "unique": True}],
+}
+
 for table in tables:
     DATABASE_MANAGER.add_table(table)
 
-CONFIG_MANAGER = Config(DATABASE_MANAGER)
+
+def startup():
+    """Check the database, reconcile the indexes and the lookup keys and
+    store the default deadlines.
+
+    Run once per process by its first request, after gunicorn forked it.
+    Returns:
+        bool: Whether the database could be reached
+    """
+    health = DATABASE_MANAGER.health_check()
+    if not health["ok"]:
+        print(f"MongoDB is unreachable: {health['error']}")
+        return False
+    print(f"Connected to MongoDB in {health['latency_ms']:.0f} ms")
+
+    if shared.getenv("SYNC_INDEXES", "True") == "True":
+        # Lookup keys of records written before they existed, see
+        # core/lookup_keys.py, filled in before their unique indexes are built
+        for table, count in backfill(DATABASE_MANAGER).items():
+            if count:
+                print(f"Backfilled the lookup keys of {count} {table}")
+        for line in format_report(DATABASE_MANAGER.ensure_indexes(indexes)):
+            print(line)
+    else:
+        check_backfilled(DATABASE_MANAGER)
+    DEADLINE_MANAGER.check_order()
+    return True
+
+
+startup_lock = threading.Lock()
+startup_state = {"done": False}
+
+
+# Tables whose reads are cached by each process, see core/read_cache.py
+read_cache_tables = [
+    table.strip()
+    for table in shared.getenv("DB_CACHE_TABLES", "").split(",")
+    if table.strip()
+]
+
+# Writes to the tables cached by each process are seen by the other processes
+# from their next request, see core/cache_versions.py
+CACHE_VERSIONS = watch_tables(
+    DATABASE_MANAGER,
+    [
+        "courses",
+        "modules",
+        "config",
+        "deadline",
+        "students",
+        "opportunities",
+        *read_cache_tables,
+    ],
+)
+
+CONFIG_MANAGER = Config(DATABASE_MANAGER, CACHE_VERSIONS)
 
 app = Flask(__name__)
 PORT = int(shared.getenv("PORT", "5000"))
@@ -72,8 +174,52 @@ compress = Compress()
 compress.init_app(app)
 
 
+@app.before_request
+def run_startup():
+    """Run startup before the first request, again later if it failed."""
+    if startup_state["done"]:
+        return
+    with startup_lock:
+        if not startup_state["done"]:
+            startup_state["done"] = startup()
+
+
 handlers.configure_routes(app, cache)
 
+if shared.getenv("DB_PROFILING", "False") == "True":
+    from core.query_profiler import configure_profiling, instrument  # noqa: E402
+
+    instrument(DATABASE_MANAGER)
+    configure_profiling(app, int(shared.getenv("DB_N_PLUS_ONE_THRESHOLD", "5")))
+
+# After profiling so reads served from the cache are not counted as calls
+if read_cache_tables:
+    from core.read_cache import cache_reads  # noqa: E402
+
+    READ_CACHE = cache_reads(
+        DATABASE_MANAGER,
+        read_cache_tables,
+        max_entries=int(shared.getenv("DB_CACHE_SIZE", "1024")),
+        ttl=float(shared.getenv("DB_CACHE_TTL", "60")),
+        versions=CACHE_VERSIONS,
+    )
+
+# Last so repeated reads in a request reach neither the cache nor the profiler
+if shared.getenv("IDENTITY_MAP", "True") == "True":
+    from core.identity_map import use_identity_map  # noqa: E402
+
+    use_identity_map(DATABASE_MANAGER)
+
+from courses.models import Course  # noqa: E402
+from course_modules.models import Module  # noqa: E402
+
+from user import dashboard  # noqa: E402
+
+CACHE_VERSIONS.on_change("courses", Course().clear_cache)
+CACHE_VERSIONS.on_change("modules", Module().clear_cache)
+CACHE_VERSIONS.on_change("students", dashboard.reset_cache)
+CACHE_VERSIONS.on_change("opportunities", dashboard.reset_cache)
+
 from core.deadline_manager import DeadlineManager  # noqa: E402
 
 DEADLINE_MANAGER = DeadlineManager()
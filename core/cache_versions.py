@@ -0,0 +1,118 @@
+"""
+Cache coherence across processes.
+
+Each gunicorn worker keeps its own caches of the reference tables, such as
+the courses and modules caches, the config settings and the read cache of
+core/read_cache.py. To see writes made by the other workers, every watched
+table has a version number in the cache_versions table:
+    {"_id": "courses", "version": 12}
+
+Every write to a watched table made through the app's database manager bumps
+its version and drops the caches of the table in the writing process. The
+versions are read at most once per request, the first time a cache is used,
+and the caches of the tables whose version changed since the last read are
+dropped, so a write is seen by every worker from their next request. Outside requests the versions are read at most once a second.
+"""
+
+from collections import defaultdict
+import threading
+import time
+
+from flask import g, has_request_context
+
+from core.read_cache import on_write
+
+VERSIONS_TABLE = "cache_versions"
+
+
+class CacheVersions:
+    """Version numbers of the watched tables, shared through the database."""
+
+    def __init__(self, database_manager, tables, interval=1.0):
+        """
+        Args:
+            database_manager: The manager the versions are stored with
+            tables: The tables to watch
+            interval: Seconds between reads of the versions outside requests
+        """
+        self.database_manager = database_manager
+        self.tables = set(tables)
+        self.interval = interval
+        # Versions last read, a table not read yet is treated as changed
+        self.versions = {}
+        self.last_check = None
+        self.callbacks = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def on_change(self, table, callback):
+        """Call back with the table when it is written by any process."""
+        self.callbacks[table].append(callback)
+
+    def bump(self, table):
+        """Record a write to a table, a no-op for tables not watched.
+
+        The caches of the table in this process are dropped at once, the
+        other processes drop theirs when they next check.
+        """
+        if table not in self.tables:
+            return
+        self.database_manager.bulk_write(
+            VERSIONS_TABLE,
+            [
+                {
+                    "updateOne": {
+                        "filter": {"_id": table},
+                        "update": {"$inc": {"version": 1}},
+                        "upsert": True,
+                    }
+                }
+            ],
+        )
+        self.notify([table])
+
+    def check(self):
+        """Drop the caches of changed tables, at most once per request."""
+        if has_request_context():
+            if g.get("cache_versions_checked"):
+                return
+            g.cache_versions_checked = True
+        elif (
+            self.last_check is not None
+            and time.monotonic() - self.last_check < self.interval
+        ):
+            return
+        self.refresh()
+
+    def refresh(self):
+        """Read the versions and drop the caches of the tables that changed."""
+        current = {
+            row["_id"]: row["version"]
+            for row in self.database_manager.get_all(VERSIONS_TABLE)
+        }
+        with self.lock:
+            self.last_check = time.monotonic()
+            changed = [
+                table
+                for table in self.tables
+                if table not in self.versions
+                or self.versions[table] != current.get(table, 0)
+            ]
+            for table in changed:
+                self.versions[table] = current.get(table, 0)
+        self.notify(changed)
+
+    def notify(self, tables):
+        """Call back the caches of changed tables."""
+        for table in tables:
+            for callback in self.callbacks[table]:
+                callback(table)
+
+
+def watch_tables(database_manager, tables, interval=1.0):
+    """Version the writes to some tables made through a manager.
+    Returns:
+        CacheVersions: The versions, to register the caches to drop with
+    """
+    versions = CacheVersions(database_manager, tables, interval)
+    on_write(database_manager, versions.bump)
+    return versions
@@ -0,0 +1,105 @@
+"""
+Reference cascades.
+
+REFERENCES lists, for each kind of entity, the fields of other collections
+that hold its key. When an entity is deleted or its key changes the fields are
+updated in the database with update_many, using $pull, $set with arrayFilters
+and $unset, so no documents are loaded into Python.
+
+Each reference has:
+    table: Collection holding the reference
+    field: Field holding the key
+    many: The field is a list of keys rather than a single key
+    clear: What the field becomes when every entity is deleted, "empty" for an
+        empty list or "unset" to remove the field
+"""
+
+REFERENCES = {
+    "skill": [
+        {"table": "students", "field": "skills", "many": True, "clear": "empty"},
+    ],
+    "attempted_skill": [
+        {
+            "table": "students",
+            "field": "attempted_skills",
+            "many": True,
+            "clear": "empty",
+        },
+    ],
+    "module": [
+        {"table": "students", "field": "modules", "many": True, "clear": "empty"},
+        {
+            "table": "opportunities",
+            "field": "modules_required",
+            "many": True,
+            "clear": "empty",
+        },
+    ],
+    "course": [
+        {"table": "students", "field": "course", "many": False, "clear": "unset"},
+        {
+            "table": "opportunities",
+            "field": "courses_required",
+            "many": True,
+            "clear": "empty",
+        },
+    ],
+    "student": [
+        {
+            "table": "opportunities",
+            "field": "preferences",
+            "many": True,
+            "clear": "unset",
+        },
+    ],
+    "opportunity": [
+        {"table": "students", "field": "preferences", "many": True, "clear": "unset"},
+    ],
+}
+
+
+def remove_references(database, entity, keys):
+    """Remove deleted entities from every field that references them.
+
+    Single key fields referencing a deleted entity are removed.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    for reference in REFERENCES[entity]:
+        field = reference["field"]
+        if reference["many"]:
+            update = {"$pull": {field: {"$in": keys}}}
+        else:
+            update = {"$unset": {field: ""}}
+        database.update_many(reference["table"], {field: {"$in": keys}}, update)
+
+
+def rename_references(database, entity, old_key, new_key):
+    """Replace an entity's old key with its new key wherever it is referenced."""
+    if old_key == new_key:
+        return
+    for reference in REFERENCES[entity]:
+        field = reference["field"]
+        if reference["many"]:
+            database.update_many(
+                reference["table"],
+                {field: old_key},
+                {"$set": {f"{field}.$[key]": new_key}},
+                array_filters=[{"key": old_key}],
+            )
+        else:
+            database.update_many(
+                reference["table"], {field: old_key}, {"$set": {field: new_key}}
+            )
+
+
+def clear_references(database, entity):
+    """Clear every field referencing an entity after all of them are deleted."""
+    for reference in REFERENCES[entity]:
+        field = reference["field"]
+        if reference["clear"] == "empty":
+            update = {"$set": {field: []}}
+        else:
+            update = {"$unset": {field: ""}}
+        database.update_many(reference["table"], {field: {"$exists": True}}, update)
@@ -4,24 +4,43 @@
 class Config:
     """App configuration settings"""
 
-    def __init__(self, database_manager):
+    def __init__(self, database_manager, cache_versions=None):
 
         self.database_manager = database_manager
+        # Reloads the settings when another process changes them
+        self.cache_versions = cache_versions
+        # Loaded on first use, so creating the app does not read the database
+        self.stale = True
         self.max_num_of_skills = 10
         self.min_num_ranking_student_to_opportunities = 5
 
-        self.update()
+        if cache_versions is not None:
+            cache_versions.on_change("config", self.clear_cache)
 
     def get_max_num_of_skills(self) -> int:
         """Get number of skills"""
+        self.check_versions()
         return self.max_num_of_skills
 
     def get_min_num_ranking_student_to_opportunities(self) -> int:
         """Get minimum number of ranking student to opportunities"""
+        self.check_versions()
         return self.min_num_ranking_student_to_opportunities
 
+    def check_versions(self):
+        """Reload the settings if another process changed them"""
+        if self.cache_versions is not None:
+            self.cache_versions.check()
+        if self.stale:
+            self.update()
+
+    def clear_cache(self, _table=None):
+        """Mark the settings to be reloaded on next use"""
+        self.stale = True
+
     def update(self):
         """Update the configuration settings"""
+        self.stale = False
         temp_num_of_skills = self.database_manager.get_one_by_field(
             "config", "name", "num_of_skills"
         )
@@ -34,8 +53,8 @@ class Config:
         if temp_num_of_skills:
             self.max_num_of_skills = temp_num_of_skills["value"]
         else:
-            self.database_manager.insert(
-                "config", {"name": "num_of_skills", "value": self.max_num_of_skills}
+            self.max_num_of_skills = self.insert_default(
+                "num_of_skills", self.max_num_of_skills
             )
 
         if temp_min_num_ranking_student_to_opportunities:
@@ -43,14 +62,31 @@ class Config:
                 temp_min_num_ranking_student_to_opportunities["value"]
             )
         else:
-            self.database_manager.insert(
-                "config",
-                {
-                    "name": "min_num_ranking_student_to_opportunities",
-                    "value": self.min_num_ranking_student_to_opportunities,
-                },
+            self.min_num_ranking_student_to_opportunities = self.insert_default(
+                "min_num_ranking_student_to_opportunities",
+                self.min_num_ranking_student_to_opportunities,
             )
 
+    def insert_default(self, name, value):
+        """Store the default of a missing setting and return the stored value
+
+        Workers starting on a new database all store the defaults, the upsert
+        only inserts a setting once, whichever worker wins.
+        """
+        self.database_manager.bulk_write(
+            "config",
+            [
+                {
+                    "updateOne": {
+                        "filter": {"name": name},
+                        "update": {"$setOnInsert": {"value": value}},
+                        "upsert": True,
+                    }
+                }
+            ],
+        )
+        return self.database_manager.get_one_by_field("config", "name", name)["value"]
+
     def set_num_of_skills(self, num_of_skills):
         """Set number of skills"""
         self.database_manager.update_one_by_field(
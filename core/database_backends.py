@@ -0,0 +1,32 @@
+"""
+Database backend selection.
+
+DATABASE_BACKEND picks the DatabaseInterface implementation the app, the
+offline tools and the tests use:
+    mongo: MongoDB at MONGO_URI, the default
+    memory: In-memory tables, for tests and benchmarks without a database
+"""
+
+from core import shared
+from core.database_memory_manager import DatabaseMemoryManager
+from core.database_mongo_manager import DatabaseMongoManager
+
+BACKENDS = {
+    "mongo": DatabaseMongoManager,
+    "memory": DatabaseMemoryManager,
+}
+
+
+def create_database_manager(connection, database, lazy=False):
+    """Create the database manager of the configured backend.
+    Args:
+        connection: The MongoDB connection string
+        database: The name of the database
+        lazy: Connect on first use, see DatabaseMongoManager
+    Raises:
+        ValueError: If DATABASE_BACKEND is not a known backend
+    """
+    backend = shared.getenv("DATABASE_BACKEND", "mongo").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown database backend: {backend}")
+    return BACKENDS[backend](connection, database, lazy=lazy)
@@ -4,12 +4,16 @@ from abc import ABC, abstractmethod
 
 
 class DatabaseInterface(ABC):
-    """Database Interface Class"""
+    """Database Interface Class
+
+    Read methods take an optional projection, either a list of the fields to
+    return or a dict of fields to include (1) or exclude (0). The "_id" field
+    is always returned unless excluded. Named projections are in
+    `core.projections`.
+    """
 
     def __init__(self):
         """Initialize the database interface"""
-        self.connection = None
-        self.database = None
         self.table_list = []
 
     def add_table(self, table):
@@ -22,12 +26,26 @@ class DatabaseInterface(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def get_all(self, table):
+    def get_all(self, table, projection=None):
         """Get all the data from the table"""
         raise NotImplementedError
 
     @abstractmethod
-    def get_one_by_id(self, table, id_val):
+    def iter_all(self, table, projection=None, batch_size=None):
+        """Iterate over all the rows of the table
+
+        Rows are fetched batch_size at a time, so iterating over a large
+        table does not hold it all in memory.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_by_field(self, table, field, value, projection=None, batch_size=None):
+        """Iterate over the rows where field matches value, see iter_all"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_one_by_id(self, table, id_val, projection=None):
         """Get one row by id"""
         raise NotImplementedError
 
@@ -67,27 +85,49 @@ class DatabaseInterface(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def get_by_email(self, table, email):
+    def get_by_email(self, table, email, projection=None):
         """Get one row by email"""
         raise NotImplementedError
 
     @abstractmethod
-    def get_one_by_field(self, table, field, value):
+    def get_one_by_field(self, table, field, value, projection=None):
         """Get one row by field"""
         raise NotImplementedError
 
+    @abstractmethod
+    def get_one_by_field_strict(self, table, field, value, projection=None):
+        """Get one row by field, matching the whole value case-insensitively"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_field_by_id(self, table, id_val, field):
+        """Remove a field from a row by id"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_many(self, table, data):
+        """Insert many rows"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_collection(self, table):
+        """Delete a table"""
+        raise NotImplementedError
+
     @abstractmethod
     def is_table(self, table):
         """Check if the table exists"""
         raise NotImplementedError
 
     @abstractmethod
-    def get_all_by_two_fields(self, table, field1, value1, field2, value2):
+    def get_all_by_two_fields(
+        self, table, field1, value1, field2, value2, projection=None
+    ):
         """Get all by two fields"""
         raise NotImplementedError
 
     @abstractmethod
-    def get_all_by_in_list(self, table, field, values_list):
+    def get_all_by_in_list(self, table, field, values_list, projection=None):
         """Get all by in list"""
         raise NotImplementedError
 
@@ -97,7 +137,7 @@ class DatabaseInterface(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def get_all_by_field(self, table, field, value):
+    def get_all_by_field(self, table, field, value, projection=None):
         """Get all by field"""
         raise NotImplementedError
 
@@ -107,7 +147,37 @@ class DatabaseInterface(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def get_all_by_text_search(self, table, search_text):
+    def ensure_indexes(self, indexes, create=True, drop_extra=False):
+        """Reconcile the indexes with a specification, see `core.indexes`"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def health_check(self):
+        """Check the database can be reached without raising"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def close_connection(self):
+        """Close the connection to the database"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_slow_queries(self, limit=100):
+        """Get the most recent operations slower than SLOW_QUERY_MS"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_by_filter(self, table, query):
+        """Count the rows matching a query without reading them"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def aggregate(self, table, pipeline):
+        """Run a MongoDB aggregation pipeline and return the results as a list"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_all_by_text_search(self, table, search_text, projection=None):
         """Get all by text search"""
         raise NotImplementedError
 
@@ -119,3 +189,23 @@ class DatabaseInterface(ABC):
     def delete_all_by_field(self, table, field, value):
         """Delete all by field"""
         raise NotImplementedError
+
+    @abstractmethod
+    def update_many(self, table, query, update, array_filters=None):
+        """Apply an update document to every row matching the query"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def bulk_write(self, table, operations, ordered=False):
+        """Run write operations in batches
+
+        Operations use the MongoDB bulkWrite syntax, for example
+        {"updateMany": {"filter": {...}, "update": {...}}}. Returns a dict of
+        the matched, modified, deleted, inserted and upserted counts.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def bulk_update(self, table, updates):
+        """Set fields on many rows from (id, data) pairs in batches"""
+        raise NotImplementedError
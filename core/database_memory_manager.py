@@ -0,0 +1,1170 @@
+"""
+In-memory database backend.
+
+DatabaseMemoryManager implements DatabaseInterface with dict-backed tables so
+the models, routes and benchmarks can run without MongoDB. It is selected with
+DATABASE_BACKEND="memory", see `core.database_backends`. Managers with the
+same database name share their tables, as two clients of one server would,
+and the data lasts until the process exits.
+
+Queries and updates follow MongoDB's semantics for what the app uses:
+    queries: equality (also matching list elements), $eq, $ne, $in, $nin,
+        $exists, $regex, $gt, $gte, $lt, $lte, $size, $and, $or, $nor, $text
+    updates: $set, $unset, $inc, $push, $addToSet, $pull and $setOnInsert,
+        with $[], $[identifier] and array filters
+    aggregation: $match, $group, $count, $sort, $limit, $skip and $project,
+        with the common expression operators and accumulators
+Indexes made by create_index or ensure_indexes are hash indexes used to look
+up equality and $in queries. Unique indexes raise DuplicateKeyError and $text
+needs a text index, like MongoDB. Text search matches whole words without
+stemming.
+"""
+
+import copy
+import re
+import threading
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+from core.indexes import index_name, reconcile_indexes
+from .database_interface import DatabaseInterface
+
+# Tables of each database, shared by the managers of a database
+_DATABASES = {}
+_DATABASES_LOCK = threading.Lock()
+
+REGEX_FLAGS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}
+
+
+def freeze(value):
+    """Hashable form of a value for the index entries."""
+    if isinstance(value, dict):
+        return tuple((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def resolve(document, path):
+    """Values at a dotted path, descending into lists of documents."""
+    values = [document]
+    for key in path.split("."):
+        found = []
+        for value in values:
+            if isinstance(value, dict):
+                if key in value:
+                    found.append(value[key])
+            elif isinstance(value, list):
+                if key.isdigit():
+                    if int(key) < len(value):
+                        found.append(value[int(key)])
+                else:
+                    found.extend(
+                        item[key]
+                        for item in value
+                        if isinstance(item, dict) and key in item
+                    )
+        values = found
+    return values
+
+
+def candidates(values):
+    """Values compared by a query, lists match by their elements too."""
+    for value in values:
+        yield value
+        if isinstance(value, list):
+            yield from value
+
+
+def is_operator_dict(condition):
+    """Check if a condition is a dict of query operators."""
+    return (
+        isinstance(condition, dict)
+        and bool(condition)
+        and all(key.startswith("$") for key in condition)
+    )
+
+
+def compile_regex(pattern, options=""):
+    """Compile a $regex pattern with its $options."""
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    flags = 0
+    for option in options:
+        flags |= REGEX_FLAGS.get(option, 0)
+    return re.compile(pattern, flags)
+
+
+def equals(values, expected):
+    """Equality as MongoDB matches it, null also matches a missing field."""
+    if isinstance(expected, re.Pattern):
+        return any(
+            isinstance(value, str) and expected.search(value)
+            for value in candidates(values)
+        )
+    if expected is None and not values:
+        return True
+    return any(value == expected for value in candidates(values))
+
+
+def compare(values, argument, check):
+    """Check if any value compares to the argument."""
+    for value in candidates(values):
+        try:
+            if check(value, argument):
+                return True
+        except TypeError:
+            continue
+    return False
+
+
+def matches_condition(values, condition):
+    """Check the values at a field against a query condition."""
+    if not is_operator_dict(condition):
+        return equals(values, condition)
+    for operator, argument in condition.items():
+        if operator == "$eq":
+            result = equals(values, argument)
+        elif operator == "$ne":
+            result = not equals(values, argument)
+        elif operator == "$in":
+            result = any(equals(values, item) for item in argument)
+        elif operator == "$nin":
+            result = not any(equals(values, item) for item in argument)
+        elif operator == "$exists":
+            result = bool(values) == bool(argument)
+        elif operator == "$regex":
+            regex = compile_regex(argument, condition.get("$options", ""))
+            result = equals(values, regex)
+        elif operator == "$options":
+            result = True
+        elif operator == "$gt":
+            result = compare(values, argument, lambda a, b: a > b)
+        elif operator == "$gte":
+            result = compare(values, argument, lambda a, b: a >= b)
+        elif operator == "$lt":
+            result = compare(values, argument, lambda a, b: a < b)
+        elif operator == "$lte":
+            result = compare(values, argument, lambda a, b: a <= b)
+        elif operator == "$size":
+            result = any(
+                isinstance(value, list) and len(value) == argument for value in values
+            )
+        else:
+            raise OperationFailure(f"unknown operator: {operator}")
+        if not result:
+            return False
+    return True
+
+
+def matches(document, query, text_search=None):
+    """Check if a document matches a query.
+    Args:
+        document: The document to check
+        query: The query
+        text_search: Function checking a document against a $text query
+    """
+    for field, condition in query.items():
+        if field == "$and":
+            result = all(matches(document, item, text_search) for item in condition)
+        elif field == "$or":
+            result = any(matches(document, item, text_search) for item in condition)
+        elif field == "$nor":
+            result = not any(matches(document, item, text_search) for item in condition)
+        elif field == "$text":
+            if text_search is None:
+                raise OperationFailure("text index required for $text query")
+            result = text_search(document, condition["$search"])
+        elif field.startswith("$"):
+            raise OperationFailure(f"unknown top level operator: {field}")
+        else:
+            result = matches_condition(resolve(document, field), condition)
+        if not result:
+            return False
+    return True
+
+
+def project(document, projection):
+    """Copy of a document with only the fields of a projection."""
+    if projection is None:
+        return copy.deepcopy(document)
+    if not isinstance(projection, dict):
+        projection = dict.fromkeys(projection, 1)
+    include = [field for field, value in projection.items() if value]
+    if not include or include == ["_id"] and len(projection) > 1:
+        return {
+            field: copy.deepcopy(value)
+            for field, value in document.items()
+            if projection.get(field, 1)
+        }
+    fields = set(include)
+    if projection.get("_id", 1):
+        fields.add("_id")
+    return {
+        field: copy.deepcopy(value)
+        for field, value in document.items()
+        if field in fields
+    }
+
+
+def lookup_values(condition):
+    """Values an equality or $in condition can be looked up by in an index.
+
+    Lists, documents, patterns and null are matched differently than by hash,
+    so conditions with them return None.
+    """
+    if isinstance(condition, dict) and set(condition) == {"$in"}:
+        values = list(condition["$in"])
+    elif is_operator_dict(condition):
+        return None
+    else:
+        values = [condition]
+    if any(
+        value is None or isinstance(value, (dict, list, re.Pattern)) for value in values
+    ):
+        return None
+    return values
+
+
+def element_matches(element, array_filters, identifier):
+    """Check an array element against the array filters of an identifier."""
+    for array_filter in array_filters or []:
+        for path, condition in array_filter.items():
+            name, _, rest = path.partition(".")
+            if name != identifier:
+                continue
+            values = resolve(element, rest) if rest else [element]
+            if not matches_condition(values, condition):
+                return False
+    return True
+
+
+def apply_path(target, keys, action, array_filters, create):
+    """Apply an update action to the fields at a path.
+    Args:
+        target: The document or list holding the path
+        keys: The path split on "."
+        action: Function called with the container and key of each field
+        array_filters: Filters for the $[identifier] keys
+        create: Create missing documents on the way, as $set and $push do
+    """
+    key, rest = keys[0], keys[1:]
+    if isinstance(target, list):
+        if key == "$[]":
+            indices = range(len(target))
+        elif key.startswith("$[") and key.endswith("]"):
+            indices = [
+                i
+                for i, item in enumerate(target)
+                if element_matches(item, array_filters, key[2:-1])
+            ]
+        elif key.isdigit():
+            indices = [int(key)]
+            if create:
+                target.extend([None] * (int(key) + 1 - len(target)))
+        else:
+            raise OperationFailure(f"cannot use the part ({key}) to traverse a list")
+        for index in indices:
+            if index >= len(target):
+                continue
+            if not rest:
+                action(target, index)
+            elif target[index] is None and create:
+                target[index] = {}
+                apply_path(target[index], rest, action, array_filters, create)
+            else:
+                apply_path(target[index], rest, action, array_filters, create)
+        return
+    if not isinstance(target, dict):
+        if create:
+            raise OperationFailure(f"cannot create field ({key}) in a scalar")
+        return
+    if not rest:
+        action(target, key)
+        return
+    if key not in target:
+        if not create:
+            return
+        target[key] = {}
+    apply_path(target[key], rest, action, array_filters, create)
+
+
+def get_field(container, key, default=None):
+    """Value of a key of a document or index of a list."""
+    if isinstance(container, list):
+        return container[key] if key < len(container) else default
+    return container.get(key, default)
+
+
+def pull_matches(element, condition):
+    """Check if a list element is removed by a $pull condition."""
+    if is_operator_dict(condition):
+        return matches_condition([element], condition)
+    if isinstance(condition, dict) and isinstance(element, dict):
+        return matches(element, condition)
+    return element == condition
+
+
+def set_action(value):
+    """$set a field to a value."""
+
+    def action(container, key):
+        container[key] = copy.deepcopy(value)
+
+    return action
+
+
+def unset_action(_argument):
+    """$unset a field, list elements become null."""
+
+    def action(container, key):
+        if isinstance(container, list):
+            container[key] = None
+        else:
+            container.pop(key, None)
+
+    return action
+
+
+def inc_action(amount):
+    """$inc a field, a missing field starts at 0."""
+
+    def action(container, key):
+        container[key] = get_field(container, key, 0) + amount
+
+    return action
+
+
+def push_action(argument, unique=False):
+    """$push to a list, or $addToSet with unique, creating it if missing."""
+    if isinstance(argument, dict) and "$each" in argument:
+        items = argument["$each"]
+    else:
+        items = [argument]
+
+    def action(container, key):
+        current = get_field(container, key)
+        if current is None:
+            current = []
+        elif not isinstance(current, list):
+            raise OperationFailure(f"The field '{key}' must be an array")
+        for item in items:
+            if not unique or item not in current:
+                current.append(copy.deepcopy(item))
+        container[key] = current
+
+    return action
+
+
+def pull_action(condition):
+    """$pull the elements matching a condition from a list."""
+
+    def action(container, key):
+        current = get_field(container, key)
+        if isinstance(current, list):
+            container[key] = [
+                item for item in current if not pull_matches(item, condition)
+            ]
+
+    return action
+
+
+# Update operator -> (action factory, create missing documents on the path)
+UPDATE_ACTIONS = {
+    "$set": (set_action, True),
+    "$unset": (unset_action, False),
+    "$inc": (inc_action, True),
+    "$push": (push_action, True),
+    "$addToSet": (lambda argument: push_action(argument, unique=True), True),
+    "$pull": (pull_action, False),
+}
+
+
+def apply_update(document, update, array_filters=None):
+    """Apply an update document, in place.
+    Raises:
+        OperationFailure: If the update uses an unsupported operator
+    """
+    for operator, fields in update.items():
+        if operator not in UPDATE_ACTIONS:
+            raise OperationFailure(f"Unknown modifier: {operator}")
+        factory, create = UPDATE_ACTIONS[operator]
+        for path, argument in fields.items():
+            apply_path(
+                document, path.split("."), factory(argument), array_filters, create
+            )
+
+
+def field_value(document, path):
+    """Value of a dotted path in an aggregation expression, None if missing."""
+    value = document
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def truthy(value):
+    """Truthiness of an aggregation value, empty strings and lists are true."""
+    return value is not None and value is not False and value != 0
+
+
+def sort_key(value):
+    """Sort key putting null before every other value."""
+    return (value is not None, value)
+
+
+def evaluate(document, expression):
+    """Evaluate an aggregation expression against a document."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return field_value(document, expression[1:])
+    if isinstance(expression, list):
+        return [evaluate(document, item) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if not is_operator_dict(expression):
+        return {key: evaluate(document, value) for key, value in expression.items()}
+    ((operator, argument),) = expression.items()
+    if operator == "$literal":
+        return argument
+    if operator not in EXPRESSION_OPERATORS:
+        raise OperationFailure(f"unsupported expression operator: {operator}")
+    if operator == "$cond" and isinstance(argument, dict):
+        argument = [argument["if"], argument["then"], argument["else"]]
+    return EXPRESSION_OPERATORS[operator](document, argument)
+
+
+def _cond(document, argument):
+    condition, then, otherwise = argument
+    return evaluate(
+        document, then if truthy(evaluate(document, condition)) else otherwise
+    )
+
+
+def _if_null(document, argument):
+    for expression in argument:
+        value = evaluate(document, expression)
+        if value is not None:
+            return value
+    return None
+
+
+def _compare(check):
+    def run(document, argument):
+        first, second = evaluate(document, argument)
+        return check(sort_key(first), sort_key(second))
+
+    return run
+
+
+# Aggregation expression operator -> function of the document and arguments
+EXPRESSION_OPERATORS = {
+    "$cond": _cond,
+    "$ifNull": _if_null,
+    "$eq": _compare(lambda a, b: a == b),
+    "$ne": _compare(lambda a, b: a != b),
+    "$gt": _compare(lambda a, b: a > b),
+    "$gte": _compare(lambda a, b: a >= b),
+    "$lt": _compare(lambda a, b: a < b),
+    "$lte": _compare(lambda a, b: a <= b),
+    "$in": lambda document, argument: evaluate(document, argument[0])
+    in evaluate(document, argument[1]),
+    "$size": lambda document, argument: len(evaluate(document, argument)),
+    "$and": lambda document, argument: all(
+        truthy(evaluate(document, item)) for item in argument
+    ),
+    "$or": lambda document, argument: any(
+        truthy(evaluate(document, item)) for item in argument
+    ),
+    "$not": lambda document, argument: not truthy(
+        evaluate(document, argument[0] if isinstance(argument, list) else argument)
+    ),
+}
+
+
+def _group(documents, spec):
+    groups = {}
+    for document in documents:
+        key = evaluate(document, spec["_id"])
+        group = groups.setdefault(freeze(key), {"_id": key, "values": {}})
+        for field, accumulator in spec.items():
+            if field != "_id":
+                (expression,) = accumulator.values()
+                group["values"].setdefault(field, []).append(
+                    evaluate(document, expression)
+                )
+    results = []
+    for group in groups.values():
+        result = {"_id": group["_id"]}
+        for field, accumulator in spec.items():
+            if field != "_id":
+                ((operator, _),) = accumulator.items()
+                if operator not in ACCUMULATORS:
+                    raise OperationFailure(f"unsupported accumulator: {operator}")
+                result[field] = ACCUMULATORS[operator](group["values"][field])
+        results.append(result)
+    return results
+
+
+def _average(values):
+    numbers = [value for value in values if isinstance(value, (int, float))]
+    return sum(numbers) / len(numbers) if numbers else None
+
+
+# $group accumulator -> function of the values of a group
+ACCUMULATORS = {
+    "$sum": lambda values: sum(
+        value for value in values if isinstance(value, (int, float))
+    ),
+    "$avg": _average,
+    "$min": lambda values: min(
+        (value for value in values if value is not None), default=None
+    ),
+    "$max": lambda values: max(
+        (value for value in values if value is not None), default=None
+    ),
+    "$first": lambda values: values[0],
+    "$push": list,
+    "$addToSet": lambda values: list(
+        {freeze(value): value for value in values}.values()
+    ),
+}
+
+
+def _sort(documents, spec):
+    documents = list(documents)
+    for field, direction in reversed(list(spec.items())):
+        documents.sort(
+            key=lambda document: sort_key(field_value(document, field)),
+            reverse=direction < 0,
+        )
+    return documents
+
+
+# Aggregation stage -> function of the documents and the stage's argument
+AGGREGATION_STAGES = {
+    "$match": lambda documents, query: [
+        document for document in documents if matches(document, query)
+    ],
+    "$group": _group,
+    "$count": lambda documents, field: ([{field: len(documents)}] if documents else []),
+    "$sort": _sort,
+    "$limit": lambda documents, limit: documents[:limit],
+    "$skip": lambda documents, skip: documents[skip:],
+    "$project": lambda documents, projection: [
+        project(document, projection) for document in documents
+    ],
+}
+
+
+def equality_fields(query):
+    """Fields a query sets by equality, the base of an upserted document."""
+    document = {}
+    for field, condition in query.items():
+        if field.startswith("$") or "." in field or is_operator_dict(condition):
+            continue
+        document[field] = copy.deepcopy(condition)
+    return document
+
+
+class Table:
+    """A table of documents with its indexes."""
+
+    def __init__(self):
+        self.documents = {}
+        self.order = {}
+        self.sequence = 0
+        # Index name -> {"fields", "unique", "sparse", "text", "entries"},
+        # entries map
+        # a frozen value to the ids of its documents
+        self.indexes = {}
+
+    def index_values(self, document, index):
+        """Frozen keys of a document in an index, none if the index is sparse
+        and the document has none of its fields."""
+        fields = index["fields"]
+        if index["sparse"] and not any(resolve(document, f) for f in fields):
+            return set()
+        if len(fields) == 1:
+            values = resolve(document, fields[0])
+            keys = {freeze(value) for value in candidates(values)}
+            return keys or {None}
+        return {tuple(freeze(next(iter(resolve(document, f)), None)) for f in fields)}
+
+    def check_unique(self, document, id_val):
+        """Raise DuplicateKeyError if a document breaks a unique index."""
+        for name, index in self.indexes.items():
+            if not index["unique"]:
+                continue
+            for key in self.index_values(document, index):
+                if index["entries"].get(key, set()) - {freeze(id_val)}:
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error index: {name} dup key: {key}",
+                        11000,
+                    )
+
+    def add_entries(self, document):
+        """Add a document to the indexes."""
+        for index in self.indexes.values():
+            if index["text"]:
+                continue
+            for key in self.index_values(document, index):
+                index["entries"].setdefault(key, set()).add(freeze(document["_id"]))
+
+    def remove_entries(self, document):
+        """Remove a document from the indexes."""
+        for index in self.indexes.values():
+            if index["text"]:
+                continue
+            for key in self.index_values(document, index):
+                ids = index["entries"].get(key)
+                if ids is not None:
+                    ids.discard(freeze(document["_id"]))
+                    if not ids:
+                        del index["entries"][key]
+
+    def insert(self, document):
+        """Insert a document, it must have an _id."""
+        id_val = document["_id"]
+        if freeze(id_val) in self.documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error index: _id_ dup key: {id_val}", 11000
+            )
+        self.check_unique(document, id_val)
+        self.documents[freeze(id_val)] = document
+        self.order[freeze(id_val)] = self.sequence
+        self.sequence += 1
+        self.add_entries(document)
+
+    def replace(self, old, new):
+        """Replace a stored document with a new version of it."""
+        self.check_unique(new, old["_id"])
+        self.remove_entries(old)
+        self.documents[freeze(old["_id"])] = new
+        self.add_entries(new)
+
+    def delete(self, document):
+        """Delete a stored document."""
+        self.remove_entries(document)
+        del self.documents[freeze(document["_id"])]
+        del self.order[freeze(document["_id"])]
+
+    def text_search(self, document, search):
+        """Check if a document matches a $text search."""
+        fields = next(
+            (index["fields"] for index in self.indexes.values() if index["text"]),
+            None,
+        )
+        if fields is None:
+            raise OperationFailure("text index required for $text query")
+        text = " ".join(
+            value
+            for field in fields
+            for value in candidates(resolve(document, field))
+            if isinstance(value, str)
+        ).lower()
+        words = set(re.findall(r"\w+", text))
+        phrases = re.findall(r'"([^"]*)"', search.lower())
+        terms = re.sub(r'"[^"]*"', " ", search.lower()).split()
+        if any(term[1:] in words for term in terms if term.startswith("-")):
+            return False
+        if not all(phrase in text for phrase in phrases):
+            return False
+        positive = [term for term in terms if not term.startswith("-")]
+        return bool(phrases) or any(
+            word in words for term in positive for word in re.findall(r"\w+", term)
+        )
+
+    def lookup(self, query):
+        """Ids of the documents that may match a query, using the indexes.
+        Returns:
+            set: The ids, or None if no index applies and all are scanned
+        """
+        for field, condition in query.items():
+            if field.startswith("$"):
+                continue
+            values = lookup_values(condition)
+            if values is None:
+                continue
+            if field == "_id":
+                return {freeze(value) for value in values} & self.documents.keys()
+            index = self.indexes.get(f"{field}_1")
+            if index is None:
+                continue
+            ids = set()
+            for value in values:
+                ids.update(index["entries"].get(freeze(value), ()))
+            return ids
+        return None
+
+    def find(self, query, limit=None):
+        """Stored documents matching a query, in insertion order."""
+        ids = self.lookup(query)
+        if ids is None:
+            documents = self.documents.values()
+        else:
+            documents = [
+                self.documents[id_val] for id_val in sorted(ids, key=self.order.get)
+            ]
+        found = []
+        for document in documents:
+            if matches(document, query, self.text_search):
+                found.append(document)
+                if len(found) == limit:
+                    break
+        return found
+
+    def list_indexes(self):
+        """The indexes in the format of MongoDB's listIndexes."""
+        indexes = [{"name": "_id_", "key": {"_id": 1}}]
+        for name, index in self.indexes.items():
+            if index["text"]:
+                info = {
+                    "name": name,
+                    "key": {"_fts": "text", "_ftsx": 1},
+                    "weights": dict.fromkeys(index["fields"], 1),
+                }
+            else:
+                info = {"name": name, "key": dict.fromkeys(index["fields"], 1)}
+            if index["unique"]:
+                info["unique"] = True
+            if index["sparse"]:
+                info["sparse"] = True
+            indexes.append(info)
+        return indexes
+
+    def create_index(self, fields, unique=False, text=False, name=None, sparse=False):
+        """Create an index and fill it with the stored documents."""
+        name = name or index_name({"fields": fields, "text": text})
+        if name in self.indexes:
+            return name
+        index = {
+            "fields": fields,
+            "unique": unique,
+            "sparse": sparse,
+            "text": text,
+            "entries": {},
+        }
+        if text and any(other["text"] for other in self.indexes.values()):
+            raise OperationFailure("only one text index per collection allowed")
+        self.indexes[name] = index
+        try:
+            for document in self.documents.values():
+                if unique:
+                    self.check_unique(document, document["_id"])
+                if not text:
+                    for key in self.index_values(document, index):
+                        index["entries"].setdefault(key, set()).add(
+                            freeze(document["_id"])
+                        )
+        except DuplicateKeyError:
+            del self.indexes[name]
+            raise
+        return name
+
+
+class DatabaseMemoryManager(DatabaseInterface):
+    """Class to manage an in-memory database."""
+
+    def __init__(self, connection, database, lazy=False):
+        """Initialize the DatabaseMemoryManager class.
+        Args:
+            connection: Unused, for the same signature as DatabaseMongoManager
+            database: The name of the database, managers of the same name share
+            their tables
+            lazy: Unused, there is no connection to make
+        """
+        super().__init__()
+        del lazy
+        self.connect(connection, database)
+
+    def connect(self, connection, database):
+        """Attach to the tables of a database, creating it if needed."""
+        if database == "":
+            database = "cs3528_testing"
+        self.database_name = database
+        with _DATABASES_LOCK:
+            self.tables, self.lock = _DATABASES.setdefault(
+                database, ({}, threading.RLock())
+            )
+
+    def table(self, table):
+        """The Table of a name, created on first use like a collection."""
+        if table not in self.tables:
+            self.tables[table] = Table()
+        return self.tables[table]
+
+    def find(self, table, query, projection=None):
+        """Copies of the documents matching a query."""
+        with self.lock:
+            return [
+                project(document, projection)
+                for document in self.table(table).find(query)
+            ]
+
+    def find_one(self, table, query, projection=None):
+        """Copy of the first document matching a query, or None."""
+        with self.lock:
+            found = self.table(table).find(query, limit=1)
+            return project(found[0], projection) if found else None
+
+    def update(
+        self,
+        table,
+        query,
+        update,
+        many=False,
+        upsert=False,
+        array_filters=None,
+        replace=False,
+    ):  # pylint: disable=too-many-arguments
+        """Update the first or every document matching a query.
+        Args:
+            table: The table to update
+            query: The filter of the documents to update
+            update: An update document, or a replacement with replace=True
+            many: Update every matching document
+            upsert: Insert a document if none match
+            array_filters: Filters for the $[identifier] array elements
+            replace: The update is a replacement document
+        Returns:
+            UpdateResult: As pymongo returns it
+        """
+        if not replace and not is_operator_dict(update):
+            raise ValueError("update only works with $ operators")
+        with self.lock:
+            stored = self.table(table)
+            found = stored.find(query, limit=None if many else 1)
+            modified = 0
+            for document in found:
+                if replace:
+                    new = copy.deepcopy(update)
+                    new["_id"] = document["_id"]
+                else:
+                    new = copy.deepcopy(document)
+                    apply_update(
+                        new,
+                        {k: v for k, v in update.items() if k != "$setOnInsert"},
+                        array_filters,
+                    )
+                if new != document:
+                    stored.replace(document, new)
+                    modified += 1
+            if found or not upsert:
+                return UpdateResult({"n": len(found), "nModified": modified}, True)
+
+            if replace:
+                new = copy.deepcopy(update)
+                if "_id" not in new and "_id" in query:
+                    new["_id"] = query["_id"]
+            else:
+                new = equality_fields(query)
+                apply_update(
+                    new,
+                    {k: v for k, v in update.items() if k != "$setOnInsert"},
+                    array_filters,
+                )
+                apply_update(new, {"$set": update.get("$setOnInsert", {})})
+            new.setdefault("_id", ObjectId())
+            stored.insert(new)
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": new["_id"]}, True)
+
+    def delete(self, table, query, many=False):
+        """Delete the first or every document matching a query."""
+        with self.lock:
+            stored = self.table(table)
+            found = stored.find(query, limit=None if many else 1)
+            for document in found:
+                stored.delete(document)
+            return DeleteResult({"n": len(found)}, True)
+
+    def iterate(self, table, query, projection=None, batch_size=None):
+        """Yield copies of the documents matching a query.
+
+        The matching documents are found when iteration starts, then copied
+        one at a time, so batch_size is only accepted for the interface.
+        """
+        del batch_size
+        with self.lock:
+            found = self.table(table).find(query)
+        for document in found:
+            yield project(document, projection)
+
+    def iter_all(self, table, projection=None, batch_size=None):
+        """Iterate over all records of a table."""
+        return self.iterate(table, {}, projection, batch_size)
+
+    def iter_by_field(self, table, field, value, projection=None, batch_size=None):
+        """Iterate over the records where a field matches a value."""
+        return self.iterate(table, {field: value}, projection, batch_size)
+
+    def get_all(self, table, projection=None):
+        """Get all records from a table."""
+        return self.find(table, {}, projection)
+
+    def get_one_by_id(self, table, id_val, projection=None):
+        """Get one record by ID."""
+        return self.find_one(table, {"_id": id_val}, projection)
+
+    def insert(self, table, data):
+        """Insert a record into a table, adding an _id to it if it has none."""
+        data.setdefault("_id", ObjectId())
+        with self.lock:
+            self.table(table).insert(copy.deepcopy(data))
+        return InsertOneResult(data["_id"], True)
+
+    def update_one_by_id(self, table, id_val, data):
+        """Update a record by ID."""
+        return self.update(table, {"_id": id_val}, {"$set": data})
+
+    def update_one_by_field(self, table, field, value, data):
+        """Update a record by field."""
+        return self.update(table, {field: value}, {"$set": data})
+
+    def increment(self, table, id_val, field, increment):
+        """Increment a field by a value."""
+        return self.update(table, {"_id": id_val}, {"$inc": {field: increment}})
+
+    def delete_by_id(self, table, id_val):
+        """Delete a record by ID."""
+        return self.delete(table, {"_id": id_val})
+
+    def delete_one_by_field(self, table, field, value):
+        """Delete a record by field."""
+        return self.delete(table, {field: value})
+
+    def delete_all_by_field(self, table, field, value):
+        """Delete all records by field."""
+        return self.delete(table, {field: value}, many=True)
+
+    def delete_all(self, table):
+        """Delete all records from a table."""
+        return self.delete(table, {}, many=True)
+
+    def get_by_email(self, table, email, projection=None):
+        """Get a record by email."""
+        return self.find_one(table, {"email": email}, projection)
+
+    def delete_field_by_id(self, table, id_val, field):
+        """Delete a field by ID."""
+        return self.update(table, {"_id": id_val}, {"$unset": {field: ""}})
+
+    def get_one_by_field(self, table, field, value, projection=None):
+        """Get one record by field."""
+        return self.find_one(table, {field: value}, projection)
+
+    def get_one_by_field_strict(self, table, field, value, projection=None):
+        """Get one record by field with strict matching."""
+        return self.find_one(
+            table,
+            {field: {"$regex": f"^{re.escape(value)}$", "$options": "i"}},
+            projection,
+        )
+
+    def is_table(self, table):
+        """Check if a table exists."""
+        return table in self.table_list
+
+    def get_all_by_two_fields(
+        self, table, field1, value1, field2, value2, projection=None
+    ):
+        """Get all records by two fields."""
+        return self.find(table, {field1: value1, field2: value2}, projection)
+
+    def get_all_by_in_list(self, table, field, values_list, projection=None):
+        """Get all records by a list of values."""
+        return self.find(table, {field: {"$in": list(values_list)}}, projection)
+
+    def update_by_field(self, table, field, value, data):
+        """Update a record by field."""
+        return self.update(table, {field: value}, {"$set": data})
+
+    def get_all_by_field(self, table, field, value, projection=None):
+        """Get all records by field."""
+        return self.find(table, {field: value}, projection)
+
+    def create_index(self, table, field):
+        """Create an index on a field."""
+        with self.lock:
+            return self.table(table).create_index([field])
+
+    def ensure_indexes(self, indexes, create=True, drop_extra=False):
+        """Reconcile the indexes of each table with a specification."""
+        with self.lock:
+            return reconcile_indexes(
+                indexes,
+                lambda table: self.table(table).list_indexes(),
+                lambda table, spec: self.table(table).create_index(
+                    spec["fields"],
+                    unique=spec.get("unique", False),
+                    text=spec.get("text", False),
+                    sparse=spec.get("sparse", False),
+                ),
+                lambda table, name: self.table(table).indexes.pop(name),
+                create,
+                drop_extra,
+            )
+
+    def health_check(self):
+        """The in-memory database is always reachable."""
+        return {"ok": True, "latency_ms": 0.0}
+
+    def get_slow_queries(self, limit=100):
+        """Slow operations are only logged by the MongoDB backend."""
+        return []
+
+    def get_all_by_text_search(self, table, search_text, projection=None):
+        """Get all records by text search."""
+        return self.find(table, {"$text": {"$search": search_text}}, projection)
+
+    def count_by_filter(self, table, query):
+        """Count the records matching a query."""
+        with self.lock:
+            return len(self.table(table).find(query))
+
+    def aggregate(self, table, pipeline):
+        """Run an aggregation pipeline.
+
+        Supports the $match, $group, $count, $sort, $limit, $skip and
+        $project stages, a leading $match uses the indexes like find.
+        """
+        pipeline = list(pipeline)
+        query = {}
+        if pipeline and "$match" in pipeline[0]:
+            query = pipeline.pop(0)["$match"]
+        with self.lock:
+            documents = copy.deepcopy(self.table(table).find(query))
+        for stage in pipeline:
+            ((name, argument),) = stage.items()
+            if name not in AGGREGATION_STAGES:
+                raise OperationFailure(f"unsupported aggregation stage: {name}")
+            documents = AGGREGATION_STAGES[name](documents, argument)
+        return documents
+
+    def close_connection(self):
+        """Nothing to close, the tables are kept for the other managers."""
+
+    def delete_collection(self, table):
+        """Delete a collection and its indexes."""
+        with self.lock:
+            self.tables.pop(table, None)
+
+    def insert_many(self, table, data):
+        """Insert many records into a table."""
+        data = list(data)
+        with self.lock:
+            for document in data:
+                document.setdefault("_id", ObjectId())
+                self.table(table).insert(copy.deepcopy(document))
+        return InsertManyResult([document["_id"] for document in data], True)
+
+    def update_many(self, table, query, update, array_filters=None):
+        """Apply an update document to every record matching the query."""
+        return self.update(table, query, update, many=True, array_filters=array_filters)
+
+    def bulk_write(self, table, operations, ordered=False):
+        """Run write operations in the MongoDB bulkWrite syntax.
+        Returns:
+            dict: matched, modified, deleted, inserted and upserted counts
+        Raises:
+            ValueError: If an operation is not a bulkWrite operation
+            BulkWriteError: If operations failed, after the others ran unless
+            ordered
+        """
+        counts = dict.fromkeys(
+            ["matched", "modified", "deleted", "inserted", "upserted"], 0
+        )
+        errors = []
+        with self.lock:
+            for position, operation in enumerate(operations):
+                ((name, args),) = operation.items()
+                if name not in BULK_OPERATIONS:
+                    raise ValueError(f"Unknown bulk write operation: {name}")
+                try:
+                    BULK_OPERATIONS[name](self, table, args, counts)
+                except DuplicateKeyError as e:
+                    errors.append({"index": position, "code": 11000, "errmsg": str(e)})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError(
+                {
+                    "writeErrors": errors,
+                    "writeConcernErrors": [],
+                    "nInserted": counts["inserted"],
+                    "nUpserted": counts["upserted"],
+                    "nMatched": counts["matched"],
+                    "nModified": counts["modified"],
+                    "nRemoved": counts["deleted"],
+                    "upserted": [],
+                }
+            )
+        return counts
+
+    def bulk_update(self, table, updates):
+        """Set fields on many records by ID."""
+        return self.bulk_write(
+            table,
+            (
+                {"updateOne": {"filter": {"_id": id_val}, "update": {"$set": data}}}
+                for id_val, data in updates
+            ),
+        )
+
+
+def _count_update(result, counts):
+    """Add an UpdateResult to the bulk write counts."""
+    counts["matched"] += result.matched_count
+    counts["modified"] += result.modified_count
+    counts["upserted"] += result.upserted_id is not None
+
+
+def _insert_one(manager, table, args, counts):
+    manager.insert(table, args["document"])
+    counts["inserted"] += 1
+
+
+def _update(many, replace=False):
+    def run(manager, table, args, counts):
+        _count_update(
+            manager.update(
+                table,
+                args["filter"],
+                args["replacement"] if replace else args["update"],
+                many=many,
+                upsert=args.get("upsert", False),
+                array_filters=args.get("arrayFilters"),
+                replace=replace,
+            ),
+            counts,
+        )
+
+    return run
+
+
+def _delete(many):
+    def run(manager, table, args, counts):
+        counts["deleted"] += manager.delete(
+            table, args["filter"], many=many
+        ).deleted_count
+
+    return run
+
+
+# Runs each bulkWrite operation name on the in-memory tables
+BULK_OPERATIONS = {
+    "insertOne": _insert_one,
+    "updateOne": _update(many=False),
+    "updateMany": _update(many=True),
+    "replaceOne": _update(many=False, replace=True),
+    "deleteOne": _delete(many=False),
+    "deleteMany": _delete(many=True),
+}
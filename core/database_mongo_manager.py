@@ -1,43 +1,210 @@
 """Module for managing MongoDB database operations."""
 
+from datetime import datetime
+import json
+import os
+import re
 import sys
+import threading
+import time
+import weakref
 from dotenv import load_dotenv
 import pymongo
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
 from pymongo.errors import (
+    CollectionInvalid,
     ConfigurationError,
     OperationFailure,
+    PyMongoError,
     ServerSelectionTimeoutError,
 )
 from colorama import Fore, Style
 
 from core import shared
+from core.indexes import index_keys, index_name, reconcile_indexes
 from .database_interface import DatabaseInterface
 
 
+def client_options():
+    """MongoClient options from the environment.
+
+    MONGO_SOCKET_TIMEOUT_MS is unset by default so long reads and bulk writes
+    are not cut off.
+    """
+    options = {
+        "maxPoolSize": int(shared.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(shared.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(shared.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        "serverSelectionTimeoutMS": int(
+            shared.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")
+        ),
+        "connectTimeoutMS": int(shared.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        "compressors": shared.getenv("MONGO_COMPRESSORS", "zstd,zlib"),
+    }
+    socket_timeout = shared.getenv("MONGO_SOCKET_TIMEOUT_MS")
+    if socket_timeout:
+        options["socketTimeoutMS"] = int(socket_timeout)
+    return options
+
+
+# Capped collection the slow operations are logged to
+SLOW_QUERY_TABLE = "slow_queries"
+
+
+def slow_query_threshold():
+    """Duration in ms above which an operation is logged, None if disabled.
+
+    Logging is off unless SLOW_QUERY_MS is set above 0, each slow operation
+    logged costs an extra insert.
+    """
+    threshold = float(shared.getenv("SLOW_QUERY_MS", "") or 0)
+    return threshold if threshold > 0 else None
+
+
+def redact(query):
+    """Shape of a filter, every value replaced by "?"."""
+    if isinstance(query, dict):
+        return {key: redact(value) for key, value in query.items()}
+    if isinstance(query, list):
+        return [redact(value) for value in query[:1]]
+    return "?"
+
+
+def summarize_explain(explain):
+    """Stages of the winning plan and the execution counts of an explain.
+
+    The plan's filters are left out as they hold the query's values.
+    """
+    stages = []
+    plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    plan = plan.get("queryPlan", plan)
+    while plan:
+        stage = plan.get("stage", "?")
+        if "indexName" in plan:
+            stage += f" {plan['indexName']}"
+        stages.append(stage)
+        plan = plan.get("inputStage") or next(iter(plan.get("inputStages", [])), None)
+    stats = explain.get("executionStats", {})
+    return {
+        "stages": stages,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "documents_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+        "time_ms": stats.get("executionTimeMillis"),
+    }
+
+
+# Managers whose clients are dropped in forked children, a MongoClient must not
+# be used across a fork
+_MANAGERS = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    """Make every manager create a new client in the child process."""
+    for manager in list(_MANAGERS):
+        manager.reset_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# Records fetched per round trip by iter_all and iter_by_field
+ITER_BATCH_SIZE = 500
+
+# Operations sent to the server per bulk write
+BULK_BATCH_SIZE = 1000
+
+# Builds the pymongo operation for each bulkWrite operation name
+BULK_OPERATIONS = {
+    "insertOne": lambda args: InsertOne(args["document"]),
+    "updateOne": lambda args: UpdateOne(
+        args["filter"],
+        args["update"],
+        upsert=args.get("upsert", False),
+        array_filters=args.get("arrayFilters"),
+    ),
+    "updateMany": lambda args: UpdateMany(
+        args["filter"],
+        args["update"],
+        upsert=args.get("upsert", False),
+        array_filters=args.get("arrayFilters"),
+    ),
+    "replaceOne": lambda args: ReplaceOne(
+        args["filter"], args["replacement"], upsert=args.get("upsert", False)
+    ),
+    "deleteOne": lambda args: DeleteOne(args["filter"]),
+    "deleteMany": lambda args: DeleteMany(args["filter"]),
+}
+
+
 class DatabaseMongoManager(DatabaseInterface):
     """Class to manage MongoDB database operations."""
 
-    def __init__(self, connection, database):
-        """Initialize the DatabaseMongoManager class."""
+    def __init__(self, connection, database, lazy=False):
+        """Initialize the DatabaseMongoManager class.
+        Args:
+            connection: The MongoDB connection string
+            database: The name of the database
+            lazy: Create the client on first use instead of connecting and
+            pinging now, the app's manager is lazy so each gunicorn worker
+            creates its own client after the fork
+        """
         super().__init__()
+        self._client = None
+        self._client_lock = threading.Lock()
+        _MANAGERS.add(self)
 
         self.connect(connection, database)
+        if not lazy:
+            self.check_connection()
 
     def connect(self, connection, database):
-        """Connect to the MongoDB database."""
+        """Set the MongoDB database to connect to, the client is created lazily."""
         load_dotenv()
-        self.connection = pymongo.MongoClient(serverSelectionTimeoutMS=5000)
+        self.uri = None
         if (
             shared.getenv("IS_GITHUB_ACTION") == "False"
             and connection is not None
             and shared.getenv("OFFLINE") != "True"
         ):
-            self.connection = pymongo.MongoClient(
-                connection, serverSelectionTimeoutMS=5000
-            )
+            self.uri = connection
+        if database == "":
+            database = "cs3528_testing"
+        self.database_name = database
+        self.slow_query_ms = slow_query_threshold()
+        self.slow_query_explain = shared.getenv("SLOW_QUERY_EXPLAIN", "False") == "True"
+        self.slow_query_log_created = False
+        self.close_connection()
+
+    @property
+    def connection(self):
+        """The MongoClient of this process, created on first use."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = pymongo.MongoClient(self.uri, **client_options())
+        return self._client
+
+    @property
+    def database(self):
+        """The database of this process's client."""
+        return self.connection[self.database_name]
+
+    def reset_after_fork(self):
+        """Forget the parent's client in a forked child.
+
+        The client is not closed, its sockets and monitor threads belong to
+        the parent.
+        """
+        self._client = None
+        self._client_lock = threading.Lock()
 
+    def check_connection(self):
+        """Ping the deployment and exit if it cannot be reached."""
+        client = self.connection
         try:
-            self.connection.admin.command("ping")
+            client.admin.command("ping")
             print(
                 Fore.GREEN
                 + "Pinged your deployment. You successfully connected to MongoDB!"
@@ -52,17 +219,136 @@ class DatabaseMongoManager(DatabaseInterface):
         except ServerSelectionTimeoutError as e:
             print(Fore.RED + f"Server selection timeout error: {e}" + Style.RESET_ALL)
             sys.exit(1)
-        if database == "":
-            database = "cs3528_testing"
-        self.database = self.connection[database]
 
-    def get_all(self, table):
-        """Get all records from a table."""
-        return list(self.database[table].find())
+    def health_check(self):
+        """Ping the deployment without raising.
+        Returns:
+            dict: "ok", the round trip in "latency_ms" or the "error"
+        """
+        start = time.perf_counter()
+        try:
+            self.connection.admin.command("ping")
+        except (ConfigurationError, OperationFailure, ServerSelectionTimeoutError) as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "latency_ms": (time.perf_counter() - start) * 1000}
+
+    def _find(self, table, query, projection=None):
+        """Find the records matching a query, logging it if it is slow."""
+        start = time.perf_counter()
+        records = list(self.database[table].find(query, projection))
+        self._check_slow("find", table, query, start, len(records))
+        return records
+
+    def _find_one(self, table, query, projection=None):
+        """Find the first record matching a query, logging it if it is slow."""
+        start = time.perf_counter()
+        record = self.database[table].find_one(query, projection)
+        self._check_slow("find_one", table, query, start, int(record is not None))
+        return record
+
+    def _check_slow(self, operation, table, query, start, documents, command=None):
+        """Log an operation that took longer than the slow query threshold.
+        Args:
+            command: The command explained, a find with the query if None
+        """
+        duration = (time.perf_counter() - start) * 1000
+        if (
+            self.slow_query_ms is None
+            or duration < self.slow_query_ms
+            or table == SLOW_QUERY_TABLE
+        ):
+            return
+        entry = {
+            "created_at": datetime.now().isoformat(),
+            "table": table,
+            "operation": operation,
+            "filter": json.dumps(redact(query), sort_keys=True),
+            "duration_ms": round(duration, 1),
+            "documents": documents,
+        }
+        print(
+            Fore.YELLOW
+            + f"Slow {operation} on {table} ({entry['duration_ms']} ms, "
+            + f"{documents} documents): {entry['filter']}"
+            + Style.RESET_ALL
+        )
+        try:
+            if self.slow_query_explain:
+                entry["explain"] = summarize_explain(
+                    self.database.command(
+                        "explain",
+                        command or {"find": table, "filter": query},
+                        verbosity="executionStats",
+                    )
+                )
+            self._slow_query_log().insert_one(entry)
+        except PyMongoError as e:
+            print(Fore.RED + f"Could not log the slow query: {e}" + Style.RESET_ALL)
+
+    def _slow_query_log(self):
+        """The capped slow query collection, created on first use."""
+        if not self.slow_query_log_created:
+            try:
+                self.database.create_collection(
+                    SLOW_QUERY_TABLE,
+                    capped=True,
+                    size=int(shared.getenv("SLOW_QUERY_LOG_BYTES", "10485760")),
+                )
+            except CollectionInvalid:
+                pass
+            self.slow_query_log_created = True
+        return self.database[SLOW_QUERY_TABLE]
+
+    def get_slow_queries(self, limit=100):
+        """Get the most recent slow operations, newest first.
+        Args:
+            limit: The number of operations to return
+        """
+        return list(
+            self.database[SLOW_QUERY_TABLE]
+            .find({}, {"_id": 0})
+            .sort("$natural", pymongo.DESCENDING)
+            .limit(limit)
+        )
+
+    def _iter(self, table, query, projection=None, batch_size=None):
+        """Yield the records matching a query, fetched a batch at a time."""
+        with self.database[table].find(
+            query, projection, batch_size=batch_size or ITER_BATCH_SIZE
+        ) as cursor:
+            yield from cursor
 
-    def get_one_by_id(self, table, id_val):
+    def iter_all(self, table, projection=None, batch_size=None):
+        """Iterate over all records of a table without loading them all.
+        Args:
+            table: The table to read
+            projection: Fields to return, see `core.projections`
+            batch_size: Records fetched per round trip, ITER_BATCH_SIZE if None
+        """
+        return self._iter(table, {}, projection, batch_size)
+
+    def iter_by_field(self, table, field, value, projection=None, batch_size=None):
+        """Iterate over the records where a field matches a value.
+        Args:
+            table: The table to read
+            field: The field to search
+            value: The value to search
+            projection: Fields to return, see `core.projections`
+            batch_size: Records fetched per round trip, ITER_BATCH_SIZE if None
+        """
+        return self._iter(table, {field: value}, projection, batch_size)
+
+    def get_all(self, table, projection=None):
+        """Get all records from a table.
+        Args:
+            table: The table to search
+            projection: Fields to return, see `core.projections`
+        """
+        return self._find(table, {}, projection)
+
+    def get_one_by_id(self, table, id_val, projection=None):
         """Get one record by ID."""
-        return self.database[table].find_one({"_id": id_val})
+        return self._find_one(table, {"_id": id_val}, projection)
 
     def insert(self, table, data):
         """Insert a record into a table."""
@@ -132,13 +418,14 @@ class DatabaseMongoManager(DatabaseInterface):
         """
         return self.database[table].delete_many({})
 
-    def get_by_email(self, table, email):
+    def get_by_email(self, table, email, projection=None):
         """Get a record by email.
         Args:
             table: The table to search
             email: The email to search
+            projection: Fields to return, see `core.projections`
         """
-        return self.database[table].find_one({"email": email})
+        return self._find_one(table, {"email": email}, projection)
 
     def delete_field_by_id(self, table, id_val, field):
         """Delete a field by ID.
@@ -149,47 +436,112 @@ class DatabaseMongoManager(DatabaseInterface):
         """
         return self.database[table].update_one({"_id": id_val}, {"$unset": {field: ""}})
 
-    def get_one_by_field(self, table, field, value):
+    def get_one_by_field(self, table, field, value, projection=None):
         """Get one record by field."""
-        return self.database[table].find_one({field: value})
+        return self._find_one(table, {field: value}, projection)
 
-    def get_one_by_field_strict(self, table, field, value):
+    def get_one_by_field_strict(self, table, field, value, projection=None):
         """Get one record by field with strict matching."""
-        return self.database[table].find_one(
-            {field: {"$regex": f"^{value}$", "$options": "i"}}
+        return self._find_one(
+            table,
+            {field: {"$regex": f"^{re.escape(value)}$", "$options": "i"}},
+            projection,
         )
 
     def is_table(self, table):
         """Check if a table exists."""
         return table in self.table_list
 
-    def get_all_by_two_fields(self, table, field1, value1, field2, value2):
+    def get_all_by_two_fields(
+        self, table, field1, value1, field2, value2, projection=None
+    ):
         """Get all records by two fields."""
-        return list(self.database[table].find({field1: value1, field2: value2}))
+        return self._find(table, {field1: value1, field2: value2}, projection)
 
-    def get_all_by_in_list(self, table, field, values_list):
+    def get_all_by_in_list(self, table, field, values_list, projection=None):
         """Get all records by a list of values."""
-        return list(self.database[table].find({field: {"$in": values_list}}))
+        return self._find(table, {field: {"$in": values_list}}, projection)
 
     def update_by_field(self, table, field, value, data):
         """Update a record by field."""
         return self.database[table].update_one({field: value}, {"$set": data})
 
-    def get_all_by_field(self, table, field, value):
+    def get_all_by_field(self, table, field, value, projection=None):
         """Get all records by field."""
-        return list(self.database[table].find({field: value}))
+        return self._find(table, {field: value}, projection)
 
     def create_index(self, table, field):
         """Create an index on a field."""
         return self.database[table].create_index(field)
 
-    def get_all_by_text_search(self, table, search_text):
+    def ensure_indexes(self, indexes, create=True, drop_extra=False):
+        """Reconcile the indexes of each table with a specification.
+        Args:
+            indexes: Table -> list of index specs, see `core.indexes`
+            create: Create the missing indexes, otherwise only report them
+            drop_extra: Drop indexes that are not in the specification
+        Returns:
+            dict: "table.index" names that are "existing", "missing",
+            "created", "extra", "dropped" or "failed" with the error
+        """
+        return reconcile_indexes(
+            indexes,
+            lambda table: list(self.database[table].list_indexes()),
+            lambda table, spec: self.database[table].create_index(
+                index_keys(spec),
+                name=index_name(spec),
+                unique=spec.get("unique", False),
+                sparse=spec.get("sparse", False),
+            ),
+            lambda table, name: self.database[table].drop_index(name),
+            create,
+            drop_extra,
+        )
+
+    def count_by_filter(self, table, query):
+        """Count the records matching a query on the server.
+        Args:
+            table: The table to count
+            query: The query, {} counts every record
+        """
+        start = time.perf_counter()
+        count = self.database[table].count_documents(query)
+        self._check_slow(
+            "count", table, query, start, count, {"count": table, "query": query}
+        )
+        return count
+
+    def aggregate(self, table, pipeline):
+        """Run an aggregation pipeline on the server.
+        Args:
+            table: The table to aggregate
+            pipeline: The list of stages, such as $match, $group and $count
+        Returns:
+            list: The resulting documents
+        """
+        start = time.perf_counter()
+        results = list(self.database[table].aggregate(pipeline))
+        self._check_slow(
+            "aggregate",
+            table,
+            # The stages by name, so the logged shape shows each of them
+            {name: argument for stage in pipeline for name, argument in stage.items()},
+            start,
+            len(results),
+            {"aggregate": table, "pipeline": pipeline, "cursor": {}},
+        )
+        return results
+
+    def get_all_by_text_search(self, table, search_text, projection=None):
         """Get all records by text search."""
-        return list(self.database[table].find({"$text": {"$search": search_text}}))
+        return self._find(table, {"$text": {"$search": search_text}}, projection)
 
     def close_connection(self):
-        """Close the connection to the database."""
-        self.connection.close()
+        """Close the connection to the database, the next use reconnects."""
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
 
     def delete_collection(self, table):
         """Delete a collection."""
@@ -198,3 +550,66 @@ class DatabaseMongoManager(DatabaseInterface):
     def insert_many(self, table, data):
         """Insert many records into a table."""
         return self.database[table].insert_many(data)
+
+    def update_many(self, table, query, update, array_filters=None):
+        """Apply an update document to every record matching the query.
+        Args:
+            table: The table to update
+            query: The filter of the records to update
+            update: The update document, such as {"$pull": {...}}
+            array_filters: Filters for the $[identifier] array elements to update
+        """
+        return self.database[table].update_many(
+            query, update, array_filters=array_filters
+        )
+
+    def bulk_write(self, table, operations, ordered=False):
+        """Run write operations in batches of BULK_BATCH_SIZE.
+        Args:
+            table: The table to write to
+            operations: Operations in the MongoDB bulkWrite syntax, such as
+                {"updateMany": {"filter": {...}, "update": {...}}}
+            ordered: Stop at the first error and run the operations in order
+        Returns:
+            dict: matched, modified, deleted, inserted and upserted counts
+        Raises:
+            ValueError: If an operation is not a bulkWrite operation
+        """
+        counts = dict.fromkeys(
+            ["matched", "modified", "deleted", "inserted", "upserted"], 0
+        )
+        batch = []
+        for operation in operations:
+            ((name, args),) = operation.items()
+            if name not in BULK_OPERATIONS:
+                raise ValueError(f"Unknown bulk write operation: {name}")
+            batch.append(BULK_OPERATIONS[name](args))
+            if len(batch) == BULK_BATCH_SIZE:
+                self._write_batch(table, batch, ordered, counts)
+                batch = []
+        if batch:
+            self._write_batch(table, batch, ordered, counts)
+        return counts
+
+    def _write_batch(self, table, batch, ordered, counts):
+        """Send one batch of a bulk write and add up its counts."""
+        result = self.database[table].bulk_write(batch, ordered=ordered)
+        counts["matched"] += result.matched_count
+        counts["modified"] += result.modified_count
+        counts["deleted"] += result.deleted_count
+        counts["inserted"] += result.inserted_count
+        counts["upserted"] += result.upserted_count
+
+    def bulk_update(self, table, updates):
+        """Set fields on many records by ID in batches.
+        Args:
+            table: The table to update
+            updates: (id, data) pairs, data is set on the record with the id
+        """
+        return self.bulk_write(
+            table,
+            (
+                {"updateOne": {"filter": {"_id": id_val}, "update": {"$set": data}}}
+                for id_val, data in updates
+            ),
+        )
@@ -3,31 +3,61 @@ Handles connection to the MongoDB database and provides access to the collection
 """
 
 import datetime
-from flask import jsonify, session
+import threading
+from flask import g, has_request_context, jsonify, session
+from core import projections
+
+
+class DeadlinePhase:
+    """The deadlines and the phase of the placement process on a day."""
+
+    def __init__(self, deadlines, today, employer_ranked=None):
+        """
+        Args:
+            deadlines: The details, student ranking and opportunities ranking
+                deadlines as dates
+            today: The date to find the phase of
+            employer_ranked: Callable telling if the logged in employer has
+                ranked the students of all their opportunities, None if no
+                employer is logged in
+        """
+        (
+            self.details_deadline,
+            self.student_ranking_deadline,
+            self.opportunities_ranking_deadline,
+        ) = deadlines
+        self.deadlines = deadlines
+        self.is_past_details = today >= self.details_deadline
+        self.is_past_student_ranking = today >= self.student_ranking_deadline
+        self.is_past_opportunities_ranking = (
+            today >= self.opportunities_ranking_deadline
+        )
+
+        if not self.is_past_details:
+            self.deadline_type = 0
+        elif not self.is_past_student_ranking:
+            self.deadline_type = 1
+        elif self.is_past_opportunities_ranking:
+            self.deadline_type = None
+        elif employer_ranked is not None and not employer_ranked():
+            self.deadline_type = 2
+        else:
+            self.deadline_type = 3
 
 
 class DeadlineManager:
     """Handles deadlines for the application."""
 
     def __init__(self):
-        from app import DATABASE_MANAGER
+        from app import CACHE_VERSIONS, DATABASE_MANAGER
 
         self.database_manager = DATABASE_MANAGER
-        details = self.get_details_deadline()
-        student = self.get_student_ranking_deadline()
-        opportunities = self.get_opportunities_ranking_deadline()
-        if details > student or student > opportunities or details > opportunities:
-            self.update_deadlines(
-                details,
-                (
-                    datetime.datetime.strptime(details, "%Y-%m-%d")
-                    + datetime.timedelta(weeks=1)
-                ).strftime("%Y-%m-%d"),
-                (
-                    datetime.datetime.strptime(details, "%Y-%m-%d")
-                    + datetime.timedelta(weeks=2)
-                ).strftime("%Y-%m-%d"),
-            )
+        # Parsed deadlines, loaded on first use and dropped when they are
+        # written by any process
+        self.deadlines = None
+        self.lock = threading.RLock()
+        self.cache_versions = CACHE_VERSIONS
+        CACHE_VERSIONS.on_change("deadline", self.clear_cache)
 
     def get_details_deadline(self):
         """Get the deadline from the database."""
@@ -38,17 +68,120 @@ class DeadlineManager:
             deadline = (datetime.datetime.now() + datetime.timedelta(weeks=1)).strftime(
                 "%Y-%m-%d"
             )
-            self.database_manager.insert("deadline", {"type": 0, "deadline": deadline})
+            deadline = self.insert_default(0, deadline)
         else:
             deadline = find_deadline["deadline"]
         return deadline
 
+    def insert_default(self, deadline_type, deadline):
+        """Store the default of a missing deadline and return the stored one.
+
+        Workers starting on a new database all store the defaults, the upsert
+        only inserts a deadline once, whichever worker wins.
+        """
+        self.database_manager.bulk_write(
+            "deadline",
+            [
+                {
+                    "updateOne": {
+                        "filter": {"type": deadline_type},
+                        "update": {"$setOnInsert": {"deadline": deadline}},
+                        "upsert": True,
+                    }
+                }
+            ],
+        )
+        return self.database_manager.get_one_by_field(
+            "deadline", "type", deadline_type
+        )["deadline"]
+
+    def clear_cache(self, _table=None):
+        """Drop the parsed deadlines, they are loaded again on next use."""
+        with self.lock:
+            self.deadlines = None
+
+    def get_deadlines(self):
+        """The details, student ranking and opportunities ranking deadlines.
+
+        Returns:
+            tuple: The deadlines as dates, read from the database only after
+            they were written
+        """
+        self.cache_versions.check()
+        with self.lock:
+            if self.deadlines is None:
+                stored = {
+                    row["type"]: row["deadline"]
+                    for row in self.database_manager.get_all("deadline")
+                }
+                if len(stored) < 3:
+                    # The getters store the default of a missing deadline
+                    stored = {
+                        0: self.get_details_deadline(),
+                        1: self.get_student_ranking_deadline(),
+                        2: self.get_opportunities_ranking_deadline(),
+                    }
+                self.deadlines = tuple(
+                    datetime.datetime.strptime(stored[i], "%Y-%m-%d").date()
+                    for i in range(3)
+                )
+            return self.deadlines
+
+    def check_order(self):
+        """Store the missing deadlines and put them back in order.
+
+        If the deadlines are out of order, the ranking deadlines are moved one
+        and two weeks after the details deadline.
+        """
+        details = self.get_details_deadline()
+        student = self.get_student_ranking_deadline()
+        opportunities = self.get_opportunities_ranking_deadline()
+        if details > student or student > opportunities or details > opportunities:
+            details_date = datetime.datetime.strptime(details, "%Y-%m-%d")
+            for deadline_type in (1, 2):
+                self.database_manager.update_one_by_field(
+                    "deadline",
+                    "type",
+                    deadline_type,
+                    {
+                        "deadline": (
+                            details_date + datetime.timedelta(weeks=deadline_type)
+                        ).strftime("%Y-%m-%d")
+                    },
+                )
+
+    def get_phase(self):
+        """The phase of the placement process, computed once per request."""
+        deadlines = self.get_deadlines()
+        if not has_request_context():
+            return self.compute_phase(deadlines)
+        phase = g.get("deadline_phase")
+        if phase is None or phase.deadlines is not deadlines:
+            phase = g.deadline_phase = self.compute_phase(deadlines)
+        return phase
+
+    def compute_phase(self, deadlines):
+        """The phase of the placement process today."""
+        employer_ranked = None
+        if has_request_context() and session.get("employer"):
+            employer_ranked = self.has_employer_ranked
+        return DeadlinePhase(deadlines, datetime.date.today(), employer_ranked)
+
+    def has_employer_ranked(self):
+        """Check if the logged in employer has ranked every opportunity."""
+        return all(
+            "preferences" in opportunity
+            for opportunity in self.database_manager.get_all_by_field(
+                "opportunities",
+                "employer_id",
+                session["employer"]["_id"],
+                projections.OPPORTUNITY_RANKING,
+            )
+        )
+
     def is_past_details_deadline(self) -> bool:
         """Check if the deadline has passed."""
-        deadline = self.get_details_deadline()
-        return datetime.datetime.now() >= datetime.datetime.strptime(
-            deadline, "%Y-%m-%d"
-        )
+        return datetime.date.today() >= self.get_deadlines()[0]
 
     def get_student_ranking_deadline(self):
         """Get the deadline from the database."""
@@ -60,15 +193,14 @@ class DeadlineManager:
                 datetime.datetime.strptime(self.get_details_deadline(), "%Y-%m-%d")
                 + datetime.timedelta(weeks=1)
             ).strftime("%Y-%m-%d")
-            self.database_manager.insert("deadline", {"type": 1, "deadline": deadline})
+            deadline = self.insert_default(1, deadline)
         else:
             deadline = find_deadline["deadline"]
         return deadline
 
     def is_past_student_ranking_deadline(self) -> bool:
         """Check if the deadline has passed."""
-        deadline = self.get_student_ranking_deadline()
-        return datetime.datetime.now().strftime("%Y-%m-%d") >= deadline
+        return datetime.date.today() >= self.get_deadlines()[1]
 
     def get_opportunities_ranking_deadline(self):
         """Get the deadline from the database."""
@@ -82,15 +214,14 @@ class DeadlineManager:
                 )
                 + datetime.timedelta(weeks=1)
             ).strftime("%Y-%m-%d")
-            self.database_manager.insert("deadline", {"type": 2, "deadline": deadline})
+            deadline = self.insert_default(2, deadline)
         else:
             deadline = find_deadline["deadline"]
         return deadline
 
     def is_past_opportunities_ranking_deadline(self) -> bool:
         """Check if the deadline has passed."""
-        deadline = self.get_opportunities_ranking_deadline()
-        return datetime.datetime.now().strftime("%Y-%m-%d") >= deadline
+        return datetime.date.today() >= self.get_deadlines()[2]
 
     def update_deadlines(
         self, details_deadline, student_ranking_deadline, opportunities_ranking_deadline
@@ -141,29 +272,12 @@ class DeadlineManager:
         return jsonify({"message": "All deadlines updated successfully"}), 200
 
     def get_deadline_type(self):
+        """The phase of the placement process for the current user.
 
-        if "employer" in session:
-            pass
-
-        if not self.is_past_details_deadline():
-            return 0
-
-        if not self.is_past_student_ranking_deadline():
-            return 1
-
-        if not self.is_past_opportunities_ranking_deadline() and session.get(
-            "employer"
-        ):
-            employer_id = session["employer"]["_id"]
-            opps = self.database_manager.get_all_by_field(
-                "opportunities", "employer_id", employer_id
-            )
-            for opp in opps:
-                if "preferences" not in opp:
-                    return 2
-            return 3
-
-        elif not self.is_past_opportunities_ranking_deadline():
-            return 3
-
-        return None
+        Returns:
+            int: 0 before the details deadline, 1 before the student ranking
+            deadline, 2 before the opportunities ranking deadline for employers
+            who have not ranked every opportunity, 3 for everyone else, None
+            once every deadline has passed
+        """
+        return self.get_phase().deadline_type
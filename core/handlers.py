@@ -16,6 +16,7 @@ from flask import (
     request,
 )
 from flask_caching import Cache
+from openpyxl import Workbook
 import pandas as pd
 from core import routes_error
 from user import routes_user
@@ -157,6 +158,24 @@ def clear_session_save_theme():
     session["theme"] = theme
 
 
+def write_excel(path, columns, rows):
+    """
+    Writes rows to an Excel file one at a time.
+    Args:
+        path (str): The file to write.
+        columns (list): The column names, in order.
+        rows (iterable): Dicts of column name to value, missing columns are left empty.
+    Unlike a DataFrame the rows are not all held in memory, so exports can
+    stream them from the database.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    sheet.append(columns)
+    for row in rows:
+        sheet.append([row.get(column, "") for column in columns])
+    workbook.save(path)
+
+
 def excel_verifier_and_reader(file, expected_columns: set[str]):
     """
     Verifies and reads an Excel file.
@@ -0,0 +1,79 @@
+"""
+Request-scoped identity map.
+
+A request often reads the same records more than once, such as a route
+loading a student and the model loading it again to update it. The
+single-record read methods of the app's database manager are wrapped so each
+record read while handling a request is kept on flask.g, keyed by the method
+and its arguments, and repeated reads in the same request are answered from
+it.
+
+Writes through the manager drop the reads of the written table, and the map
+goes away with the request, so reads never outlive a request. Records are
+copied in and out, callers can change them freely. Reads of many records
+are not kept, copying them would cost more than most repeated reads save.
+"""
+
+import copy
+from functools import wraps
+import inspect
+
+from flask import g, has_request_context
+
+from core.read_cache import on_write
+
+# Read methods returning a single record, the only reads kept
+MAPPED_METHODS = {
+    "get_one_by_id",
+    "get_one_by_field",
+    "get_one_by_field_strict",
+    "get_by_email",
+}
+
+
+def get_identity_map():
+    """Reads made in the current request by table, or None outside requests."""
+    if not has_request_context():
+        return None
+    if "identity_map" not in g:
+        g.identity_map = {}
+    return g.identity_map
+
+
+def mapped_read(name, method):
+    """Wrap a read method to answer repeated reads in a request from the map."""
+    signature = inspect.signature(method)
+
+    @wraps(method)
+    def wrap(*args, **kwargs):
+        identity_map = get_identity_map()
+        if identity_map is None:
+            return method(*args, **kwargs)
+        arguments = signature.bind(*args, **kwargs).arguments
+        reads = identity_map.setdefault(arguments["table"], {})
+        key = (name, repr(tuple(arguments.items())))
+        if key in reads:
+            return copy.deepcopy(reads[key])
+        result = method(*args, **kwargs)
+        reads[key] = copy.deepcopy(result)
+        return result
+
+    return wrap
+
+
+def forget_table(table):
+    """Drop the reads of a table made in the current request."""
+    identity_map = get_identity_map()
+    if identity_map is not None:
+        identity_map.pop(table, None)
+
+
+def use_identity_map(database_manager):
+    """Keep the records read through a manager for the rest of each request."""
+    for name in sorted(MAPPED_METHODS):
+        setattr(
+            database_manager,
+            name,
+            mapped_read(name, getattr(database_manager, name)),
+        )
+    on_write(database_manager, forget_table)
@@ -0,0 +1,145 @@
+"""
+Index reconciliation.
+
+The indexes every table needs are declared in `indexes` next to `tables` in
+app.py and reconciled by each worker before its first request, unless
+SYNC_INDEXES is "False".
+Reconciling is idempotent: indexes that already exist are left alone, missing
+ones are created and extra ones are reported.
+
+Each table maps to a list of index specs:
+    {"fields": ["email"], "unique": True}    # unique index
+    {"fields": ["preferences"]}              # multikey index on a list field
+    {"fields": ["title", "description"], "text": True}    # text index
+A "sparse" index leaves out the records without its fields, so a sparse
+unique index allows any number of them.
+
+Run from the project root to check or reconcile without starting the app:
+    python -m core.indexes --check          # only report missing and extra
+    python -m core.indexes                  # create missing indexes
+    python -m core.indexes --drop-extra     # also drop extra indexes
+"""
+
+import argparse
+import sys
+
+import pymongo
+from pymongo.errors import OperationFailure
+
+
+def index_keys(spec):
+    """Key list of an index spec."""
+    direction = pymongo.TEXT if spec.get("text") else pymongo.ASCENDING
+    return [(field, direction) for field in spec["fields"]]
+
+
+def index_name(spec):
+    """Name of an index spec, the same name MongoDB would give it."""
+    return "_".join(f"{field}_{direction}" for field, direction in index_keys(spec))
+
+
+def index_matches(index, spec):
+    """Check if an existing index has the keys and options of a spec."""
+    if bool(index.get("unique")) != spec.get("unique", False):
+        return False
+    if bool(index.get("sparse")) != spec.get("sparse", False):
+        return False
+    if spec.get("text"):
+        return "_fts" in index["key"] and set(index.get("weights", {})) == set(
+            spec["fields"]
+        )
+    return list(index["key"].items()) == index_keys(spec)
+
+
+def reconcile_indexes(
+    indexes, list_indexes, create_index, drop_index, create=True, drop_extra=False
+):
+    """Reconcile the indexes of each table with a specification.
+
+    The database backends pass how they list, create and drop the indexes of
+    a table, indexes are listed in the format of MongoDB's listIndexes.
+
+    Returns:
+        dict: "table.index" names that are "existing", "missing", "created",
+        "extra", "dropped" or "failed" with the error
+    """
+    report = {
+        "existing": [],
+        "missing": [],
+        "created": [],
+        "extra": [],
+        "dropped": [],
+        "failed": [],
+    }
+    for table, specs in indexes.items():
+        current = list_indexes(table)
+        matched = set()
+        missing = []
+        for spec in specs:
+            found = next(
+                (index for index in current if index_matches(index, spec)), None
+            )
+            if found is None:
+                missing.append(spec)
+            else:
+                matched.add(found["name"])
+                report["existing"].append(f"{table}.{found['name']}")
+
+        for index in current:
+            if index["name"] == "_id_" or index["name"] in matched:
+                continue
+            report["extra"].append(f"{table}.{index['name']}")
+            if drop_extra:
+                drop_index(table, index["name"])
+                report["dropped"].append(f"{table}.{index['name']}")
+
+        for spec in missing:
+            name = index_name(spec)
+            if not create:
+                report["missing"].append(f"{table}.{name}")
+                continue
+            try:
+                create_index(table, spec)
+                report["created"].append(f"{table}.{name}")
+            except OperationFailure as e:
+                report["failed"].append(f"{table}.{name}: {e}")
+    return report
+
+
+def format_report(report):
+    """Summarise an index report in printable lines."""
+    lines = [
+        "Indexes: "
+        + ", ".join(
+            f"{len(report[key])} {key}"
+            for key in ("existing", "created", "missing", "extra", "dropped", "failed")
+        )
+    ]
+    for key in ("created", "missing", "extra", "dropped", "failed"):
+        lines.extend(f"  {key}: {name}" for name in report[key])
+    return lines
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Reconcile the database indexes")
+    parser.add_argument(
+        "--check", action="store_true", help="only report missing and extra indexes"
+    )
+    parser.add_argument(
+        "--drop-extra", action="store_true", help="drop indexes not in the spec"
+    )
+    args = parser.parse_args(argv)
+
+    from app import DATABASE_MANAGER, indexes  # pylint: disable=import-outside-toplevel
+
+    report = DATABASE_MANAGER.ensure_indexes(
+        indexes, create=not args.check, drop_extra=args.drop_extra and not args.check
+    )
+    for line in format_report(report):
+        print(line)
+    return 1 if report["failed"] or report["missing"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
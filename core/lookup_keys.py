@@ -0,0 +1,125 @@
+"""
+Normalised lookup keys.
+
+Emails and company names are looked up ignoring case and surrounding
+whitespace. Instead of an unindexable case-insensitive $regex, every record
+stores a normalised copy of those fields next to them, which is indexed and
+looked up by equality:
+    {"email": "Ada@Example.com", "email_key": "ada@example.com"}
+
+The models add the keys with `add_keys` whenever they write the fields and
+look records up with `find_by_key`. Records written before the keys existed
+are backfilled before the first request of each worker, unless SYNC_INDEXES is
+"False", or from the project root with:
+    python -m core.lookup_keys --check      # only report records to backfill
+    python -m core.lookup_keys              # backfill the keys
+"""
+
+import argparse
+import sys
+
+# Table -> field -> the field its normalised key is stored in
+KEY_FIELDS = {
+    "users": {"email": "email_key"},
+    "students": {"email": "email_key"},
+    "employers": {"email": "email_key", "company_name": "company_name_key"},
+}
+
+
+def normalise(value):
+    """Lookup key of a value, casefolded with whitespace collapsed."""
+    return " ".join(str(value).split()).casefold()
+
+
+def add_keys(table, document):
+    """Set the lookup keys of the fields of a document being written."""
+    for field, key in KEY_FIELDS[table].items():
+        if document.get(field) is not None:
+            document[key] = normalise(document[field])
+    return document
+
+
+# Whether every record has its keys. Until then a record without the key is
+# also looked up by the exact value, a second query on every miss.
+backfill_state = {"done": False}
+
+
+def find_by_key(database_manager, table, field, value, projection=None):
+    """Find a record by the normalised value of a field.
+
+    Until the keys are backfilled, a record without the key is still found by
+    the exact value.
+    """
+    record = database_manager.get_one_by_field(
+        table, KEY_FIELDS[table][field], normalise(value), projection
+    )
+    if record is None and not backfill_state["done"]:
+        record = database_manager.get_one_by_field(table, field, value, projection)
+    return record
+
+
+def check_backfilled(database_manager):
+    """Check if every record with a keyed field has its key, ending the lookup
+    by exact value if so.
+    Returns:
+        bool: Whether the keys are backfilled
+    """
+    backfill_state["done"] = not any(
+        database_manager.count_by_filter(
+            table, {field: {"$ne": None}, key: {"$exists": False}}
+        )
+        for table, fields in KEY_FIELDS.items()
+        for field, key in fields.items()
+    )
+    return backfill_state["done"]
+
+
+def backfill(database_manager, tables=None, write=True):
+    """Set the missing or outdated lookup keys of every record.
+    Args:
+        database_manager: The database to backfill
+        tables: The tables to backfill, all of KEY_FIELDS if None
+        write: Write the keys, otherwise only count the records to backfill
+    Returns:
+        dict: Table -> records backfilled, or to backfill if not write
+    """
+    counts = {}
+    for table in tables or KEY_FIELDS:
+        fields = KEY_FIELDS[table]
+        updates = []
+        for record in database_manager.iter_all(table, [*fields, *fields.values()]):
+            keys = add_keys(table, {field: record.get(field) for field in fields})
+            changed = {
+                key: keys[key]
+                for key in fields.values()
+                if key in keys and record.get(key) != keys[key]
+            }
+            if changed:
+                updates.append((record["_id"], changed))
+        if write and updates:
+            database_manager.bulk_update(table, updates)
+        counts[table] = len(updates)
+    if write and set(tables or KEY_FIELDS) == set(KEY_FIELDS):
+        backfill_state["done"] = True
+    return counts
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Backfill the lookup keys")
+    parser.add_argument(
+        "--check", action="store_true", help="only report the records to backfill"
+    )
+    args = parser.parse_args(argv)
+
+    from app import DATABASE_MANAGER  # pylint: disable=import-outside-toplevel
+
+    counts = backfill(DATABASE_MANAGER, write=not args.check)
+    verb = "to backfill" if args.check else "backfilled"
+    for table, count in counts.items():
+        print(f"{table}: {count} records {verb}")
+    return 1 if args.check and any(counts.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Named field projections for the database read methods.
+
+Passing a projection to a read only returns the listed fields (plus "_id"),
+so hot reads over large collections do not transfer and decode fields such as
+comments, skills or password hashes that the caller never uses.
+"""
+
+# Students and opportunities as needed by the matching
+MATCHING_STUDENT = ["student_id", "email", "first_name", "last_name", "preferences"]
+MATCHING_OPPORTUNITY = ["preferences", "spots_available"]
+
+# Students and opportunities as needed by what-if matching scenarios
+SCENARIO_STUDENT = [*MATCHING_STUDENT, "modules"]
+SCENARIO_OPPORTUNITY = [*MATCHING_OPPORTUNITY, "modules_required"]
+
+# Fields shown in the matches table and used in match emails
+STUDENT_NAME = ["email", "first_name", "last_name"]
+OPPORTUNITY_TITLE = ["title", "employer_id"]
+EMPLOYER_NAME = ["email", "company_name"]
+
+# Fields checked by the dashboard and the problems page
+STUDENT_PROGRESS = ["student_id", "email", "course", "modules", "preferences"]
+OPPORTUNITY_PROGRESS = ["title", "employer_id", "preferences"]
+
+# Whether an employer has ranked the students of their opportunities
+OPPORTUNITY_RANKING = ["preferences"]
+
+# Ids and names used to validate uploads
+EMPLOYER_EMAIL = ["email"]
+MODULE_ID = ["module_id"]
+COURSE_ID = ["course_id"]
+SKILL_NAME = ["skill_name"]
+
+# Users without their password hash
+USER_WITHOUT_PASSWORD = {"password": 0}
@@ -0,0 +1,187 @@
+"""
+Per-request database call accounting.
+
+With DB_PROFILING="True" the methods of the app's database manager are
+wrapped so every call made while handling a request is counted, with the
+documents it returned and the time it took. Calls are grouped by shape, the
+method with its table and field names but not the values, and a shape called
+DB_N_PLUS_ONE_THRESHOLD times or more in one request is reported as an N+1
+query: one call per rendered row where one call for all rows would do.
+
+Each profiled response gets the headers:
+    X-DB-Calls: Database calls made
+    X-DB-Documents: Documents returned
+    Server-Timing: Time spent in the database, shown by browser dev tools
+    X-DB-N-Plus-One: The repeated shapes with their counts, if any
+and N+1 queries are logged as warnings.
+"""
+
+from collections import Counter
+from functools import wraps
+import inspect
+import time
+
+from flask import g, has_request_context, request
+
+from core.database_interface import DatabaseInterface
+
+# Interface methods that are not database calls
+UNPROFILED_METHODS = {
+    "add_table",
+    "get_tables",
+    "is_table",
+    "connect",
+    "close_connection",
+    "health_check",
+}
+
+# Arguments that are part of a call's shape, the others are values
+SHAPE_ARGUMENTS = ("table", "field", "field1", "field2")
+
+
+class RequestProfile:
+    """Database calls made while handling one request."""
+
+    def __init__(self):
+        self.calls = 0
+        self.documents = 0
+        self.time = 0.0
+        self.shapes = Counter()
+        # Calls made by a profiled call, such as bulk_update calling
+        # bulk_write, are part of it
+        self.depth = 0
+
+    def record(self, shape, documents, elapsed):
+        """Add a call to the profile."""
+        self.calls += 1
+        self.documents += documents
+        self.time += elapsed
+        self.shapes[shape] += 1
+
+    def repeated(self, threshold):
+        """Shapes called at least threshold times, most called first."""
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+    def headers(self, threshold):
+        """Response headers summarising the profile."""
+        headers = {
+            "X-DB-Calls": str(self.calls),
+            "X-DB-Documents": str(self.documents),
+            "Server-Timing": (
+                f'db;dur={self.time * 1000:.1f};desc="{self.calls} database calls"'
+            ),
+        }
+        repeated = self.repeated(threshold)
+        if repeated:
+            headers["X-DB-N-Plus-One"] = "; ".join(
+                f"{shape} x{count}" for shape, count in repeated
+            )
+        return headers
+
+
+def get_profile():
+    """The profile of the current request, or None outside a profiled request."""
+    if not has_request_context():
+        return None
+    return g.get("db_profile")
+
+
+def call_shape(name, signature, args, kwargs):
+    """Shape of a call, the method with its table and field names."""
+    try:
+        arguments = signature.bind(*args, **kwargs).arguments
+    except TypeError:
+        return name
+    parts = [str(arguments[key]) for key in SHAPE_ARGUMENTS if key in arguments]
+    if isinstance(arguments.get("query"), dict):
+        parts.append(",".join(sorted(arguments["query"])))
+    return f"{name}({', '.join(parts)})"
+
+
+def count_documents(name, result):
+    """Documents returned by a call, only the get_ methods read documents."""
+    if not name.startswith("get_"):
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return 1
+    return 0
+
+
+def profile_method(name, method):
+    """Wrap a database manager method to record its calls."""
+    signature = inspect.signature(method)
+
+    @wraps(method)
+    def wrap(*args, **kwargs):
+        profile = get_profile()
+        if profile is None or profile.depth:
+            return method(*args, **kwargs)
+        profile.depth += 1
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            profile.depth -= 1
+        profile.record(
+            call_shape(name, signature, args, kwargs),
+            count_documents(name, result),
+            time.perf_counter() - start,
+        )
+        if inspect.isgenerator(result):
+            return count_streamed(profile, result)
+        return result
+
+    return wrap
+
+
+def count_streamed(profile, documents):
+    """Count the documents of an iter_ method as they are read."""
+    for document in documents:
+        profile.documents += 1
+        yield document
+
+
+def instrument(database_manager):
+    """Wrap the database methods of a manager, on the instance."""
+    for name, _ in inspect.getmembers(DatabaseInterface, inspect.isfunction):
+        if name.startswith("_") or name in UNPROFILED_METHODS:
+            continue
+        setattr(
+            database_manager,
+            name,
+            profile_method(name, getattr(database_manager, name)),
+        )
+
+
+def configure_profiling(app, threshold):
+    """Profile the database calls of each request of an app.
+    Args:
+        app: The Flask app
+        threshold: Calls of one shape in a request reported as an N+1 query
+    """
+
+    @app.before_request
+    def start_profile():
+        g.db_profile = RequestProfile()
+
+    @app.after_request
+    def add_profile_headers(response):
+        profile = g.pop("db_profile", None)
+        if profile is None:
+            return response
+        response.headers.update(profile.headers(threshold))
+        repeated = profile.repeated(threshold)
+        if repeated:
+            app.logger.warning(
+                "N+1 database queries on %s %s: %s",
+                request.method,
+                request.path,
+                ", ".join(f"{shape} x{count}" for shape, count in repeated),
+            )
+        return response
@@ -0,0 +1,197 @@
+"""
+Read-through cache of reference tables.
+
+With DB_CACHE_TABLES set to a comma separated list of tables, the read
+methods of the app's database manager are wrapped so reads of those tables
+are served from a process-local cache. Entries are keyed by the method and
+its arguments, the least recently used ones are evicted past DB_CACHE_SIZE
+entries and each one expires DB_CACHE_TTL seconds after it was read.
+
+Every insert, update or delete of a cached table made through the same
+manager drops its entries, so reads after a write see the write. Writes made
+by other processes are seen at the start of the next request through the
+table versions of core/cache_versions.py, or once the entries expire.
+
+Only small tables that are read far more than they are written, such as
+skills, employers, deadline and config, are worth caching.
+"""
+
+from collections import Counter, OrderedDict
+import copy
+from functools import wraps
+import inspect
+import threading
+import time
+
+from core.database_interface import DatabaseInterface
+
+# Interface methods taking a table that do not change its records
+UNCACHED_METHODS = {"add_table", "is_table", "create_index"}
+
+# Interface methods reading records that are not named get_
+READ_METHODS = {"count_by_filter", "aggregate"}
+
+# Returned by ReadCache.get when a read is not cached
+MISS = object()
+
+
+class ReadCache:
+    """LRU cache of database reads with a time to live."""
+
+    def __init__(self, tables, max_entries=1024, ttl=300, versions=None):
+        self.tables = set(tables)
+        self.versions = versions
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key: (expiry time, table, result)
+        self.entries = OrderedDict()
+        # Bumped by each write so reads started before it are not stored
+        self.generations = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """The cached result of a read, or MISS."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return MISS
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry[2])
+
+    def generation(self, table):
+        """Writes made to a table so far."""
+        with self.lock:
+            return self.generations[table]
+
+    def put(self, key, table, generation, result):
+        """Cache the result of a read, unless the table was written since."""
+        result = copy.deepcopy(result)
+        with self.lock:
+            if self.generations[table] != generation:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, table, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, table):
+        """Drop the cached reads of a table."""
+        if table not in self.tables:
+            return
+        with self.lock:
+            self.generations[table] += 1
+            for key in [
+                key for key, entry in self.entries.items() if entry[1] == table
+            ]:
+                del self.entries[key]
+
+    def clear(self):
+        """Drop every cached read."""
+        with self.lock:
+            for table in self.tables:
+                self.generations[table] += 1
+            self.entries.clear()
+
+    def stats(self):
+        """Hits, misses and entries of the cache."""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+            }
+
+
+def cached_read(cache, name, method):
+    """Wrap a read method to serve reads of the cached tables from the cache."""
+    signature = inspect.signature(method)
+
+    @wraps(method)
+    def wrap(*args, **kwargs):
+        arguments = signature.bind(*args, **kwargs).arguments
+        table = arguments["table"]
+        if table not in cache.tables:
+            return method(*args, **kwargs)
+        if cache.versions is not None:
+            cache.versions.check()
+        key = (name, repr(tuple(arguments.items())))
+        result = cache.get(key)
+        if result is not MISS:
+            return result
+        generation = cache.generation(table)
+        result = method(*args, **kwargs)
+        cache.put(key, table, generation, result)
+        return result
+
+    return wrap
+
+
+def notify_write(callback, method):
+    """Wrap a write method to call back with its table once it is done."""
+    signature = inspect.signature(method)
+
+    @wraps(method)
+    def wrap(*args, **kwargs):
+        table = signature.bind(*args, **kwargs).arguments["table"]
+        try:
+            return method(*args, **kwargs)
+        finally:
+            callback(table)
+
+    return wrap
+
+
+def table_methods():
+    """Interface methods of a manager taking a table, as (name, is_read)."""
+    for name, function in inspect.getmembers(DatabaseInterface, inspect.isfunction):
+        parameters = list(inspect.signature(function).parameters)
+        if (
+            name.startswith(("_", "iter_"))
+            or name in UNCACHED_METHODS
+            or parameters[1:2] != ["table"]
+        ):
+            continue
+        yield name, name.startswith("get_") or name in READ_METHODS
+
+
+def on_write(database_manager, callback):
+    """Call back with the table of each write made through a manager."""
+    for name, is_read in table_methods():
+        if not is_read:
+            setattr(
+                database_manager,
+                name,
+                notify_write(callback, getattr(database_manager, name)),
+            )
+
+
+def cache_reads(database_manager, tables, max_entries=1024, ttl=300, versions=None):
+    """Cache the reads of some tables of a manager, on the instance.
+    Args:
+        database_manager: The manager to wrap
+        tables: The tables to cache
+        max_entries: Reads kept before the least recently used are evicted
+        ttl: Seconds a read is kept
+        versions: CacheVersions dropping the reads of tables written by
+            other processes, see core/cache_versions.py
+    Returns:
+        ReadCache: The cache, to clear it or read its stats
+    """
+    cache = ReadCache(tables, max_entries, ttl, versions)
+    for name, is_read in table_methods():
+        if is_read:
+            setattr(
+                database_manager,
+                name,
+                cached_read(cache, name, getattr(database_manager, name)),
+            )
+    on_write(database_manager, cache.invalidate)
+    if versions is not None:
+        for table in cache.tables:
+            versions.on_change(table, cache.invalidate)
+    return cache
@@ -9,7 +9,7 @@ import uuid
 import pandas as pd
 from flask import send_file, jsonify
 
-from core import handlers
+from core import cascades, handlers
 
 # Cache to store modules and the last update time
 modules_cache = {"data": None, "last_updated": None}
@@ -56,22 +56,7 @@ class Module:
 
         DATABASE_MANAGER.delete_by_id("modules", module["_id"])
 
-        students = DATABASE_MANAGER.get_all("students")
-        for student in students:
-            if "modules" in student and module_id in student["modules"]:
-                student["modules"].remove(module_id)
-                DATABASE_MANAGER.update_one_by_id("students", student["_id"], student)
-
-        opportunities = DATABASE_MANAGER.get_all("opportunities")
-        for opportunity in opportunities:
-            if (
-                "modules_required" in opportunity
-                and module_id in opportunity["modules_required"]
-            ):
-                opportunity["modules_required"].remove(module_id)
-                DATABASE_MANAGER.update_one_by_id(
-                    "opportunities", opportunity["_id"], opportunity
-                )
+        cascades.remove_references(DATABASE_MANAGER, "module", [module_id])
 
         # Update cache
         modules = DATABASE_MANAGER.get_all("modules")
@@ -92,22 +77,7 @@ class Module:
 
         DATABASE_MANAGER.delete_by_id("modules", uuid)
 
-        students = DATABASE_MANAGER.get_all("students")
-        for student in students:
-            if "modules" in student and module["module_id"] in student["modules"]:
-                student["modules"].remove(module["module_id"])
-                DATABASE_MANAGER.update_one_by_id("students", student["_id"], student)
-
-        opportunities = DATABASE_MANAGER.get_all("opportunities")
-        for opportunity in opportunities:
-            if (
-                "modules_required" in opportunity
-                and uuid in opportunity["modules_required"]
-            ):
-                opportunity["modules_required"].remove(module["module_id"])
-                DATABASE_MANAGER.update_one_by_id(
-                    "opportunities", opportunity["_id"], opportunity
-                )
+        cascades.remove_references(DATABASE_MANAGER, "module", [module["module_id"]])
 
         # Update cache
         modules = DATABASE_MANAGER.get_all("modules")
@@ -149,7 +119,9 @@ class Module:
         """Retrieves all modules."""
         current_time = datetime.now()
         one_week_ago = current_time - timedelta(weeks=1)
-        from app import DATABASE_MANAGER
+        from app import CACHE_VERSIONS, DATABASE_MANAGER
+
+        CACHE_VERSIONS.check()
 
         # Check if cache is valid
         if (
@@ -182,6 +154,11 @@ class Module:
         modules_cache["data"] = DATABASE_MANAGER.get_all("modules")
         modules_cache["last_updated"] = datetime.now()
 
+    def clear_cache(self, _table=None):
+        """Clear cache, called when another process writes the modules"""
+        modules_cache["data"] = None
+        modules_cache["last_updated"] = None
+
     def update_module_by_uuid(self, uuid, module_id, module_name, module_description):
         """Updates a module in the database."""
 
@@ -200,27 +177,9 @@ class Module:
 
         DATABASE_MANAGER.update_one_by_id("modules", uuid, updated_module)
 
-        students = DATABASE_MANAGER.get_all("students")
-        for student in students:
-            if (
-                "modules" in student
-                and original_module["module_id"] in student["modules"]
-            ):
-                student["modules"].remove(original_module["module_id"])
-                student["modules"].append(module_id)
-                DATABASE_MANAGER.update_one_by_id("students", student["_id"], student)
-
-        opportunities = DATABASE_MANAGER.get_all("opportunities")
-        for opportunity in opportunities:
-            if (
-                "modules_required" in opportunity
-                and original_module["module_id"] in opportunity["modules_required"]
-            ):
-                opportunity["modules_required"].remove(original_module["module_id"])
-                opportunity["modules_required"].append(module_id)
-                DATABASE_MANAGER.update_one_by_id(
-                    "opportunities", opportunity["_id"], opportunity
-                )
+        cascades.rename_references(
+            DATABASE_MANAGER, "module", original_module["module_id"], module_id
+        )
 
         # Update cache
         modules = DATABASE_MANAGER.get_all("modules")
@@ -237,25 +196,7 @@ class Module:
         modules_cache["data"] = []
         modules_cache["last_updated"] = datetime.now()
 
-        students = DATABASE_MANAGER.get_all("students")
-        DATABASE_MANAGER.delete_all("students")
-        updated_students = []
-        for student in students:
-            if "modules" in student:
-                student["modules"] = []
-            updated_students.append(student)
-
-        if updated_students:
-            DATABASE_MANAGER.insert_many("students", updated_students)
-
-        opportunities = DATABASE_MANAGER.get_all("opportunities")
-        DATABASE_MANAGER.delete_all("opportunities")
-        updated_opportunities = []
-        for opp in opportunities:
-            opp["modules_required"] = []
-            updated_opportunities.append(opp)
-        if updated_opportunities:
-            DATABASE_MANAGER.insert_many("opportunities", updated_opportunities)
+        cascades.clear_references(DATABASE_MANAGER, "module")
 
         return jsonify({"message": "Deleted"}), 200
 
@@ -8,8 +8,7 @@ import uuid
 from flask import jsonify, send_file
 import pandas as pd
 
-from core import handlers
-
+from core import cascades, handlers
 
 # Cache to store courses and the last update time
 courses_cache = {"data": None, "last_updated": None}
@@ -27,6 +26,11 @@ class Course:
         courses_cache["last_updated"] = datetime.now()
         return courses
 
+    def clear_cache(self, _table=None):
+        """Clears the courses cache, called when another process writes them."""
+        courses_cache["data"] = None
+        courses_cache["last_updated"] = None
+
     def add_course(self, course):
         """Adds a course to the database."""
         from app import DATABASE_MANAGER
@@ -61,19 +65,7 @@ class Course:
         if students and len(students) > 0:
             return jsonify({"error": "Course has students enrolled"}), 400
 
-        opportunities = DATABASE_MANAGER.get_all_by_in_list(
-            "opportunities", "courses_required", [course["course_id"]]
-        )
-
-        for opportunity in opportunities:
-            if (
-                "courses_required" in opportunity
-                and course["course_id"] in opportunity["courses_required"]
-            ):
-                opportunity["courses_required"].remove(course["course_id"])
-                DATABASE_MANAGER.update_one_by_id(
-                    "opportunities", opportunity["_id"], opportunity
-                )
+        cascades.remove_references(DATABASE_MANAGER, "course", [course["course_id"]])
 
         DATABASE_MANAGER.delete_by_id("courses", course["_id"])
         # Update cache
@@ -111,8 +103,9 @@ class Course:
 
     def get_courses(self):
         """Retrieves all courses."""
-        from app import DATABASE_MANAGER
+        from app import CACHE_VERSIONS, DATABASE_MANAGER
 
+        CACHE_VERSIONS.check()
         current_time = datetime.now()
         one_week_ago = current_time - timedelta(weeks=1)
 
@@ -158,23 +151,12 @@ class Course:
                 return jsonify({"error": "Course ID already exists"}), 400
         DATABASE_MANAGER.update_one_by_id("courses", uuid, updated_course)
 
-        students = DATABASE_MANAGER.get_all("students")
-        for student in students:
-            if "course" in student and original["course_id"] == student["course"]:
-                student["course"] = updated_course["course_id"]
-                DATABASE_MANAGER.update_one_by_id("students", student["_id"], student)
-
-        opportunities = DATABASE_MANAGER.get_all("opportunities")
-        for opportunity in opportunities:
-            if (
-                "courses_required" in opportunity
-                and original["course_id"] in opportunity["courses_required"]
-            ):
-                opportunity["courses_required"].remove(original["course_id"])
-                opportunity["courses_required"].append(updated_course["course_id"])
-                DATABASE_MANAGER.update_one_by_id(
-                    "opportunities", opportunity["_id"], opportunity
-                )
+        cascades.rename_references(
+            DATABASE_MANAGER,
+            "course",
+            original["course_id"],
+            updated_course.get("course_id", original["course_id"]),
+        )
         self.reset_cache()
         return jsonify({"message": "Course was updated"}), 200
 
@@ -188,16 +170,7 @@ class Course:
 
         DATABASE_MANAGER.delete_all("students")
 
-        opportunities = DATABASE_MANAGER.get_all("opportunities")
-        DATABASE_MANAGER.delete_all("opportunities")
-        updated_opportunities = []
-        for opp in opportunities:
-            if "courses_required" in opp:
-                opp["courses_required"] = []
-            updated_opportunities.append(opp)
-
-        if updated_opportunities:
-            DATABASE_MANAGER.insert_many("opportunities", updated_opportunities)
+        cascades.clear_references(DATABASE_MANAGER, "course")
 
         return jsonify({"message": "All courses deleted"}), 200
 
@@ -4,8 +4,7 @@ from html import escape
 import tempfile
 import uuid
 from flask import redirect, jsonify, session, send_file
-import pandas as pd
-from core import email_handler, handlers
+from core import cascades, email_handler, handlers, lookup_keys, projections
 
 
 class Employers:
@@ -20,20 +19,20 @@ class Employers:
         """Adding new employer."""
         from app import DATABASE_MANAGER
 
-        if DATABASE_MANAGER.get_one_by_field_strict(
-            "employers", "email", employer["email"].lower()
+        employer["email"] = employer["email"].lower()
+        if lookup_keys.find_by_key(
+            DATABASE_MANAGER, "employers", "email", employer["email"]
         ):
             return jsonify({"error": "Email already in use"}), 400
 
-        existing_employer = DATABASE_MANAGER.get_one_by_field_strict(
-            "employers", "company_name", employer["company_name"]
-        )
-        employer["email"] = employer["email"].lower()
-
-        if existing_employer:
+        if lookup_keys.find_by_key(
+            DATABASE_MANAGER, "employers", "company_name", employer["company_name"]
+        ):
             return jsonify({"error": "Company name already exists"}), 400
 
-        DATABASE_MANAGER.insert("employers", employer)
+        DATABASE_MANAGER.insert(
+            "employers", lookup_keys.add_keys("employers", employer)
+        )
 
         if employer:
             return jsonify(employer), 200
@@ -55,7 +54,9 @@ class Employers:
         handlers.clear_session_save_theme()
         from app import DATABASE_MANAGER
 
-        employer = DATABASE_MANAGER.get_by_email("employers", email)
+        employer = lookup_keys.find_by_key(
+            DATABASE_MANAGER, "employers", "email", email
+        )
         if employer:
             email_handler.send_otp(employer["email"])
             session["employer"] = employer
@@ -63,11 +64,11 @@ class Employers:
 
         return jsonify({"error": "Email not found"}), 404
 
-    def get_employers(self):
-        """Gets all employers."""
+    def get_employers(self, projection=None):
+        """Gets all employers, only the fields in projection if given."""
         from app import DATABASE_MANAGER
 
-        employers = DATABASE_MANAGER.get_all("employers")
+        employers = DATABASE_MANAGER.get_all("employers", projection)
 
         return employers
 
@@ -90,10 +91,7 @@ class Employers:
             return jsonify({"error": "Employer not found"}), 404
         DATABASE_MANAGER.delete_by_id("employers", _id)
 
-        opportunities = DATABASE_MANAGER.get_all("opportunities")
-        for opportunity in opportunities:
-            if opportunity["employer_id"] == _id:
-                Opportunity().delete_opportunity_by_id(opportunity["_id"])
+        Opportunity().delete_opportunities_of_employer(_id)
 
         return jsonify({"message": "Employer deleted"}), 200
 
@@ -105,7 +103,9 @@ class Employers:
         if not employer:
             return jsonify({"error": "Employer not found"}), 404
 
-        DATABASE_MANAGER.update_one_by_id("employers", employer_id, update_data)
+        DATABASE_MANAGER.update_one_by_id(
+            "employers", employer_id, lookup_keys.add_keys("employers", update_data)
+        )
 
         return jsonify({"message": "Employer updated successfully"}), 200
 
@@ -141,12 +141,7 @@ class Employers:
 
         DATABASE_MANAGER.delete_all("opportunities")
 
-        students = DATABASE_MANAGER.get_all("students")
-        for student in students:
-            if "preferences" in student:
-                DATABASE_MANAGER.delete_field_by_id(
-                    "students", student["_id"], "preferences"
-                )
+        cascades.clear_references(DATABASE_MANAGER, "opportunity")
 
         return jsonify({"message": "All employers deleted"}), 200
 
@@ -154,17 +149,15 @@ class Employers:
         """Downloads all employers."""
         from app import DATABASE_MANAGER
 
-        employers = DATABASE_MANAGER.get_all("employers")
-        for employer in employers:
-            employer.pop("_id")
-            employer["Company_name"] = employer.pop("company_name")
-            employer["Email"] = employer.pop("email")
-
-        # Convert employers to DataFrame
-        df = pd.DataFrame(employers)
+        rows = (
+            {"Company_name": employer["company_name"], "Email": employer["email"]}
+            for employer in DATABASE_MANAGER.iter_all(
+                "employers", projections.EMPLOYER_NAME
+            )
+        )
 
         with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-            df.to_excel(tmp.name, index=False)
+            handlers.write_excel(tmp.name, ["Company_name", "Email"], rows)
             tmp_path = tmp.name
 
             return send_file(
@@ -185,14 +178,13 @@ class Employers:
         # Convert DataFrame to list of dictionaries
         employers = df.to_dict(orient="records")
 
-        current_employers = DATABASE_MANAGER.get_all("employers")
-
-        current_employer_names = set(
-            employer["company_name"].lower() for employer in current_employers
-        )
-        current_employer_emails = set(
-            employer["email"].lower() for employer in current_employers
-        )
+        current_employer_names = set()
+        current_employer_emails = set()
+        for employer in DATABASE_MANAGER.iter_all(
+            "employers", projections.EMPLOYER_NAME
+        ):
+            current_employer_names.add(lookup_keys.normalise(employer["company_name"]))
+            current_employer_emails.add(lookup_keys.normalise(employer["email"]))
 
         emails = set()
         company_names = set()
@@ -206,7 +198,8 @@ class Employers:
             if not temp["company_name"] or not temp["email"]:
                 return jsonify({"error": "Company name and email are required"}), 400
             temp["email"] = temp["email"].lower()
-            if temp["company_name"].lower() in current_employer_names:
+            lookup_keys.add_keys("employers", temp)
+            if temp["company_name_key"] in current_employer_names:
                 return (
                     jsonify(
                         {
@@ -215,21 +208,21 @@ class Employers:
                     ),
                     400,
                 )
-            if temp["email"].lower() in current_employer_emails:
+            if temp["email_key"] in current_employer_emails:
                 return (
                     jsonify(
                         {"error": f"Email {temp['email']} already exists as row {i+2}"}
                     ),
                     400,
                 )
-            if temp["email"].lower() in emails:
+            if temp["email_key"] in emails:
                 return (
                     jsonify(
                         {"error": f"Email {temp['email']} already exists as row {i+2}"}
                     ),
                     400,
                 )
-            if temp["company_name"].lower() in company_names:
+            if temp["company_name_key"] in company_names:
                 return (
                     jsonify(
                         {
@@ -240,8 +233,8 @@ class Employers:
                 )
 
             clean_data.append(temp)
-            emails.add(temp["email"].lower())
-            company_names.add(temp["company_name"].lower())
+            emails.add(temp["email_key"])
+            company_names.add(temp["company_name_key"])
 
         DATABASE_MANAGER.insert_many("employers", clean_data)
 
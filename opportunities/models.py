@@ -6,10 +6,21 @@ from html import escape
 import tempfile
 import uuid
 from flask import jsonify, send_file, session
-import pandas as pd
-from core import handlers
+from core import cascades, handlers, projections
 from employers.models import Employers
 
+# Columns of the opportunities export, admins also get Employer_email
+OPPORTUNITY_EXPORT_COLUMNS = [
+    "Title",
+    "Description",
+    "URL",
+    "Modules_required",
+    "Courses_required",
+    "Spots_available",
+    "Location",
+    "Duration",
+]
+
 
 class Opportunity:
     """Opportunity class."""
@@ -145,11 +156,11 @@ class Opportunity:
             return ""
         return opportunity["employer_id"]
 
-    def get_opportunities(self):
-        """Getting all opportunities."""
+    def get_opportunities(self, projection=None):
+        """Getting all opportunities, only the fields in projection if given."""
         from app import DATABASE_MANAGER
 
-        return DATABASE_MANAGER.get_all("opportunities")
+        return DATABASE_MANAGER.get_all("opportunities", projection)
 
     def get_opportunities_by_duration(self, duration):
         """Getting all opportunities that match duration."""
@@ -178,26 +189,18 @@ class Opportunity:
 
         DATABASE_MANAGER.delete_by_id("opportunities", opportunity_id)
 
-        students = DATABASE_MANAGER.get_all("students")
-
-        for student in students:
-            if "preferences" in student and opportunity_id in student["preferences"]:
-                student["preferences"].remove(opportunity_id)
-                DATABASE_MANAGER.update_one_by_id("students", student["_id"], student)
+        cascades.remove_references(DATABASE_MANAGER, "opportunity", [opportunity_id])
 
         return jsonify({"message": "Opportunity deleted"}), 200
 
     def get_valid_students(self, opportunity_id):
         """Get valid students for an opportunity."""
-        # pylint: disable=import-outside-toplevel
-        from students.models import Student
+        from app import DATABASE_MANAGER
 
-        students = Student().get_students()
-        valid_students = []
-        for student in students:
-            if "preferences" in student and opportunity_id in student["preferences"]:
-                valid_students.append(student)
-        return valid_students
+        # Matched by the multikey preferences index instead of a scan
+        return DATABASE_MANAGER.get_all_by_field(
+            "students", "preferences", opportunity_id
+        )
 
     def rank_preferences(self, opportunity_id, preferences):
         """Sets a opportunity preferences."""
@@ -224,45 +227,35 @@ class Opportunity:
         """Deleting all opportunities."""
         from app import DATABASE_MANAGER
 
-        opportunities = DATABASE_MANAGER.get_all_by_field(
-            "opportunities", "employer_id", session["employer"]["_id"]
-        )
-        opportunity_ids = set(opportunity["_id"] for opportunity in opportunities)
+        self.delete_opportunities_of_employer(session["employer"]["_id"])
 
-        for opportunity in opportunities:
-            DATABASE_MANAGER.delete_by_id("opportunities", opportunity["_id"])
-
-        students = DATABASE_MANAGER.get_all("students")
+        return jsonify({"message": "All opportunities deleted"}), 200
 
-        student_updates = []
-        for student in students:
-            if "preferences" in student:
-                new_preferences = [
-                    preference
-                    for preference in student["preferences"]
-                    if preference not in opportunity_ids
-                ]
-                if new_preferences != student["preferences"]:
-                    student_updates.append((student["_id"], new_preferences))
+    def delete_opportunities_of_employer(self, employer_id):
+        """Delete an employer's opportunities and remove them from the
+        students' preferences."""
+        from app import DATABASE_MANAGER
 
-        for student_id, new_preferences in student_updates:
-            DATABASE_MANAGER.update_one_by_id(
-                "students", student_id, {"preferences": new_preferences}
+        opportunity_ids = [
+            opportunity["_id"]
+            for opportunity in DATABASE_MANAGER.get_all_by_field(
+                "opportunities", "employer_id", employer_id, ["_id"]
             )
+        ]
+        if not opportunity_ids:
+            return
 
-        return jsonify({"message": "All opportunities deleted"}), 200
+        DATABASE_MANAGER.bulk_write(
+            "opportunities",
+            [{"deleteMany": {"filter": {"_id": {"$in": opportunity_ids}}}}],
+        )
+        cascades.remove_references(DATABASE_MANAGER, "opportunity", opportunity_ids)
 
     def delete_all_opportunities_admin(self):
         """Deleting all opportunities."""
         from app import DATABASE_MANAGER
 
-        students = DATABASE_MANAGER.get_all("students")
-
-        for student in students:
-            if "preferences" in student:
-                DATABASE_MANAGER.delete_field_by_id(
-                    "students", student["_id"], "preferences"
-                )
+        cascades.clear_references(DATABASE_MANAGER, "opportunity")
 
         DATABASE_MANAGER.delete_all("opportunities")
 
@@ -272,40 +265,41 @@ class Opportunity:
         """Download all opportunities."""
         from app import DATABASE_MANAGER
 
-        opportunities_data = []
+        columns = list(OPPORTUNITY_EXPORT_COLUMNS)
         if is_admin:
-            employers = DATABASE_MANAGER.get_all("employers")
+            columns.append("Employer_email")
             employers_dict = {
-                employer["_id"]: employer["email"] for employer in employers
+                employer["_id"]: employer["email"]
+                for employer in DATABASE_MANAGER.get_all(
+                    "employers", projections.EMPLOYER_EMAIL
+                )
             }
-            opportunities = DATABASE_MANAGER.get_all("opportunities")
+            opportunities = DATABASE_MANAGER.iter_all("opportunities")
         else:
-            opportunities = DATABASE_MANAGER.get_all_by_field(
+            opportunities = DATABASE_MANAGER.iter_by_field(
                 "opportunities", "employer_id", session["employer"]["_id"]
             )
 
-        for opportunity in opportunities:
-            opportunity_data = {
-                "Title": opportunity.pop("title"),
-                "Description": opportunity.pop("description"),
-                "URL": opportunity.pop("url"),
-                "Modules_required": ",".join(opportunity.pop("modules_required")),
-                "Courses_required": ",".join(opportunity.pop("courses_required")),
-                "Spots_available": opportunity.pop("spots_available"),
-                "Location": opportunity.pop("location"),
-                "Duration": opportunity.pop("duration"),
-            }
-            if is_admin:
-                employer_email = employers_dict.get(opportunity["employer_id"])
-                if employer_email:
-                    opportunity_data["Employer_email"] = employer_email
-            del opportunity["_id"]
-            del opportunity["employer_id"]
-            opportunities_data.append(opportunity_data)
-
-        df = pd.DataFrame(opportunities_data)
+        def rows():
+            for opportunity in opportunities:
+                opportunity_data = {
+                    "Title": opportunity["title"],
+                    "Description": opportunity["description"],
+                    "URL": opportunity["url"],
+                    "Modules_required": ",".join(opportunity["modules_required"]),
+                    "Courses_required": ",".join(opportunity["courses_required"]),
+                    "Spots_available": opportunity["spots_available"],
+                    "Location": opportunity["location"],
+                    "Duration": opportunity["duration"],
+                }
+                if is_admin:
+                    opportunity_data["Employer_email"] = employers_dict.get(
+                        opportunity["employer_id"], ""
+                    )
+                yield opportunity_data
+
         with tempfile.NamedTemporaryFile(suffix=".xlsx") as temp_file:
-            df.to_excel(temp_file.name, index=False)
+            handlers.write_excel(temp_file.name, columns, rows())
             temp_file_path = temp_file.name
 
             return send_file(
@@ -335,13 +329,17 @@ class Opportunity:
 
             email_to_employers_map = {
                 employer["email"].lower(): employer["_id"]
-                for employer in DATABASE_MANAGER.get_all("employers")
+                for employer in DATABASE_MANAGER.get_all(
+                    "employers", projections.EMPLOYER_EMAIL
+                )
             }
             modules = set(
-                module["module_id"] for module in DATABASE_MANAGER.get_all("modules")
+                module["module_id"]
+                for module in DATABASE_MANAGER.get_all("modules", projections.MODULE_ID)
             )
             courses = set(
-                course["course_id"] for course in DATABASE_MANAGER.get_all("courses")
+                course["course_id"]
+                for course in DATABASE_MANAGER.get_all("courses", projections.COURSE_ID)
             )
             clean_data = []
             for i, opportunity in enumerate(opportunities):
@@ -6,9 +6,8 @@ from html import escape
 import tempfile
 import uuid
 from flask import jsonify, send_file
-import pandas as pd
 
-from core import handlers
+from core import cascades, handlers, projections
 
 
 class Skill:
@@ -53,12 +52,7 @@ class Skill:
         if result.deleted_count == 0:
             return jsonify({"error": "Skill not found"}), 404
 
-        students = DATABASE_MANAGER.get_all("students")
-
-        for student in students:
-            if skill_id in student.get("skills", []):
-                student["skills"].remove(skill_id)
-                DATABASE_MANAGER.update_one_by_id("students", student["_id"], student)
+        cascades.remove_references(DATABASE_MANAGER, "skill", [skill_id])
 
         return jsonify({"message": "Deleted"}), 200
 
@@ -156,12 +150,11 @@ class Skill:
         DATABASE_MANAGER.delete_by_id("attempted_skills", skill_id)
 
         # Update students
-        students = DATABASE_MANAGER.get_all("students")
-        for student in students:
-            if skill_id in student.get("attempted_skills", []):
-                student["skills"].append(skill_id)
-                student["attempted_skills"].remove(skill_id)
-                DATABASE_MANAGER.update_one_by_id("students", student["_id"], student)
+        DATABASE_MANAGER.update_many(
+            "students",
+            {"attempted_skills": skill_id},
+            {"$push": {"skills": skill_id}, "$pull": {"attempted_skills": skill_id}},
+        )
 
         return jsonify({"message": "Approved"}), 200
 
@@ -177,11 +170,7 @@ class Skill:
         DATABASE_MANAGER.delete_by_id("attempted_skills", skill_id)
 
         # Update students
-        students = DATABASE_MANAGER.get_all("students")
-        for student in students:
-            if skill_id in student.get("attempted_skills", []):
-                student["attempted_skills"].remove(skill_id)
-                DATABASE_MANAGER.update_one_by_id("students", student["_id"], student)
+        cascades.remove_references(DATABASE_MANAGER, "attempted_skill", [skill_id])
 
         return jsonify({"message": "Rejected"}), 200
 
@@ -233,19 +222,16 @@ class Skill:
         """Returns a xlsx file with all skills"""
         from app import DATABASE_MANAGER
 
-        skills = DATABASE_MANAGER.get_all("skills")
-        clean_data = []
-
-        for skill in skills:
-            temp = {}
-            temp["Skill_Name"] = skill.pop("skill_name")
-            temp["Skill_Description"] = skill.pop("skill_description")
-            clean_data.append(temp)
-
-        df = pd.DataFrame(clean_data)
+        rows = (
+            {
+                "Skill_Name": skill["skill_name"],
+                "Skill_Description": skill["skill_description"],
+            }
+            for skill in DATABASE_MANAGER.iter_all("skills")
+        )
 
         with tempfile.NamedTemporaryFile(suffix=".xlsx") as tmp:
-            df.to_excel(tmp.name, index=False)
+            handlers.write_excel(tmp.name, ["Skill_Name", "Skill_Description"], rows)
             tmp_file = tmp.name
 
             return send_file(tmp_file, as_attachment=True, download_name="skills.xlsx")
@@ -254,21 +240,19 @@ class Skill:
         """Returns a xlsx file with all attempted skills"""
         from app import DATABASE_MANAGER
 
-        skills = DATABASE_MANAGER.get_all("attempted_skills")
-        clean_data = []
-        for skill in skills:
-            temp = {}
-            temp["Skill_Name"] = skill.pop("skill_name")
-            if "skill_description" in skill:
-                temp["Skill_Description"] = skill.pop("skill_description")
-            else:
-                temp["Skill_Description"] = ""
-            temp["Used"] = skill.pop("used")
-            clean_data.append(temp)
-
-        df = pd.DataFrame(clean_data)
+        rows = (
+            {
+                "Skill_Name": skill["skill_name"],
+                "Skill_Description": skill.get("skill_description", ""),
+                "Used": skill["used"],
+            }
+            for skill in DATABASE_MANAGER.iter_all("attempted_skills")
+        )
+
         with tempfile.NamedTemporaryFile(suffix=".xlsx") as tmp:
-            df.to_excel(tmp.name, index=False)
+            handlers.write_excel(
+                tmp.name, ["Skill_Name", "Skill_Description", "Used"], rows
+            )
             tmp_file = tmp.name
 
             return send_file(
@@ -290,7 +274,8 @@ class Skill:
         from app import DATABASE_MANAGER
 
         current_skills = set(
-            skill["skill_name"].lower() for skill in DATABASE_MANAGER.get_all("skills")
+            skill["skill_name"].lower()
+            for skill in DATABASE_MANAGER.get_all("skills", projections.SKILL_NAME)
         )
         skill_names = set()
         clean_data = []
@@ -326,12 +311,7 @@ class Skill:
 
         DATABASE_MANAGER.delete_all("skills")
 
-        students = DATABASE_MANAGER.get_all("students")
-
-        for student in students:
-            if "skills" in student:
-                student["skills"] = []
-                DATABASE_MANAGER.update_one_by_id("students", student["_id"], student)
+        cascades.clear_references(DATABASE_MANAGER, "skill")
 
         return jsonify({"message": "Deleted"}), 200
 
@@ -341,11 +321,6 @@ class Skill:
 
         DATABASE_MANAGER.delete_all("attempted_skills")
 
-        students = DATABASE_MANAGER.get_all("students")
-
-        for student in students:
-            if "attempted_skills" in student:
-                student["attempted_skills"] = []
-                DATABASE_MANAGER.update_one_by_id("students", student["_id"], student)
+        cascades.clear_references(DATABASE_MANAGER, "attempted_skill")
 
         return jsonify({"message": "Deleted"}), 200
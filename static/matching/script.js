@@ -48,6 +48,7 @@ document.addEventListener("DOMContentLoaded", function () {
             const formData = new FormData();
             formData.append("student", student);
             formData.append("opportunity", opportunity);
+            formData.append("run", this.getAttribute("data-run"));
             try {
                 const response = await fetch("/user/send_match_email", {
                     method: "POST",
@@ -101,18 +102,48 @@ document.addEventListener("DOMContentLoaded", function () {
         });
     });
 
+    const runResidualButton = document.getElementById("run-residual");
+
+    runResidualButton.addEventListener("click", async function () {
+        if (!confirm("Please confirm that you want to match the unmatched students to the positions left.")) {
+            return;
+        }
+        showLoading();
+        const run = this.getAttribute("data-run");
+        const responseElement = document.getElementById("response-residual");
+
+        try {
+            const response = await fetch("/user/matching/residual", {
+                method: "POST",
+                headers: {
+                    "Content-Type": "application/json",
+                },
+                body: JSON.stringify({ run }),
+            });
+
+            const data = await response.json();
+            if (response.ok) {
+                window.location.href = `/user/matching?run=${run}`;
+            } else {
+                console.error("Error:", response.statusText);
+                responseElement.textContent = data.error;
+                responseElement.className = "text-danger plain-center";
+            }
+        } catch (error) {
+            console.error("Fetch error:", error);
+            responseElement.textContent = "An error occurred while running the second round.";
+            responseElement.className = "text-danger plain-center";
+        } finally {
+            hideLoading();
+        }
+    });
+
     sendAllEmailsButton.addEventListener("click", async function () {
         if (!confirm("Please confirm that you want to send the email to the student.")) {
             return;
         }
         showLoading();
-        const students = [];
-        const studentRows = document.querySelectorAll(".student-row");
-        studentRows.forEach((row) => {
-            const student = row.querySelector(".send-email").getAttribute("data-student");
-            const opportunity = row.querySelector(".send-email").getAttribute("data-opportunity");
-            students.push({ student, opportunity });
-        });
+        const run = this.getAttribute("data-run");
 
         try {
             const response = await fetch("/user/send_all_emails", {
@@ -120,7 +151,7 @@ document.addEventListener("DOMContentLoaded", function () {
                 headers: {
                     "Content-Type": "application/json",
                 },
-                body: JSON.stringify({ students }),
+                body: JSON.stringify({ run }),
             });
 
             const data = await response.json();
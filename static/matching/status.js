@@ -0,0 +1,30 @@
+document.addEventListener("DOMContentLoaded", function () {
+    const statusElement = document.getElementById("matching-status");
+    const run = statusElement.getAttribute("data-run");
+
+    async function checkStatus() {
+        try {
+            const response = await fetch(`/user/matching/status?run=${run}`);
+            const data = await response.json();
+            if (!response.ok) {
+                statusElement.textContent = data.error;
+                statusElement.className = "text-danger plain-center";
+                return;
+            }
+            if (data.status === "completed") {
+                window.location.reload();
+                return;
+            }
+            if (data.status === "failed") {
+                statusElement.textContent = `Matching failed: ${data.error}`;
+                statusElement.className = "text-danger plain-center";
+                return;
+            }
+        } catch (error) {
+            console.error("Fetch error:", error);
+        }
+        setTimeout(checkStatus, 2000);
+    }
+
+    setTimeout(checkStatus, 2000);
+});
@@ -6,10 +6,22 @@ from html import escape
 import tempfile
 import uuid
 from flask import jsonify, send_file, session
-import pandas as pd
-from core import email_handler, handlers
+from core import cascades, email_handler, handlers, lookup_keys, projections
 from opportunities.models import Opportunity
 
+# Columns of the students export
+STUDENT_EXPORT_COLUMNS = [
+    "First Name",
+    "Last Name",
+    "Email (Uni)",
+    "Student Number",
+    "Course",
+    "Modules",
+    "Skills",
+    "Comments",
+    "Placement Duration",
+]
+
 
 class Student:
     """Student class."""
@@ -36,7 +48,7 @@ class Student:
                 "students", "student_id", student["student_id"]
             )
 
-        DATABASE_MANAGER.insert("students", student)
+        DATABASE_MANAGER.insert("students", lookup_keys.add_keys("students", student))
 
         if student:
             return jsonify({"message": "Student added"}), 200
@@ -67,27 +79,25 @@ class Student:
 
         return None
 
-    def get_students(self):
-        """Getting all students."""
+    def get_students(self, projection=None):
+        """Getting all students, only the fields in projection if given."""
         from app import DATABASE_MANAGER
 
-        students = DATABASE_MANAGER.get_all("students")
+        students = DATABASE_MANAGER.get_all("students", projection)
 
         if students:
             return students
 
         return []
 
-    def get_students_map(self):
-        """Getting all students."""
+    def get_students_map(self, projection=None):
+        """Getting all students by id, only the fields in projection if given."""
         from app import DATABASE_MANAGER
 
-        students = DATABASE_MANAGER.get_all("students")
-
-        if students:
-            return {student["_id"]: student for student in students}
-
-        return {}
+        return {
+            student["_id"]: student
+            for student in DATABASE_MANAGER.iter_all("students", projection)
+        }
 
     def update_student_by_id(self, student_id, student_data):
         """Update student in the database by student_id."""
@@ -95,7 +105,10 @@ class Student:
         from app import DATABASE_MANAGER
 
         result = DATABASE_MANAGER.update_by_field(
-            "students", "student_id", str(student_id), student_data
+            "students",
+            "student_id",
+            str(student_id),
+            lookup_keys.add_keys("students", student_data),
         )
 
         # Return True if the update was successful (i.e., a document was matched and modified)
@@ -109,7 +122,9 @@ class Student:
         # Attempt to update the student directly with the provided data
         from app import DATABASE_MANAGER
 
-        result = DATABASE_MANAGER.update_one_by_id("students", uuid, student_data)
+        result = DATABASE_MANAGER.update_one_by_id(
+            "students", uuid, lookup_keys.add_keys("students", student_data)
+        )
 
         # Return True if the update was successful (i.e., a document was matched and modified)
         if result.matched_count > 0:
@@ -129,17 +144,7 @@ class Student:
 
         DATABASE_MANAGER.delete_by_id("students", student["_id"])
 
-        opportunities = Opportunity().get_opportunities()
-
-        for opportunity in opportunities:
-            if (
-                "preferences" in opportunity
-                and student["_id"] in opportunity["preferences"]
-            ):
-                opportunity["preferences"].remove(student["_id"])
-                DATABASE_MANAGER.update_one_by_id(
-                    "opportunities", opportunity["_id"], opportunity
-                )
+        cascades.remove_references(DATABASE_MANAGER, "student", [student["_id"]])
 
         return jsonify({"message": "Student deleted"}), 200
 
@@ -154,7 +159,7 @@ class Student:
         """Getting student."""
         from app import DATABASE_MANAGER
 
-        student = DATABASE_MANAGER.get_one_by_field("students", "email", email)
+        student = lookup_keys.find_by_key(DATABASE_MANAGER, "students", "email", email)
 
         if student:
             return jsonify(student), 200
@@ -168,11 +173,9 @@ class Student:
         current_ids = set()
         current_emails = set()
 
-        students = DATABASE_MANAGER.get_all("students")
-
-        for student in students:
+        for student in DATABASE_MANAGER.iter_all("students", ["student_id", "email"]):
             current_ids.add(student["student_id"])
-            current_emails.add(student["email"])
+            current_emails.add(lookup_keys.normalise(student["email"]))
 
         try:
             df = handlers.excel_verifier_and_reader(
@@ -209,6 +212,7 @@ class Student:
                 temp_student["last_name"] = escape(temp_student["last_name"])
                 temp_student["email"] = escape(temp_student["email"])
                 temp_student["student_id"] = escape(temp_student["student_id"])
+                lookup_keys.add_keys("students", temp_student)
 
                 if temp_student["student_id"] in current_ids:
                     error_msg = {
@@ -219,7 +223,7 @@ class Student:
                     }
                     return jsonify(error_msg), 400
 
-                if temp_student["email"] in current_emails:
+                if temp_student["email_key"] in current_emails:
                     error_msg = {
                         "error": (
                             f"Student {temp_student['first_name']} "
@@ -228,7 +232,7 @@ class Student:
                     }
                     return jsonify(error_msg), 400
                 current_ids.add(temp_student["student_id"])
-                current_emails.add(temp_student["email"])
+                current_emails.add(temp_student["email_key"])
                 data.append(temp_student)
             for temp_student in data:
                 DATABASE_MANAGER.insert("students", temp_student)
@@ -305,57 +309,31 @@ class Student:
         """Download all students as a XLSX file."""
         from app import DATABASE_MANAGER
 
-        students = DATABASE_MANAGER.get_all("students")
-
-        clean_data = []
-
         skills_map = {
             skill["_id"]: skill["skill_name"]
-            for skill in DATABASE_MANAGER.get_all("skills")
+            for skill in DATABASE_MANAGER.get_all("skills", projections.SKILL_NAME)
         }
 
-        for student in students:
-            student_data = {
-                "First Name": student["first_name"],
-                "Last Name": student["last_name"],
-                "Email (Uni)": student["email"],
-                "Student Number": student["student_id"],
-            }
-            if "course" in student:
-                student_data["Course"] = student["course"]
-            else:
-                student_data["Course"] = ""
-
-            if "modules" in student:
-                student_data["Modules"] = ",".join(student["modules"])
-            else:
-                student_data["Modules"] = ""
-
-            if "skills" in student:
-                student_data["Skills"] = ",".join(
-                    [skills_map[skill] for skill in student["skills"]]
-                )
-            else:
-                student_data["Skills"] = ""
-
-            if "comments" in student:
-                student_data["Comments"] = student["comments"]
-            else:
-                student_data["Comments"] = ""
-
-            if "placement_duration" in student:
-                student_data["Placement Duration"] = ",".join(
-                    student["placement_duration"]
-                )
-            else:
-                student_data["Placement Duration"] = ""
-
-            clean_data.append(student_data)
-
-        df = pd.DataFrame(clean_data)
+        def rows():
+            for student in DATABASE_MANAGER.iter_all("students"):
+                yield {
+                    "First Name": student["first_name"],
+                    "Last Name": student["last_name"],
+                    "Email (Uni)": student["email"],
+                    "Student Number": student["student_id"],
+                    "Course": student.get("course", ""),
+                    "Modules": ",".join(student.get("modules", [])),
+                    "Skills": ",".join(
+                        skills_map[skill] for skill in student.get("skills", [])
+                    ),
+                    "Comments": student.get("comments", ""),
+                    "Placement Duration": ",".join(
+                        student.get("placement_duration", [])
+                    ),
+                }
 
         with tempfile.NamedTemporaryFile(suffix=".xlsx") as tmp_file:
-            df.to_excel(tmp_file.name, index=False)
+            handlers.write_excel(tmp_file.name, STUDENT_EXPORT_COLUMNS, rows())
             tmp_file_path = tmp_file.name
 
             return send_file(
@@ -368,12 +346,6 @@ class Student:
 
         DATABASE_MANAGER.delete_all("students")
 
-        opportunities = DATABASE_MANAGER.get_all("opportunities")
-
-        for opportunity in opportunities:
-            if "preferences" in opportunity:
-                DATABASE_MANAGER.delete_field_by_id(
-                    "opportunities", opportunity["_id"], "preferences"
-                )
+        cascades.clear_references(DATABASE_MANAGER, "student")
 
         return jsonify({"message": "All students deleted"}), 200
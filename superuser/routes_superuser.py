@@ -1,7 +1,8 @@
 """Super user routes"""
 
 from flask import jsonify, request, render_template
-from core import handlers
+from core import handlers, shared
+from core.database_mongo_manager import slow_query_threshold
 from .model import Superuser
 
 
@@ -31,3 +32,19 @@ def add_superuser_routes(app):
             )
         except Exception:
             return jsonify({"error": "Invalid input"}), 400
+
+    @app.route("/superuser/slow_queries", methods=["GET"])
+    @handlers.superuser_required
+    def slow_queries():
+        """Page of the most recent slow database operations"""
+        from app import DATABASE_MANAGER
+
+        limit = request.args.get("limit", "100")
+        limit = min(int(limit), 1000) if limit.isdigit() and int(limit) > 0 else 100
+        return render_template(
+            "superuser/slow_queries.html",
+            user_type="superuser",
+            queries=DATABASE_MANAGER.get_slow_queries(limit),
+            threshold=slow_query_threshold(),
+            limit=limit,
+        )
@@ -0,0 +1,80 @@
+"""Test the cache coherence across processes."""
+
+import os
+import sys
+from flask import Flask
+import pytest
+
+# flake8: noqa: F811
+
+# Add the root directory to the Python path
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from core import cache_versions, read_cache
+from core.database_memory_manager import DatabaseMemoryManager
+
+os.environ["IS_TEST"] = "True"
+
+
+@pytest.fixture()
+def workers():
+    """Fixture to create two workers sharing an in-memory test database."""
+    first = DatabaseMemoryManager(None, "cache_versions_testing")
+    second = DatabaseMemoryManager(None, "cache_versions_testing")
+    first.insert("test_collection", {"_id": "test1", "name": "one"})
+    yield (
+        (first, cache_versions.watch_tables(first, ["test_collection"], interval=0)),
+        (second, cache_versions.watch_tables(second, ["test_collection"], interval=0)),
+    )
+    first.delete_collection("test_collection")
+    first.delete_collection(cache_versions.VERSIONS_TABLE)
+
+
+def test_writes_are_seen_by_other_workers(workers):
+    (first, _), (second, versions) = workers
+    changed = []
+    versions.on_change("test_collection", changed.append)
+    versions.check()
+    versions.check()
+
+    assert changed == ["test_collection"]
+
+    first.update_one_by_id("test_collection", "test1", {"name": "uno"})
+    first.insert("other_collection", {"_id": "other"})
+    versions.check()
+
+    assert changed == ["test_collection", "test_collection"]
+    assert second.get_one_by_id(cache_versions.VERSIONS_TABLE, "test_collection") == {
+        "_id": "test_collection",
+        "version": 1,
+    }
+    first.delete_collection("other_collection")
+
+
+def test_read_cache_is_dropped(workers):
+    (first, _), (second, versions) = workers
+    cache = read_cache.cache_reads(second, ["test_collection"], versions=versions)
+    assert second.get_one_by_id("test_collection", "test1")["name"] == "one"
+
+    first.update_one_by_id("test_collection", "test1", {"name": "uno"})
+
+    assert second.get_one_by_id("test_collection", "test1")["name"] == "uno"
+    assert cache.stats()["misses"] == 2
+
+
+def test_checked_once_per_request(workers):
+    (first, _), (_, versions) = workers
+    changed = []
+    versions.on_change("test_collection", changed.append)
+    app = Flask(__name__)
+
+    with app.test_request_context():
+        versions.check()
+        first.delete_by_id("test_collection", "test1")
+        versions.check()
+        assert changed == ["test_collection"]
+
+    with app.test_request_context():
+        versions.check()
+        assert changed == ["test_collection", "test_collection"]
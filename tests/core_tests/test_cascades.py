@@ -0,0 +1,90 @@
+"""Test the reference cascades."""
+
+import os
+import sys
+from dotenv import load_dotenv
+import pytest
+
+# flake8: noqa: F811
+
+# Add the root directory to the Python path
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from core import cascades, shared
+from core.database_backends import create_database_manager
+
+os.environ["IS_TEST"] = "True"
+
+load_dotenv()
+
+
+@pytest.fixture()
+def database(monkeypatch):
+    """Fixture to create a test database with a test reference map."""
+    DATABASE = create_database_manager(
+        shared.getenv("MONGO_URI"),
+        shared.getenv("MONGO_DB_TEST", "cs3528_testing"),
+    )
+    monkeypatch.setattr(
+        cascades,
+        "REFERENCES",
+        {
+            "module": [
+                {
+                    "table": "test_collection",
+                    "field": "modules",
+                    "many": True,
+                    "clear": "empty",
+                },
+                {
+                    "table": "test_collection",
+                    "field": "course",
+                    "many": False,
+                    "clear": "unset",
+                },
+            ]
+        },
+    )
+    DATABASE.delete_all("test_collection")
+    DATABASE.insert_many(
+        "test_collection",
+        [
+            {"_id": "test1", "modules": ["a", "b", "a"], "course": "a"},
+            {"_id": "test2", "modules": ["c"], "course": "c"},
+        ],
+    )
+    yield DATABASE
+    DATABASE.delete_all("test_collection")
+    DATABASE.delete_collection("test_collection")
+    DATABASE.close_connection()
+
+
+def test_remove_references(database):
+    cascades.remove_references(database, "module", ["a"])
+
+    assert database.get_one_by_id("test_collection", "test1") == {
+        "_id": "test1",
+        "modules": ["b"],
+    }
+    assert database.get_one_by_id("test_collection", "test2")["modules"] == ["c"]
+
+
+def test_rename_references(database):
+    cascades.rename_references(database, "module", "a", "d")
+
+    assert database.get_one_by_id("test_collection", "test1") == {
+        "_id": "test1",
+        "modules": ["d", "b", "d"],
+        "course": "d",
+    }
+    assert database.get_one_by_id("test_collection", "test2")["course"] == "c"
+
+
+def test_clear_references(database):
+    cascades.clear_references(database, "module")
+
+    assert database.get_all("test_collection") == [
+        {"_id": "test1", "modules": []},
+        {"_id": "test2", "modules": []},
+    ]
@@ -12,7 +12,7 @@ sys.path.append(
 
 from core import shared
 from core.configuration_settings import Config
-from core.database_mongo_manager import DatabaseMongoManager
+from core.database_backends import create_database_manager
 
 os.environ["IS_TEST"] = "True"
 
@@ -21,13 +21,13 @@ os.environ["IS_TEST"] = "True"
 def database():
     """Fixture to create a test database."""
 
-    DATABASE = DatabaseMongoManager(
+    DATABASE = create_database_manager(
         shared.getenv("MONGO_URI"),
         shared.getenv("MONGO_DB_TEST", "cs3528_testing"),
     )
     yield DATABASE
     # Cleanup code after the test
-    DATABASE.connection.close()
+    DATABASE.close_connection()
 
 
 @pytest.fixture
@@ -62,3 +62,22 @@ def test_config_initialization(database):
 
     for entry in current_config:
         database.insert("config", entry)
+
+
+def test_config_default_inserted_once(database):
+    """Test a default stored by another worker first is kept."""
+    current_config = database.get_all("config")
+    database.delete_all("config")
+    config = Config(database)
+    database.delete_all("config")
+    database.insert("config", {"name": "num_of_skills", "value": 7})
+
+    assert config.insert_default("num_of_skills", 10) == 7
+    assert config.insert_default("max_students", 3) == 3
+    assert len(database.get_all_by_field("config", "name", "num_of_skills")) == 1
+
+    # Reset the database
+    database.delete_all("config")
+
+    for entry in current_config:
+        database.insert("config", entry)
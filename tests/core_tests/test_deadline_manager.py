@@ -14,15 +14,15 @@ os.environ["IS_TEST"] = "True"
 
 load_dotenv()
 from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
-from core.deadline_manager import DeadlineManager
+from core.database_backends import create_database_manager
+from core.deadline_manager import DeadlineManager, DeadlinePhase
 
 
 @pytest.fixture()
 def database():
     """Fixture to create a test database."""
 
-    DATABASE = DatabaseMongoManager(
+    DATABASE = create_database_manager(
         shared.getenv("MONGO_URI"),
         shared.getenv("MONGO_DB_TEST", "cs3528_testing"),
     )
@@ -34,7 +34,7 @@ def database():
         DATABASE.insert("deadline", deadline)
 
     # Cleanup code after the test
-    DATABASE.connection.close()
+    DATABASE.close_connection()
 
 
 @pytest.fixture
@@ -94,8 +94,9 @@ def test_is_past_details_deadline(deadline_manager, database):
     result = deadline_manager.is_past_details_deadline()
     assert result
 
-    # Future date
-    database.update_one_by_field(
+    # Future date, written through the app's manager as reads are kept for
+    # the rest of the request until it writes
+    deadline_manager.database_manager.update_one_by_field(
         "deadline",
         "type",
         0,
@@ -138,8 +139,9 @@ def test_is_past_student_ranking_deadline(deadline_manager, database):
     result = deadline_manager.is_past_student_ranking_deadline()
     assert result
 
-    # Future date
-    database.update_one_by_field(
+    # Future date, written through the app's manager as reads are kept for
+    # the rest of the request until it writes
+    deadline_manager.database_manager.update_one_by_field(
         "deadline",
         "type",
         1,
@@ -156,7 +158,9 @@ def test_is_past_student_ranking_deadline(deadline_manager, database):
 def test_get_opportunities_ranking_deadline(database, deadline_manager):
     existing_deadline = database.get_one_by_field("deadline", "type", 2)
 
-    database.insert("deadline", {"type": 2, "deadline": "2025-05-01"})
+    deadline_manager.database_manager.insert(
+        "deadline", {"type": 2, "deadline": "2025-05-01"}
+    )
 
     deadline = deadline_manager.get_opportunities_ranking_deadline()
     assert deadline == "2025-05-01"
@@ -184,8 +188,9 @@ def test_is_past_opportunities_ranking_deadline(deadline_manager, database):
     result = deadline_manager.is_past_opportunities_ranking_deadline()
     assert result
 
-    # Future date
-    database.update_one_by_field(
+    # Future date, written through the app's manager as reads are kept for
+    # the rest of the request until it writes
+    deadline_manager.database_manager.update_one_by_field(
         "deadline",
         "type",
         2,
@@ -244,3 +249,43 @@ def test_update_deadlines_success(deadline_manager, database, app):
 
     deadline = database.get_one_by_field("deadline", "type", 2)
     assert deadline["deadline"] == "2025-05-01"
+
+
+def test_deadline_phase():
+    """Test the phase of the placement process on each side of the deadlines."""
+    deadlines = (
+        datetime.date(2024, 3, 1),
+        datetime.date(2024, 4, 1),
+        datetime.date(2024, 5, 1),
+    )
+
+    def phase(day, employer_ranked=None):
+        return DeadlinePhase(deadlines, day, employer_ranked).deadline_type
+
+    assert phase(datetime.date(2024, 2, 29)) == 0
+    assert phase(datetime.date(2024, 3, 1)) == 1
+    assert phase(datetime.date(2024, 4, 1)) == 3
+    assert phase(datetime.date(2024, 4, 1), lambda: False) == 2
+    assert phase(datetime.date(2024, 4, 1), lambda: True) == 3
+    assert phase(datetime.date(2024, 5, 1), lambda: False) is None
+
+
+def test_deadlines_are_cached(deadline_manager, database):
+    """Test the deadlines are only read again after they are written."""
+    database.insert("deadline", {"type": 0, "deadline": "2024-03-01"})
+    database.insert("deadline", {"type": 1, "deadline": "2024-04-01"})
+    database.insert("deadline", {"type": 2, "deadline": "2024-05-01"})
+
+    deadlines = deadline_manager.get_deadlines()
+    phase = deadline_manager.get_phase()
+    # Written behind the app's manager, so not seen
+    database.update_one_by_field("deadline", "type", 2, {"deadline": "2099-01-01"})
+
+    assert deadline_manager.get_deadlines() is deadlines
+    assert deadline_manager.get_phase() is phase
+    assert phase.deadline_type is None
+
+    deadline_manager.update_deadlines("2024-03-01", "2024-04-01", "2099-05-01")
+
+    assert deadline_manager.get_deadlines()[2] == datetime.date(2099, 5, 1)
+    assert deadline_manager.get_deadline_type() == 3
@@ -0,0 +1,81 @@
+"""Test the request-scoped identity map."""
+
+import os
+import sys
+from flask import Flask
+import pytest
+
+# flake8: noqa: F811
+
+# Add the root directory to the Python path
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from core import identity_map
+from core.database_memory_manager import DatabaseMemoryManager
+
+os.environ["IS_TEST"] = "True"
+
+
+@pytest.fixture()
+def database():
+    """Fixture to create an in-memory test database with an identity map."""
+    DATABASE = DatabaseMemoryManager(None, "identity_map_testing")
+    DATABASE.insert_many(
+        "test_collection", [{"_id": f"test{i}", "name": str(i)} for i in range(3)]
+    )
+    identity_map.use_identity_map(DATABASE)
+    yield DATABASE
+    DATABASE.delete_collection("test_collection")
+
+
+@pytest.fixture()
+def app():
+    """Fixture to create an app for request contexts."""
+    return Flask(__name__)
+
+
+def change_behind_manager(database, name):
+    """Change test1 without going through the manager's methods."""
+    database.table("test_collection").documents["test1"]["name"] = name
+
+
+def test_repeated_reads_in_a_request(database, app):
+    with app.test_request_context():
+        student = database.get_one_by_id("test_collection", "test1")
+        student["name"] = "changed"
+        change_behind_manager(database, "behind")
+
+        assert database.get_one_by_id("test_collection", "test1")["name"] == "1"
+
+    with app.test_request_context():
+        assert database.get_one_by_id("test_collection", "test1")["name"] == "behind"
+
+
+def test_writes_drop_reads(database, app):
+    with app.test_request_context():
+        assert database.get_one_by_id("test_collection", "test3") is None
+        database.insert("test_collection", {"_id": "test3", "name": "3"})
+
+        assert database.get_one_by_id("test_collection", "test3")["name"] == "3"
+
+
+def test_outside_requests(database):
+    database.get_one_by_id("test_collection", "test1")
+    change_behind_manager(database, "behind")
+
+    assert database.get_one_by_id("test_collection", "test1")["name"] == "behind"
+
+
+def test_bulk_reads_are_not_kept(database, app):
+    with app.test_request_context():
+        database.get_all("test_collection")
+        database.get_all_by_field("test_collection", "name", "1")
+        database.get_one_by_field("test_collection", "name", "1")
+
+        assert list(identity_map.get_identity_map()["test_collection"]) == [
+            (
+                "get_one_by_field",
+                repr((("table", "test_collection"), ("field", "name"), ("value", "1"))),
+            )
+        ]
@@ -0,0 +1,126 @@
+"""Test the normalised lookup keys."""
+
+import os
+import sys
+from unittest.mock import patch
+import pytest
+
+# flake8: noqa: F811
+
+# Add the root directory to the Python path
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from core import lookup_keys
+from core.database_memory_manager import DatabaseMemoryManager
+
+os.environ["IS_TEST"] = "True"
+
+
+@pytest.fixture()
+def database():
+    """Fixture to create an in-memory test database."""
+    database = DatabaseMemoryManager(None, "lookup_keys_testing")
+    for table in lookup_keys.KEY_FIELDS:
+        database.add_table(table)
+    backfilled = lookup_keys.backfill_state["done"]
+    database.insert(
+        "employers",
+        lookup_keys.add_keys(
+            "employers",
+            {"_id": "1", "email": "hr@acme.com", "company_name": "Acme Corp"},
+        ),
+    )
+    database.insert(
+        "employers", {"_id": "2", "email": "jobs@old.com", "company_name": "Old"}
+    )
+    yield database
+    for table in lookup_keys.KEY_FIELDS:
+        database.delete_all(table)
+    lookup_keys.backfill_state["done"] = backfilled
+
+
+def test_normalise():
+    """Test keys ignore case and whitespace."""
+    assert lookup_keys.normalise("  Ada@Example.COM ") == "ada@example.com"
+    assert lookup_keys.normalise("Acme \t Corp") == "acme corp"
+    assert lookup_keys.normalise("Straße") == lookup_keys.normalise("STRASSE")
+
+
+def test_add_keys():
+    """Test the keys are set for the fields being written."""
+    employer = lookup_keys.add_keys(
+        "employers", {"email": "HR@Acme.com", "company_name": "Acme Corp"}
+    )
+    assert employer["email_key"] == "hr@acme.com"
+    assert employer["company_name_key"] == "acme corp"
+
+    update = lookup_keys.add_keys("employers", {"company_name": "ACME"})
+    assert update == {"company_name": "ACME", "company_name_key": "acme"}
+
+
+def find(database, field, value):
+    """Find an employer by key."""
+    return lookup_keys.find_by_key(database, "employers", field, value)
+
+
+def test_find_by_key_before_backfill(database):
+    """Test records without a key are found by value until the backfill."""
+    lookup_keys.backfill_state["done"] = False
+
+    assert find(database, "email", "HR@acme.COM")["_id"] == "1"
+    assert find(database, "company_name", " acme  CORP")["_id"] == "1"
+    assert find(database, "email", "jobs@old.com")["_id"] == "2"
+    assert find(database, "email", "a.*") is None
+
+
+def test_find_by_key_after_backfill(database):
+    """Test records are only found by key once the keys are backfilled."""
+    lookup_keys.backfill_state["done"] = True
+
+    assert find(database, "email", "HR@acme.COM")["_id"] == "1"
+    assert find(database, "company_name", " acme  CORP")["_id"] == "1"
+    assert find(database, "email", "jobs@old.com") is None
+    with patch.object(
+        database, "get_one_by_field", wraps=database.get_one_by_field
+    ) as get_one_by_field:
+        assert find(database, "email", "nobody@acme.com") is None
+    assert get_one_by_field.call_count == 1
+
+    lookup_keys.backfill(database)
+    assert find(database, "email", "JOBS@old.com")["_id"] == "2"
+
+
+def test_check_backfilled(database):
+    """Test the keys count as backfilled once every record has them."""
+    database.insert("users", {"_id": "1", "email": "Ada@Example.com"})
+    assert not lookup_keys.check_backfilled(database)
+
+    lookup_keys.backfill(database, ["users"])
+    assert not lookup_keys.backfill_state["done"]
+    lookup_keys.backfill(database)
+    assert lookup_keys.backfill_state["done"]
+    assert lookup_keys.check_backfilled(database)
+
+
+def test_backfill(database):
+    """Test the missing and outdated keys are backfilled."""
+    database.insert("users", {"_id": "1", "email": "Ada@Example.com"})
+    database.insert(
+        "users", {"_id": "2", "email": "bob@example.com", "email_key": "old"}
+    )
+    database.insert(
+        "users", lookup_keys.add_keys("users", {"_id": "3", "email": "c@example.com"})
+    )
+
+    assert lookup_keys.backfill(database, ["users"], write=False) == {"users": 2}
+    assert database.get_one_by_id("users", "1").get("email_key") is None
+
+    assert lookup_keys.backfill(database) == {
+        "users": 2,
+        "students": 0,
+        "employers": 1,
+    }
+    assert database.get_one_by_id("users", "1")["email_key"] == "ada@example.com"
+    assert database.get_one_by_id("users", "2")["email_key"] == "bob@example.com"
+    assert lookup_keys.backfill(database, ["users"], write=False) == {"users": 0}
@@ -0,0 +1,262 @@
+"""Test the in-memory database backend."""
+
+import os
+import sys
+import pytest
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+# flake8: noqa: F811
+
+# Add the root directory to the Python path
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from core.database_backends import create_database_manager
+from core.database_memory_manager import DatabaseMemoryManager
+
+os.environ["IS_TEST"] = "True"
+
+
+@pytest.fixture()
+def database():
+    """Fixture to create an in-memory test database."""
+    DATABASE = DatabaseMemoryManager(None, "memory_testing")
+    DATABASE.insert_many(
+        "test_collection",
+        [
+            {
+                "_id": "test1",
+                "email": "Ada@example.com",
+                "skills": ["python", "sql"],
+                "title": "Software engineer",
+                "description": "Python services",
+                "count": 1,
+            },
+            {
+                "_id": "test2",
+                "email": "bob@example.com",
+                "skills": ["sql"],
+                "title": "Data analyst",
+                "count": 2,
+            },
+            {"_id": "test3", "skills": [], "count": 3},
+        ],
+    )
+    yield DATABASE
+    DATABASE.delete_collection("test_collection")
+
+
+def test_queries(database):
+    assert [
+        row["_id"]
+        for row in database.get_all_by_field("test_collection", "skills", "sql")
+    ] == ["test1", "test2"]
+    assert [
+        row["_id"]
+        for row in database.get_all_by_in_list(
+            "test_collection", "skills", ["python", "java"]
+        )
+    ] == ["test1"]
+    assert (
+        database.get_one_by_field_strict("test_collection", "email", "ada@example.com")[
+            "_id"
+        ]
+        == "test1"
+    )
+    assert database.get_one_by_id("test_collection", "missing") is None
+
+
+def test_projection(database):
+    assert database.get_one_by_id("test_collection", "test2", ["count"]) == {
+        "_id": "test2",
+        "count": 2,
+    }
+    assert database.get_one_by_id(
+        "test_collection", "test3", {"skills": 0, "count": 0}
+    ) == {"_id": "test3"}
+
+
+def test_reads_are_copies(database):
+    record = database.get_one_by_id("test_collection", "test1")
+    record["skills"].append("java")
+
+    assert database.get_one_by_id("test_collection", "test1")["skills"] == [
+        "python",
+        "sql",
+    ]
+
+
+def test_iter(database):
+    documents = database.iter_all("test_collection", ["count"])
+    database.insert("test_collection", {"_id": "test4", "count": 4})
+
+    assert [document["count"] for document in documents] == [1, 2, 3, 4]
+    assert [
+        document["_id"]
+        for document in database.iter_by_field("test_collection", "skills", "sql")
+    ] == ["test1", "test2"]
+
+
+def test_count_and_aggregate(database):
+    assert database.count_by_filter("test_collection", {"skills": "sql"}) == 2
+    assert database.count_by_filter("test_collection", {"email": None}) == 1
+    assert database.aggregate(
+        "test_collection",
+        [
+            {"$match": {"count": {"$gt": 1}}},
+            {
+                "$group": {
+                    "_id": {"$ifNull": ["$email", "none"]},
+                    "total": {"$sum": "$count"},
+                    "with_title": {"$sum": {"$cond": ["$title", 1, 0]}},
+                }
+            },
+            {"$sort": {"total": -1}},
+        ],
+    ) == [
+        {"_id": "none", "total": 3, "with_title": 0},
+        {"_id": "bob@example.com", "total": 2, "with_title": 1},
+    ]
+    assert (
+        database.aggregate(
+            "test_collection", [{"$match": {"count": 0}}, {"$count": "n"}]
+        )
+        == []
+    )
+    with pytest.raises(OperationFailure):
+        database.aggregate("test_collection", [{"$lookup": {}}])
+
+
+def test_text_search(database):
+    with pytest.raises(OperationFailure):
+        database.get_all_by_text_search("test_collection", "python")
+
+    database.ensure_indexes(
+        {"test_collection": [{"fields": ["title", "description"], "text": True}]}
+    )
+
+    assert [
+        row["_id"]
+        for row in database.get_all_by_text_search("test_collection", "analyst PYTHON")
+    ] == ["test1", "test2"]
+    assert database.get_all_by_text_search("test_collection", "python -engineer") == []
+
+
+def test_indexes(database):
+    database.create_index("test_collection", "skills")
+    report = database.ensure_indexes(
+        {"test_collection": [{"fields": ["email"], "unique": True}]}, drop_extra=True
+    )
+
+    assert report["created"] == ["test_collection.email_1"]
+    assert report["dropped"] == ["test_collection.skills_1"]
+    table = database.table("test_collection")
+    assert table.lookup({"email": {"$in": ["bob@example.com"]}}) == {"test2"}
+    with pytest.raises(DuplicateKeyError):
+        database.insert("test_collection", {"email": "bob@example.com"})
+    with pytest.raises(DuplicateKeyError):
+        database.update_one_by_id(
+            "test_collection", "test1", {"email": "bob@example.com"}
+        )
+
+    database.update_one_by_id("test_collection", "test2", {"email": "eve@example.com"})
+    assert table.lookup({"email": "bob@example.com"}) == set()
+    assert database.get_by_email("test_collection", "eve@example.com")["_id"] == "test2"
+
+
+def test_sparse_unique_index(database):
+    spec = {"fields": ["email_key"], "unique": True, "sparse": True}
+    report = database.ensure_indexes({"test_collection": [spec]})
+
+    assert report["created"] == ["test_collection.email_key_1"]
+    assert database.ensure_indexes({"test_collection": [spec]})["existing"] == [
+        "test_collection.email_key_1"
+    ]
+    database.insert("test_collection", {"_id": "key1", "email_key": "a@b.com"})
+    with pytest.raises(DuplicateKeyError):
+        database.insert("test_collection", {"email_key": "a@b.com"})
+    # The records without the field are not in the index
+    database.insert("test_collection", {"_id": "key2"})
+    assert (
+        database.get_one_by_field("test_collection", "email_key", "a@b.com")["_id"]
+        == "key1"
+    )
+
+
+def test_update_many(database):
+    result = database.update_many(
+        "test_collection",
+        {"skills": "sql"},
+        {"$set": {"skills.$[skill]": "postgres"}, "$inc": {"count": 10}},
+        array_filters=[{"skill": "sql"}],
+    )
+    database.update_many(
+        "test_collection",
+        {"skills": {"$exists": True}},
+        {"$pull": {"skills": {"$in": ["python"]}}, "$unset": {"email": ""}},
+    )
+
+    assert result.matched_count == result.modified_count == 2
+    assert database.get_all("test_collection", ["skills", "count", "email"]) == [
+        {"_id": "test1", "skills": ["postgres"], "count": 11},
+        {"_id": "test2", "skills": ["postgres"], "count": 12},
+        {"_id": "test3", "skills": [], "count": 3},
+    ]
+
+
+def test_bulk_write(database):
+    counts = database.bulk_write(
+        "test_collection",
+        [
+            {"insertOne": {"document": {"_id": "test4"}}},
+            {
+                "updateOne": {
+                    "filter": {"_id": "test4"},
+                    "update": {"$push": {"skills": "go"}},
+                }
+            },
+            {
+                "updateOne": {
+                    "filter": {"_id": "test5"},
+                    "update": {"$set": {"count": 5}},
+                    "upsert": True,
+                }
+            },
+            {"replaceOne": {"filter": {"_id": "test3"}, "replacement": {"count": 0}}},
+            {"deleteMany": {"filter": {"count": {"$lt": 2}}}},
+        ],
+    )
+
+    assert counts == {
+        "matched": 2,
+        "modified": 2,
+        "deleted": 2,
+        "inserted": 1,
+        "upserted": 1,
+    }
+    assert [row["_id"] for row in database.get_all("test_collection")] == [
+        "test2",
+        "test4",
+        "test5",
+    ]
+    with pytest.raises(BulkWriteError):
+        database.bulk_write(
+            "test_collection", [{"insertOne": {"document": {"_id": "test2"}}}]
+        )
+    with pytest.raises(ValueError):
+        database.bulk_write("test_collection", [{"insert": {}}])
+
+
+def test_managers_share_tables(database, monkeypatch):
+    monkeypatch.setenv("DATABASE_BACKEND", "memory")
+    other = create_database_manager(None, "memory_testing")
+
+    assert isinstance(other, DatabaseMemoryManager)
+    assert len(other.get_all("test_collection")) == 3
+    assert (
+        create_database_manager(None, "other_database").get_all("test_collection") == []
+    )
+
+    monkeypatch.setenv("DATABASE_BACKEND", "sqlite")
+    with pytest.raises(ValueError):
+        create_database_manager(None, "memory_testing")
@@ -1,6 +1,7 @@
 """Test the MongoDB Manager class."""
 
 import os
+import subprocess
 import sys
 from dotenv import load_dotenv
 import pytest
@@ -19,7 +20,13 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core.database_mongo_manager import (
+    SLOW_QUERY_TABLE,
+    DatabaseMongoManager,
+    redact,
+    slow_query_threshold,
+    summarize_explain,
+)
 
 os.environ["IS_TEST"] = "True"
 
@@ -281,6 +288,195 @@ def test_get_all_by_in_list(database):
     database.delete_by_id("test_collection", "test24")
 
 
+def test_projection(database):
+    test_data = {"_id": "test25", "name": "Entry", "password": "hash", "score": 1}
+    database.insert("test_collection", test_data)
+
+    included = database.get_one_by_id("test_collection", "test25", ["name"])
+    assert included == {"_id": "test25", "name": "Entry"}
+    excluded = database.get_all("test_collection", {"password": 0})
+    assert excluded == [{"_id": "test25", "name": "Entry", "score": 1}]
+    results = database.get_all_by_in_list(
+        "test_collection", "_id", ["test25"], ["score"]
+    )
+    assert results == [{"_id": "test25", "score": 1}]
+
+    database.delete_by_id("test_collection", "test25")
+
+
+def test_bulk_write(database):
+    database.insert_many(
+        "test_collection",
+        [
+            {"_id": "test26", "skills": ["a", "b"]},
+            {"_id": "test27", "skills": ["b"]},
+            {"_id": "test28", "skills": ["c"]},
+        ],
+    )
+
+    counts = database.bulk_write(
+        "test_collection",
+        [
+            {
+                "updateMany": {
+                    "filter": {"skills": "b"},
+                    "update": {"$pull": {"skills": "b"}},
+                }
+            },
+            {"deleteOne": {"filter": {"_id": "test28"}}},
+            {"insertOne": {"document": {"_id": "test29", "skills": []}}},
+        ],
+    )
+
+    assert counts["modified"] == 2
+    assert counts["deleted"] == 1
+    assert counts["inserted"] == 1
+    assert database.get_one_by_id("test_collection", "test26")["skills"] == ["a"]
+    assert database.get_one_by_id("test_collection", "test28") is None
+    with pytest.raises(ValueError):
+        database.bulk_write("test_collection", [{"dropTable": {}}])
+    database.delete_all("test_collection")
+
+
+def test_bulk_update_in_batches(database, monkeypatch):
+    from core import database_mongo_manager
+
+    monkeypatch.setattr(database_mongo_manager, "BULK_BATCH_SIZE", 2)
+    database.insert_many(
+        "test_collection", [{"_id": f"bulk{i}", "count": 0} for i in range(5)]
+    )
+
+    counts = database.bulk_update(
+        "test_collection", ((f"bulk{i}", {"count": i}) for i in range(5))
+    )
+
+    assert counts["matched"] == 5
+    assert counts["modified"] == 4
+    assert database.get_one_by_id("test_collection", "bulk4")["count"] == 4
+    assert database.bulk_update("test_collection", [])["matched"] == 0
+    database.delete_all("test_collection")
+
+
+def test_iter_in_batches(database):
+    database.insert_many(
+        "test_collection",
+        [{"_id": f"iter{i}", "parity": i % 2, "count": i} for i in range(5)],
+    )
+
+    documents = database.iter_all("test_collection", ["count"], batch_size=2)
+
+    assert not isinstance(documents, list)
+    assert sorted(document["count"] for document in documents) == list(range(5))
+    assert [
+        document["_id"]
+        for document in database.iter_by_field(
+            "test_collection", "parity", 1, batch_size=1
+        )
+    ] == ["iter1", "iter3"]
+    database.delete_all("test_collection")
+
+
+def test_count_and_aggregate(database):
+    database.insert_many(
+        "test_collection",
+        [{"_id": f"count{i}", "parity": i % 2, "count": i} for i in range(5)],
+    )
+
+    assert database.count_by_filter("test_collection", {"parity": 1}) == 2
+    assert database.aggregate(
+        "test_collection",
+        [
+            {"$group": {"_id": "$parity", "total": {"$sum": "$count"}}},
+            {"$sort": {"_id": 1}},
+        ],
+    ) == [{"_id": 0, "total": 6}, {"_id": 1, "total": 4}]
+    database.delete_all("test_collection")
+
+
+def test_ensure_indexes(database):
+    indexes = {
+        "test_collection": [
+            {"fields": ["email"], "unique": True},
+            {"fields": ["tags"]},
+            {"fields": ["title", "description"], "text": True},
+        ]
+    }
+    database.insert("test_collection", {"_id": "test1", "tags": ["a", "b"]})
+    database.database["test_collection"].create_index("old_field")
+
+    report = database.ensure_indexes(indexes, create=False)
+    assert sorted(report["missing"]) == [
+        "test_collection.email_1",
+        "test_collection.tags_1",
+        "test_collection.title_text_description_text",
+    ]
+    assert report["extra"] == ["test_collection.old_field_1"]
+    assert not report["created"]
+
+    report = database.ensure_indexes(indexes)
+    assert len(report["created"]) == 3
+    assert not report["dropped"]
+
+    report = database.ensure_indexes(indexes, drop_extra=True)
+    assert len(report["existing"]) == 3
+    assert not report["created"]
+    assert report["dropped"] == ["test_collection.old_field_1"]
+    assert database.ensure_indexes(indexes, create=False)["extra"] == []
+
+
+def test_slow_query_threshold(monkeypatch):
+    """Test slow query logging is off unless a threshold is set."""
+    monkeypatch.delenv("SLOW_QUERY_MS", raising=False)
+    assert slow_query_threshold() is None
+    monkeypatch.setenv("SLOW_QUERY_MS", "0")
+    assert slow_query_threshold() is None
+    monkeypatch.setenv("SLOW_QUERY_MS", "250")
+    assert slow_query_threshold() == 250
+
+
+def test_slow_query_log(database):
+    database.slow_query_ms = 0
+    database.slow_query_explain = True
+    database.delete_collection(SLOW_QUERY_TABLE)
+    database.insert("test_collection", {"_id": "test1", "email": "secret"})
+
+    database.get_all_by_field("test_collection", "email", "secret")
+
+    (entry,) = database.get_slow_queries()
+    assert entry["table"] == "test_collection"
+    assert entry["operation"] == "find"
+    assert entry["filter"] == '{"email": "?"}'
+    assert entry["documents"] == 1
+    assert entry["explain"]["returned"] == 1
+    assert "secret" not in str(entry)
+    database.delete_collection(SLOW_QUERY_TABLE)
+
+
+def test_redact_and_summarize_explain():
+    assert redact({"email": {"$in": ["a", "b"]}, "age": 3}) == {
+        "email": {"$in": ["?"]},
+        "age": "?",
+    }
+    assert summarize_explain(
+        {
+            "queryPlanner": {
+                "winningPlan": {
+                    "stage": "FETCH",
+                    "filter": {"email": "secret"},
+                    "inputStage": {"stage": "IXSCAN", "indexName": "email_1"},
+                }
+            },
+            "executionStats": {"totalKeysExamined": 1, "totalDocsExamined": 1},
+        }
+    ) == {
+        "stages": ["FETCH", "IXSCAN email_1"],
+        "keys_examined": 1,
+        "documents_examined": 1,
+        "returned": None,
+        "time_ms": None,
+    }
+
+
 def test_invalid_connection_string(monkeypatch):
     """Test that an invalid connection string raises ConfigurationError."""
 
@@ -335,6 +531,59 @@ def test_server_selection_timeout(monkeypatch):
     assert exc_info.value.code == 1
 
 
+def test_lazy_client_per_process(monkeypatch):
+    """Test a lazy manager creates its client on first use and again after a fork."""
+    clients = []
+
+    class MockClient:
+        def __init__(self, *args, **kwargs):
+            self.options = kwargs
+            clients.append(self)
+
+        def __getitem__(self, name):
+            return name
+
+    monkeypatch.setattr("pymongo.MongoClient", MockClient)
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "10")
+
+    db_manager = DatabaseMongoManager(None, "test_database", lazy=True)
+    assert not clients
+    assert db_manager.database == "test_database"
+    assert db_manager.connection is clients[0]
+    assert clients[0].options["maxPoolSize"] == 10
+    assert clients[0].options["compressors"] == "zstd,zlib"
+
+    db_manager.reset_after_fork()
+    assert db_manager.connection is clients[1]
+
+
+def test_import_app_without_server():
+    """Test importing the app does not reach the database."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import threading, app; print(threading.active_count())",
+        ],
+        cwd=root,
+        env=dict(
+            os.environ,
+            DATABASE_BACKEND="mongo",
+            IS_GITHUB_ACTION="False",
+            MONGO_URI="mongodb://127.0.0.1:1/",
+            MONGO_SERVER_SELECTION_TIMEOUT_MS="200",
+        ),
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=False,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == "1"
+
+
 def test_default_database_if_empty():
     """Test that an empty database name defaults to 'cs3528_testing'."""
     db_manager = DatabaseMongoManager(shared.getenv("MONGO_URI"), "")
@@ -0,0 +1,71 @@
+"""Test the per-request database call accounting."""
+
+import os
+import sys
+from flask import Flask
+import pytest
+
+# flake8: noqa: F811
+
+# Add the root directory to the Python path
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from core import query_profiler
+from core.database_memory_manager import DatabaseMemoryManager
+
+os.environ["IS_TEST"] = "True"
+
+
+@pytest.fixture()
+def database():
+    """Fixture to create an instrumented in-memory test database."""
+    DATABASE = DatabaseMemoryManager(None, "profiler_testing")
+    DATABASE.insert_many(
+        "test_collection", [{"_id": f"test{i}", "name": str(i)} for i in range(6)]
+    )
+    query_profiler.instrument(DATABASE)
+    yield DATABASE
+    DATABASE.delete_collection("test_collection")
+
+
+@pytest.fixture()
+def client(database):
+    """Fixture to create a profiled app reading once per row."""
+    app = Flask(__name__)
+    query_profiler.configure_profiling(app, threshold=5)
+
+    @app.route("/rows")
+    def rows():
+        ids = [row["_id"] for row in database.get_all("test_collection")]
+        names = [database.get_one_by_id("test_collection", i)["name"] for i in ids]
+        database.bulk_update("test_collection", [("test0", {"name": "zero"})])
+        return ",".join(names)
+
+    @app.route("/row")
+    def row():
+        return database.get_one_by_field("test_collection", "name", "1")["_id"]
+
+    return app.test_client()
+
+
+def test_counts_calls_and_documents(client):
+    response = client.get("/rows")
+
+    assert response.headers["X-DB-Calls"] == "8"
+    assert response.headers["X-DB-Documents"] == "12"
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert response.headers["X-DB-N-Plus-One"] == "get_one_by_id(test_collection) x6"
+
+
+def test_no_n_plus_one_below_threshold(client):
+    response = client.get("/row")
+
+    assert response.data == b"test1"
+    assert response.headers["X-DB-Calls"] == "1"
+    assert "X-DB-N-Plus-One" not in response.headers
+
+
+def test_calls_outside_requests_are_not_profiled(database):
+    assert database.get_one_by_id("test_collection", "test0")["name"] == "0"
+    assert query_profiler.get_profile() is None
@@ -0,0 +1,91 @@
+"""Test the read-through cache of reference tables."""
+
+import os
+import sys
+import pytest
+
+# flake8: noqa: F811
+
+# Add the root directory to the Python path
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from core import read_cache
+from core.database_memory_manager import DatabaseMemoryManager
+
+os.environ["IS_TEST"] = "True"
+
+
+@pytest.fixture()
+def database():
+    """Fixture to create an in-memory test database caching test_collection."""
+    DATABASE = DatabaseMemoryManager(None, "read_cache_testing")
+    DATABASE.insert_many(
+        "test_collection", [{"_id": f"test{i}", "name": str(i)} for i in range(3)]
+    )
+    DATABASE.insert("other_collection", {"_id": "other", "name": "other"})
+    yield DATABASE
+    DATABASE.delete_collection("test_collection")
+    DATABASE.delete_collection("other_collection")
+
+
+def test_reads_are_cached(database):
+    cache = read_cache.cache_reads(database, ["test_collection"])
+
+    assert database.get_one_by_id("test_collection", "test1")["name"] == "1"
+    # Written behind the manager's back, so only seen once the entry is dropped
+    database.table("test_collection").documents["test1"]["name"] = "changed"
+
+    assert database.get_one_by_id("test_collection", "test1")["name"] == "1"
+    assert database.get_one_by_id("other_collection", "other")["name"] == "other"
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_reads_are_copies(database):
+    read_cache.cache_reads(database, ["test_collection"])
+
+    database.get_all("test_collection")[0]["name"] = "changed"
+    database.get_all("test_collection")[0]["name"] = "changed"
+
+    assert database.get_all("test_collection")[0]["name"] == "0"
+
+
+def test_writes_invalidate(database):
+    cache = read_cache.cache_reads(database, ["test_collection"])
+    database.get_all("test_collection")
+    database.get_one_by_field("test_collection", "name", "1")
+
+    database.update_one_by_id("test_collection", "test1", {"name": "one"})
+
+    assert cache.stats()["entries"] == 0
+    assert database.get_one_by_field("test_collection", "name", "1") is None
+    database.insert("test_collection", {"_id": "test3", "name": "3"})
+    assert len(database.get_all("test_collection")) == 4
+    database.delete_all("test_collection")
+    assert database.get_all("test_collection") == []
+
+
+def test_lru_and_ttl(database, monkeypatch):
+    cache = read_cache.cache_reads(database, ["test_collection"], max_entries=2, ttl=10)
+    for i in range(3):
+        database.get_one_by_id("test_collection", f"test{i}")
+    database.get_one_by_id("test_collection", "test2")
+
+    assert cache.stats() == {"hits": 1, "misses": 3, "entries": 2}
+    database.get_one_by_id("test_collection", "test0")
+    assert cache.stats()["misses"] == 4
+
+    now = read_cache.time.monotonic()
+    monkeypatch.setattr(read_cache.time, "monotonic", lambda: now + 11)
+    database.get_one_by_id("test_collection", "test0")
+    assert cache.stats()["misses"] == 5
+
+
+def test_read_during_write_is_not_stored(database):
+    cache = read_cache.cache_reads(database, ["test_collection"])
+    generation = cache.generation("test_collection")
+    database.delete_by_id("test_collection", "test0")
+
+    cache.put(("get_all", "stale"), "test_collection", generation, [])
+
+    assert cache.stats()["entries"] == 0
@@ -10,7 +10,7 @@ from selenium.webdriver.support import expected_conditions as EC
 # from selenium.webdriver.chrome.service import Service as ChromeService
 # from webdriver_manager.chrome import ChromeDriverManager
 from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core.database_backends import create_database_manager
 
 # sys.path.append(
 #     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -25,14 +25,14 @@ PORT = 5000
 @pytest.fixture()
 def database():
     """Fixture to create a test database."""
-    DATABASE = DatabaseMongoManager(
+    DATABASE = create_database_manager(
         shared.getenv("MONGO_URI"),
         shared.getenv("MONGO_DB_TEST", "cs3528_testing"),
     )
 
     yield DATABASE
 
-    DATABASE.connection.close()
+    DATABASE.close_connection()
 
 
 def test_base_page(chrome_browser, flask_server):
@@ -1,14 +1,19 @@
 """Tests for the matching algorithm."""
 
 import os
+import random
 import sys
 
+import pytest
+
 # flake8: noqa: F811
 
 sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 
+from algorithm import matching
+from algorithm.benchmark import generate_cohort
 from algorithm.matching import Matching
 
 
@@ -491,3 +496,246 @@ def test_larger_set_matching_scenario():
     )
 
     assert result == expected
+
+
+def test_matching_does_not_modify_preferences():
+    """Tests that the caller's preference lists are left untouched."""
+    students_preference = {
+        "Student_1": ["company_1", "company_2"],
+        "Student_2": ["company_1", "company_2"],
+        "Student_3": ["company_2"],
+    }
+    employer_preference = {
+        "company_1": {"positions": 1, "Student_2": 1, "Student_1": 2},
+        "company_2": {"positions": 1, "Student_3": 2, "Student_1": 1},
+    }
+    original_students = {k: list(v) for k, v in students_preference.items()}
+    original_employers = {k: dict(v) for k, v in employer_preference.items()}
+
+    match = Matching(students_preference, employer_preference)
+    result = match.find_best_match()
+
+    assert result == (
+        ["Student_3"],
+        {"company_1": ["Student_2"], "company_2": ["Student_1"]},
+    )
+    assert students_preference == original_students
+    assert employer_preference == original_employers
+
+
+def test_unknown_placement_is_skipped():
+    """Tests that a preference for a placement with no ranking is skipped."""
+    students_preference = {"Student_1": ["company_9", "company_1"]}
+    employer_preference = {"company_1": {"positions": 1, "Student_1": 1}}
+
+    result = Matching(students_preference, employer_preference).find_best_match()
+
+    assert result == ([], {"company_1": ["Student_1"]})
+
+
+def _sorted_result(result):
+    """Sort a matching result so results can be compared regardless of order."""
+    unmatched, matches = result
+    return sorted(unmatched), {
+        placement: sorted(students) for placement, students in matches.items()
+    }
+
+
+def test_update_student_preferences_reports_changes():
+    """Tests that a student's new preferences repair the previous matching."""
+    students_preference = {
+        "Student_1": ["company_1", "company_2"],
+        "Student_2": ["company_1", "company_2"],
+        "Student_3": ["company_2"],
+    }
+    employer_preference = {
+        "company_1": {"positions": 1, "Student_2": 1, "Student_1": 2},
+        "company_2": {"positions": 1, "Student_3": 2, "Student_1": 1},
+    }
+    match = Matching(students_preference, employer_preference)
+    match.find_best_match()
+
+    changed_students, changed_placements = match.update_student_preferences(
+        "Student_1", ["company_1"]
+    )
+
+    assert match.get_matches() == (
+        ["Student_1"],
+        {"company_1": ["Student_2"], "company_2": ["Student_3"]},
+    )
+    assert changed_students == {"Student_1", "Student_3"}
+    assert changed_placements == {"company_2"}
+    assert students_preference["Student_1"] == ["company_1", "company_2"]
+
+
+def test_update_placement_preferences_reports_changes():
+    """Tests that a placement's new ranking repairs the previous matching."""
+    students_preference = {
+        "Student_1": ["company_1", "company_2"],
+        "Student_2": ["company_1", "company_2"],
+    }
+    employer_preference = {
+        "company_1": {"positions": 1, "Student_1": 1, "Student_2": 2},
+        "company_2": {"positions": 1, "Student_1": 1, "Student_2": 2},
+    }
+    match = Matching(students_preference, employer_preference)
+    match.find_best_match()
+
+    changed_students, changed_placements = match.update_placement_preferences(
+        "company_1", {"positions": 1, "Student_2": 1, "Student_1": 2}
+    )
+
+    assert match.get_matches() == (
+        [],
+        {"company_1": ["Student_2"], "company_2": ["Student_1"]},
+    )
+    assert changed_students == {"Student_1", "Student_2"}
+    assert changed_placements == {"company_1", "company_2"}
+
+
+def test_update_without_changes_keeps_matching():
+    """Tests that updating with the same preferences changes nothing."""
+    students_preference = {"Student_1": ["company_1"], "Student_2": ["company_1"]}
+    employer_preference = {
+        "company_1": {"positions": 1, "Student_1": 1, "Student_2": 2}
+    }
+    match = Matching(students_preference, employer_preference)
+    result = match.find_best_match()
+    proposals = match.proposals
+
+    assert match.update(students_preference, employer_preference) == (set(), set())
+    assert match.get_matches() == result
+    assert match.proposals == proposals
+
+
+def test_stats_count_proposals_and_evictions(monkeypatch):
+    """Tests the stats collected for a run with an eviction and a rejection."""
+    monkeypatch.setattr(matching, "REPAIR_LIMIT", 1)
+    students_preference = {
+        "Student_1": ["company_1"],
+        "Student_2": ["company_1"],
+        "Student_3": ["company_1"],
+    }
+    employer_preference = {
+        "company_1": {"positions": 1, "Student_2": 1, "Student_1": 2, "Student_3": 3},
+    }
+    match = Matching(students_preference, employer_preference, stats=True)
+    match.find_best_match()
+    stats = match.stats.to_dict()
+
+    assert stats["mode"] == "full"
+    assert stats["proposals"] == 3
+    assert stats["evictions"] == 1
+    assert stats["rejections"] == 1
+    assert stats["contention"] == [{"placement": "company_1", "proposals": 3}]
+    assert set(stats["phases"]) == {"build_input", "solve", "build_result"}
+
+    employer_preference = {
+        "company_1": {"positions": 2, "Student_2": 1, "Student_1": 2, "Student_3": 3},
+    }
+    match.update(students_preference, employer_preference)
+
+    assert match.stats.mode == "repair"
+    assert match.stats.proposals == 3
+    assert match.stats.rejections == 1
+    assert match.stats.evictions == 0
+
+
+def test_stats_off_by_default():
+    """Tests no stats are collected unless asked for."""
+    match = Matching({"Student_1": ["company_1"]}, {"company_1": {"positions": 1}})
+    match.find_best_match()
+
+    assert match.stats is None
+
+
+@pytest.mark.parametrize("repair_limit", [matching.REPAIR_LIMIT, 1])
+def test_update_matches_full_rerun(monkeypatch, repair_limit):
+    """Tests that repeated updates give the same matching as a full rerun."""
+    monkeypatch.setattr(matching, "REPAIR_LIMIT", repair_limit)
+
+    rng = random.Random(3)
+    students_preference, employer_preference = generate_cohort(
+        300, 40, 5, seed=3, max_spots=4, employer_rank_density=0.8
+    )
+    match = Matching(students_preference, employer_preference)
+    match.find_best_match()
+
+    for _ in range(20):
+        before = match.get_matches()[1]
+        before = {s: p for p, students in before.items() for s in students}
+        students_preference = dict(students_preference)
+        employer_preference = dict(employer_preference)
+        if rng.random() < 0.5:
+            student = rng.choice(list(students_preference))
+            students_preference[student] = rng.sample(
+                list(employer_preference), k=rng.randint(0, 5)
+            )
+        else:
+            placement = rng.choice(list(employer_preference))
+            ranked = rng.sample(list(students_preference), k=rng.randint(0, 60))
+            ranking = {student: i + 1 for i, student in enumerate(ranked)}
+            ranking["positions"] = rng.randint(0, 4)
+            employer_preference[placement] = ranking
+
+        changed_students, _ = match.update(students_preference, employer_preference)
+        expected = Matching(students_preference, employer_preference).find_best_match()
+        after = {s: p for p, students in expected[1].items() for s in students}
+
+        assert _sorted_result(match.get_matches()) == _sorted_result(expected)
+        assert changed_students == {
+            student
+            for student in before.keys() | after.keys()
+            if before.get(student) != after.get(student)
+        }
+
+
+def test_residual_round_uses_leftover_positions():
+    """Tests the second round only matches unmatched students to free positions."""
+    students_preference = {
+        "Student_1": ["company_1"],
+        "Student_2": ["company_1"],
+        "Student_3": ["company_1"],
+    }
+    employer_preference = {
+        "company_1": {"positions": 1, "Student_1": 1, "Student_2": 2},
+        "company_2": {"positions": 2, "Student_1": 1},
+    }
+    first_round = Matching(students_preference, employer_preference).find_best_match()
+    assert first_round == (["Student_2", "Student_3"], {"company_1": ["Student_1"]})
+
+    # Students rank again and company_2 ranks the unmatched students
+    students_preference["Student_2"] = ["company_1", "company_2"]
+    students_preference["Student_3"] = ["company_2"]
+    employer_preference["company_2"].update({"Student_2": 2, "Student_3": 3})
+
+    residual = Matching.residual(first_round, students_preference, employer_preference)
+
+    assert residual.student_rank == {
+        "Student_2": ["company_2"],
+        "Student_3": ["company_2"],
+    }
+    assert residual.placement_rank == {
+        "company_2": {"positions": 2, "Student_2": 2, "Student_3": 3}
+    }
+    assert residual.find_best_match() == (
+        [],
+        {"company_2": ["Student_2", "Student_3"]},
+    )
+
+
+def test_residual_round_with_partly_filled_placement():
+    """Tests positions filled in the first round are not offered again."""
+    students_preference = {"Student_1": ["company_1"], "Student_2": ["company_2"]}
+    employer_preference = {
+        "company_1": {"positions": 2, "Student_1": 1},
+        "company_2": {"positions": 1},
+    }
+    first_round = Matching(students_preference, employer_preference).find_best_match()
+
+    students_preference["Student_2"] = ["company_1"]
+    employer_preference["company_1"]["Student_2"] = 2
+    residual = Matching.residual(first_round, students_preference, employer_preference)
+
+    assert residual.find_best_match() == ([], {"company_1": ["Student_2"]})
+    assert residual.placement_rank["company_1"]["positions"] == 1
@@ -12,8 +12,8 @@ from dotenv import load_dotenv
 sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
 
 os.environ["IS_TEST"] = "True"
 
@@ -31,7 +31,7 @@ def app():
 @pytest.fixture()
 def database():
     """Fixture to create a test database."""
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"),
         shared.getenv("MONGO_DB_TEST", "cs3528_testing"),
     )
@@ -42,7 +42,7 @@ def database():
     database.delete_all("modules")
     if modules:
         database.insert_many("modules", modules)
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
@@ -136,7 +136,7 @@ def test_delete_all_modules(database, module_model, app, sample_module):
         "modules_required": ["CS101"],
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
     database.insert("opportunities", opportunity1)
 
     with app.app_context():
@@ -158,7 +158,10 @@ def test_delete_all_modules(database, module_model, app, sample_module):
 
     database.delete_all("students")
     if students:
-        database.insert_many("students", students)
+        database.insert_many(
+            "students",
+            [lookup_keys.add_keys("students", record) for record in students],
+        )
     database.delete_all("opportunities")
     if opportunities:
         database.insert_many("opportunities", opportunities)
@@ -17,8 +17,8 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
 
 os.environ["IS_TEST"] = "True"
 
@@ -37,7 +37,7 @@ def app():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"),
         shared.getenv("MONGO_DB_TEST", "cs3528_testing"),
     )
@@ -50,8 +50,9 @@ def database():
         database.insert("courses", course)
     database.delete_all_by_field("users", "email", "dummy@dummy.com")
     database.delete_all_by_field("courses", "course_id", "CS101")
+    database.delete_all_by_field("students", "email", "student@example.com")
     # Cleanup code
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
@@ -271,7 +272,7 @@ def test_update_course_students(database, course_model, sample_course, app):
                 "email": "student@dummy.com",
                 "course": "CS101",
             }
-            database.insert("students", student)
+            database.insert("students", lookup_keys.add_keys("students", student))
             updated_course = {
                 "course_id": "CS102",
                 "course_name": "Intro to CS",
@@ -376,7 +377,7 @@ def test_delete_course_with_students(database, course_model, sample_course, app)
         "email": "student@example.com",
         "course": "CS101",
     }
-    database.insert("students", student)
+    database.insert("students", lookup_keys.add_keys("students", student))
     with app.app_context():
         response = course_model.delete_course_by_uuid(sample_course["_id"])
         assert response[1] == 400
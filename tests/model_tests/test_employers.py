@@ -7,8 +7,8 @@ from io import BytesIO
 import pytest
 import pandas as pd
 from dotenv import load_dotenv
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
 
 sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -30,7 +30,7 @@ def app():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"),
         shared.getenv("MONGO_DB_TEST", "cs3528_testing"),
     )
@@ -41,10 +41,10 @@ def database():
     database.delete_all("employers")
 
     for employer in employers:
-        database.insert("employers", employer)
+        database.insert("employers", lookup_keys.add_keys("employers", employer))
     database.delete_all_by_field("_id", "company_name", "email")
     # Cleanup code
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
@@ -90,7 +90,7 @@ def test_register_existing_email(database, employer_model, app):
         "company_name": "TechCorp",
         "email": "contact@techcorp.com",
     }
-    database.insert("employers", employer)
+    database.insert("employers", lookup_keys.add_keys("employers", employer))
     with app.app_context():
         response = employer_model.register_employer(employer)
         assert response[1] == 400
@@ -104,7 +104,7 @@ def test_get_employer_by_id(database, employer_model, app):
         "company_name": "TechCorp",
         "email": "contact@techcorp.com",
     }
-    database.insert("employers", employer)
+    database.insert("employers", lookup_keys.add_keys("employers", employer))
     with app.app_context():
         retrieved_employer = employer_model.get_employer_by_id(employer["_id"])
         assert retrieved_employer is not None
@@ -118,7 +118,7 @@ def test_delete_employer(database, employer_model, app):
         "company_name": "TechCorp",
         "email": "contact@techcorp.com",
     }
-    database.insert("employers", employer)
+    database.insert("employers", lookup_keys.add_keys("employers", employer))
     with app.app_context():
         response = employer_model.delete_employer_by_id(employer["_id"])
         assert response[1] == 200
@@ -132,7 +132,7 @@ def test_download_all_employers(database, employer_model, app):
         "company_name": "TechCorp",
         "email": "contact@techcorp.com",
     }
-    database.insert("employers", employer)
+    database.insert("employers", lookup_keys.add_keys("employers", employer))
 
     with app.app_context():
         with app.test_request_context():  # Ensure proper request context
@@ -162,7 +162,7 @@ def test_upload_employers(database, employer_model, app):
 
 def test_get_company_name(database, employer_model, app, sample_employer):
     """Test getting company name by ID."""
-    database.insert("employers", sample_employer)
+    database.insert("employers", lookup_keys.add_keys("employers", sample_employer))
     with app.app_context():
         company_name = employer_model.get_company_name(sample_employer["_id"])
         assert company_name == "TechCorp"
@@ -170,7 +170,7 @@ def test_get_company_name(database, employer_model, app, sample_employer):
 
 def test_employer_login(database, employer_model, app, sample_employer):
     """Test employer login."""
-    database.insert("employers", sample_employer)
+    database.insert("employers", lookup_keys.add_keys("employers", sample_employer))
     with app.app_context():
         with app.test_request_context():
             response = employer_model.employer_login(sample_employer["email"])
@@ -189,7 +189,7 @@ def test_employer_login_nonexistant(database, employer_model, app, sample_employ
 
 def test_get_employers(database, employer_model, app, sample_employer):
     """Test getting all employers."""
-    database.insert("employers", sample_employer)
+    database.insert("employers", lookup_keys.add_keys("employers", sample_employer))
     with app.app_context():
         employers = employer_model.get_employers()
         assert len(employers) > 0
@@ -198,7 +198,7 @@ def test_get_employers(database, employer_model, app, sample_employer):
 
 def test_update_employer(database, employer_model, app, sample_employer):
     """Test updating an employer."""
-    database.insert("employers", sample_employer)
+    database.insert("employers", lookup_keys.add_keys("employers", sample_employer))
     update_data = {"company_name": "TechCorp Updated"}
     with app.app_context():
         response = employer_model.update_employer(sample_employer["_id"], update_data)
@@ -228,7 +228,7 @@ def test_rank_preferences(database, employer_model, app):
 
 def test_get_company_email_by_id(database, employer_model, app, sample_employer):
     """Test getting company email by ID."""
-    database.insert("employers", sample_employer)
+    database.insert("employers", lookup_keys.add_keys("employers", sample_employer))
     with app.app_context():
         email = employer_model.get_company_email_by_id(sample_employer["_id"])
         assert email == "contact@techcorp.com"
@@ -241,7 +241,7 @@ def test_delete_all_employers(database, employer_model, app):
         "company_name": "TechCorp",
         "email": "contact@techcorp.com",
     }
-    database.insert("employers", employer)
+    database.insert("employers", lookup_keys.add_keys("employers", employer))
     with app.app_context():
         response = employer_model.delete_all_employers()
         assert response[1] == 200
@@ -0,0 +1,110 @@
+"""Benchmarks for the matching algorithm on synthetic cohorts."""
+
+import os
+import sys
+
+import pytest
+
+# flake8: noqa: F811
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from algorithm import benchmark
+from core import shared
+
+LARGE_BENCHMARKS = shared.getenv("RUN_MATCHING_BENCHMARKS") == "True"
+
+
+def test_generate_cohort_is_seeded():
+    """Tests the same seed gives the same cohort."""
+    first = benchmark.generate_cohort(200, 30, 5, seed=42)
+    second = benchmark.generate_cohort(200, 30, 5, seed=42)
+    other = benchmark.generate_cohort(200, 30, 5, seed=43)
+
+    assert first == second
+    assert first != other
+
+
+def test_generate_cohort_shape():
+    """Tests the generated cohort has the shape the matching route builds."""
+    students, opportunities = benchmark.generate_cohort(500, 50, 7, seed=1)
+
+    assert len(students) == 500
+    assert len(opportunities) == 50
+    for preferences in students.values():
+        assert len(preferences) == 7
+        assert len(set(preferences)) == 7
+        assert all(opp in opportunities for opp in preferences)
+    for ranking in opportunities.values():
+        assert 1 <= ranking["positions"] <= 10
+        ranks = [rank for key, rank in ranking.items() if key != "positions"]
+        assert sorted(ranks) == list(range(1, len(ranks) + 1))
+
+
+def test_employer_rank_density():
+    """Tests employers only rank part of their applicants when asked to."""
+    _, full = benchmark.generate_cohort(500, 50, 5, seed=3)
+    _, half = benchmark.generate_cohort(500, 50, 5, seed=3, employer_rank_density=0.5)
+
+    assert sum(len(r) for r in half.values()) < sum(len(r) for r in full.values())
+
+
+def test_compare_to_baseline():
+    """Tests regressions are reported against a baseline."""
+    counters = {"seed": 0, "proposals": 100, "matched": 90, "unmatched": 10}
+    baseline = {**counters, "wall_time": 1.0, "peak_memory": 1000}
+
+    assert benchmark.compare_to_baseline(dict(baseline), baseline) == []
+    result = {**baseline, "wall_time": 2.0, "peak_memory": 2000, "proposals": 99}
+    assert len(benchmark.compare_to_baseline(result, baseline)) == 3
+    # Measurements are only compared when the baseline has them
+    assert benchmark.compare_to_baseline(result, counters) == ["proposals 100 -> 99"]
+    # Counters are only compared for the same seed
+    assert benchmark.compare_to_baseline({**result, "seed": 1}, counters) == []
+
+
+def test_baseline_covers_the_default_sizes():
+    """Tests the committed baseline has the counters of every benchmark size."""
+    baseline = benchmark.load_baseline()
+
+    for size in benchmark.DEFAULT_SIZES:
+        assert set(baseline[benchmark.benchmark_key(*size)]) == {
+            "seed",
+            *benchmark.COUNTERS,
+        }
+
+
+@pytest.mark.parametrize(
+    "size",
+    [
+        (2000, 300, 5),
+        (2000, 300, 10),
+        pytest.param(
+            (10000, 1500, 5),
+            marks=pytest.mark.skipif(
+                not LARGE_BENCHMARKS, reason="RUN_MATCHING_BENCHMARKS not set"
+            ),
+        ),
+        pytest.param(
+            (50000, 8000, 5),
+            marks=pytest.mark.skipif(
+                not LARGE_BENCHMARKS, reason="RUN_MATCHING_BENCHMARKS not set"
+            ),
+        ),
+    ],
+)
+def test_matching_benchmark(size):
+    """Runs the benchmark and compares its counters to the committed baseline,
+    timings are only compared by the command line."""
+    result = benchmark.run_benchmark(*size)
+
+    assert result["matched"] + result["unmatched"] == size[0]
+    assert result["proposals"] >= result["matched"]
+    assert result["stable"]
+
+    baseline = benchmark.load_baseline()[benchmark.benchmark_key(*size)]
+    assert {counter: result[counter] for counter in benchmark.COUNTERS} == {
+        counter: baseline[counter] for counter in benchmark.COUNTERS
+    }
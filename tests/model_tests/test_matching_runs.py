@@ -0,0 +1,275 @@
+"""Tests for matching runs."""
+
+import os
+import sys
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from dotenv import load_dotenv
+import pytest
+
+# flake8: noqa: F811
+
+# Add the root directory to the Python path
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
+
+os.environ["IS_TEST"] = "True"
+
+load_dotenv()
+
+
+@pytest.fixture()
+def app():
+    """Fixture to create a test client."""
+    from ...app import app  # pylint: disable=import-outside-toplevel
+
+    app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture()
+def matching_runs():
+    """Fixture to create a matching runs model."""
+    from user.matching_runs import MatchingRuns
+
+    return MatchingRuns()
+
+
+@pytest.fixture()
+def database():
+    """Fixture to create a test database."""
+
+    database = create_database_manager(
+        shared.getenv("MONGO_URI"), shared.getenv("MONGO_DB_TEST", "cs3528_testing")
+    )
+    runs = database.get_all("matching_runs")
+    database.delete_all("matching_runs")
+
+    yield database
+
+    database.delete_all("matching_runs")
+    for run in runs:
+        database.insert("matching_runs", run)
+
+    # Cleanup code
+    database.close_connection()
+
+
+def test_fingerprint_ignores_order(app):
+    """Tests that the fingerprint does not depend on dict order."""
+    from user.matching_runs import get_fingerprint
+
+    first = get_fingerprint(
+        {"s1": ["o1"], "s2": ["o1"]}, {"o1": {"positions": 1, "s1": 1, "s2": 2}}
+    )
+    second = get_fingerprint(
+        {"s2": ["o1"], "s1": ["o1"]}, {"o1": {"s2": 2, "s1": 1, "positions": 1}}
+    )
+    changed = get_fingerprint(
+        {"s1": ["o1"], "s2": ["o1"]}, {"o1": {"positions": 1, "s1": 2, "s2": 1}}
+    )
+
+    assert first == second
+    assert first != changed
+
+
+def test_start_run_collapses_triggers(app, database, matching_runs):
+    """Tests that starting the same run twice only runs the matching once."""
+    with app.app_context():
+        with patch("user.matching_runs.executor.submit") as submit:
+            first = matching_runs.start_run()
+            second = matching_runs.start_run()
+
+    assert first["_id"] == second["_id"]
+    assert second["status"] == "running"
+    assert submit.call_count == 1
+    assert database.get_one_by_id("matching_runs", first["_id"]) is not None
+
+
+def test_execute_run_stores_snapshot(app, database, matching_runs):
+    """Tests that a finished run stores its matches."""
+    database.insert(
+        "matching_runs",
+        {"_id": "run", "status": "running", "started_at": datetime.now().isoformat()},
+    )
+
+    with app.app_context():
+        matching_runs.execute_run(
+            "run",
+            {"s1": ["o1"], "s2": ["o1"]},
+            {"o1": {"positions": 1, "s1": 1, "s2": 2}},
+            [],
+        )
+        run = matching_runs.get_run("run")
+
+    assert run["status"] == "completed"
+    assert run["matches"] == [{"opportunity": "o1", "students": ["s1"]}]
+    assert matching_runs.get_match_pairs(run) == [
+        {"student": "s1", "opportunity": "o1"}
+    ]
+
+
+def test_scenarios_run_in_the_background(app, database, matching_runs):
+    """Tests scenario runs are started once and store their results."""
+    snapshot = {
+        "students": {"s1": {"preferences": ["o1"], "modules": []}},
+        "opportunities": {
+            "o1": {"positions": 1, "ranking": ["s1"], "modules_required": []}
+        },
+    }
+    scenario_list = [
+        {
+            "name": "no spots",
+            "perturbations": [{"type": "positions", "opportunity": "o1", "change": -1}],
+        }
+    ]
+
+    with app.app_context():
+        with patch.object(
+            matching_runs, "build_scenario_snapshot", return_value=snapshot
+        ), patch("user.matching_runs.executor.submit") as submit:
+            first = matching_runs.start_scenarios(scenario_list)
+            second = matching_runs.start_scenarios(scenario_list)
+            with pytest.raises(ValueError):
+                matching_runs.start_scenarios(
+                    [{"name": "invalid", "perturbations": ["positions"]}]
+                )
+        matching_runs.execute_scenarios(first["_id"], snapshot, scenario_list)
+        run = matching_runs.get_scenario_run(first["_id"])
+    database.delete_all("scenario_runs")
+
+    assert first["_id"] == second["_id"]
+    assert second["status"] == "running"
+    assert submit.call_count == 1
+    assert run["status"] == "completed"
+    assert [result["name"] for result in run["results"]] == ["base", "no spots"]
+    assert run["results"][1]["unmatched_change"] == 1
+
+
+def test_stale_run_is_restarted(app, matching_runs):
+    """Tests that failed runs and runs that never finished are stale."""
+    started_at = (datetime.now() - timedelta(hours=1)).isoformat()
+
+    assert matching_runs.is_stale({"status": "failed", "started_at": started_at})
+    assert matching_runs.is_stale({"status": "running", "started_at": started_at})
+    assert not matching_runs.is_stale({"status": "completed", "started_at": started_at})
+    assert not matching_runs.is_stale(
+        {"status": "running", "started_at": datetime.now().isoformat()}
+    )
+
+
+def test_run_residual_keeps_first_round(app, database, matching_runs):
+    """Tests the second round only adds matches for unmatched students."""
+    run = {
+        "_id": "run",
+        "status": "completed",
+        "started_at": datetime.now().isoformat(),
+        "matches": [{"opportunity": "o1", "students": ["s1"]}],
+        "not_matched": [
+            {"_id": "s2", "name": "Student 2", "reason": "Student was not matched"},
+            {"_id": "s3", "name": "Student 3", "reason": "Student was not matched"},
+        ],
+    }
+    database.insert("matching_runs", run)
+    preferences = (
+        {"s1": ["o2"], "s2": ["o1", "o2"], "s3": ["o1"]},
+        {
+            "o1": {"positions": 2, "s1": 1, "s2": 2, "s3": 1},
+            "o2": {"positions": 1, "s1": 1, "s2": 1},
+        },
+        [],
+    )
+
+    with app.app_context():
+        with patch.object(
+            matching_runs, "build_residual_preferences", return_value=preferences
+        ):
+            residual = matching_runs.run_residual(run)
+        run = matching_runs.get_run("run")
+
+    assert residual["matches"] == [
+        {"opportunity": "o1", "students": ["s3"]},
+        {"opportunity": "o2", "students": ["s2"]},
+    ]
+    assert residual["not_matched"] == []
+    assert run["residual"]["matches"] == residual["matches"]
+    assert matching_runs.get_match_pairs(run) == [
+        {"student": "s1", "opportunity": "o1"},
+        {"student": "s3", "opportunity": "o1"},
+        {"student": "s2", "opportunity": "o2"},
+    ]
+
+
+def test_build_residual_preferences_loads_the_leftovers(app, database, matching_runs):
+    """Tests only the unmatched students and the opportunities they ranked with
+    spots left are loaded for the second round."""
+    students = [
+        {"_id": "residual_s1", "preferences": ["residual_o1"]},
+        {"_id": "residual_s2", "preferences": ["residual_o1", " residual_o2 "]},
+        {"_id": "residual_s3", "preferences": ["residual_o1", "residual_o3"]},
+    ]
+    opportunities = [
+        {"_id": "residual_o1", "spots_available": 1, "preferences": ["residual_s1"]},
+        {"_id": "residual_o2", "spots_available": "1", "preferences": ["residual_s2"]},
+        {"_id": "residual_o3", "spots_available": 1, "preferences": ["residual_s3"]},
+    ]
+    for student in students:
+        student.update(
+            student_id=student["_id"],
+            email=f"{student['_id']}@example.com",
+            first_name="Student",
+            last_name=student["_id"],
+        )
+        database.insert("students", lookup_keys.add_keys("students", student))
+    for opportunity in opportunities:
+        database.insert("opportunities", opportunity)
+    run = {
+        "matches": [{"opportunity": "residual_o1", "students": ["residual_s1"]}],
+        "not_matched": [{"_id": "residual_s2"}, {"_id": "residual_s3"}],
+    }
+
+    try:
+        with app.app_context():
+            from app import DATABASE_MANAGER
+
+            with patch.object(DATABASE_MANAGER, "iter_all", side_effect=AssertionError):
+                students_preference, opportunities_preference, _ = (
+                    matching_runs.build_residual_preferences(run)
+                )
+    finally:
+        for student in students:
+            database.delete_by_id("students", student["_id"])
+        for opportunity in opportunities:
+            database.delete_by_id("opportunities", opportunity["_id"])
+
+    assert students_preference == {
+        "residual_s2": ["residual_o2"],
+        "residual_s3": ["residual_o3"],
+    }
+    assert set(opportunities_preference) == {"residual_o2", "residual_o3"}
+
+
+def test_build_view_paginates(app, matching_runs):
+    """Tests only the rows of the requested page are built."""
+    run = {
+        "matches": [
+            {"opportunity": "o1", "students": ["s1", "s2"]},
+            {"opportunity": "o2", "students": ["s3"]},
+        ],
+        "not_matched": [{"_id": "s4", "name": "Student 4"}],
+    }
+
+    with patch.object(matching_runs, "build_rows", side_effect=list) as build_rows:
+        view = matching_runs.build_view(run, page=5, per_page=2)
+
+    assert view["page"] == 2
+    assert view["pages"] == 2
+    assert view["total"] == 3
+    assert view["rows"] == [{"student": "s3", "opportunity": "o2"}]
+    assert view["residual_rows"] == []
+    assert view["stats"] is None
+    assert view["not_matched"] == run["not_matched"]
+    assert build_rows.call_count == 2
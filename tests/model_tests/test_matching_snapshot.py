@@ -0,0 +1,134 @@
+"""Tests for offline matching snapshots."""
+
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+# flake8: noqa: F811
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from core.database_memory_manager import DatabaseMemoryManager
+from user import matching_snapshot
+
+
+def student(student_id, preferences=None):
+    """Student document as exported to a snapshot."""
+    data = {
+        "_id": student_id,
+        "student_id": student_id.upper(),
+        "email": f"{student_id}@example.com",
+        "first_name": "Student",
+        "last_name": student_id,
+    }
+    if preferences is not None:
+        data["preferences"] = preferences
+    return data
+
+
+@pytest.fixture()
+def snapshot():
+    """Fixture with two students competing for one position."""
+    return {
+        "version": matching_snapshot.SNAPSHOT_VERSION,
+        "created_at": "2024-01-01T00:00:00",
+        "students": [
+            student("s1", ["o1", " o2 "]),
+            student("s2", ["o1"]),
+            student("s3"),
+        ],
+        "opportunities": [
+            {"_id": "o1", "spots_available": 1, "preferences": ["s2", "s1"]},
+            {"_id": "o2", "spots_available": 1},
+        ],
+    }
+
+
+def test_build_preferences(snapshot):
+    """Tests unranked opportunities and students without preferences are left out."""
+    students_preference, opportunities_preference, unmatched = (
+        matching_snapshot.build_preferences(
+            snapshot["students"], snapshot["opportunities"]
+        )
+    )
+
+    assert students_preference == {"s1": ["o1"], "s2": ["o1"]}
+    assert opportunities_preference == {"o1": {"positions": 1, "s2": 1, "s1": 2}}
+    assert [entry["_id"] for entry in unmatched] == ["s3"]
+
+
+def test_run_snapshot_is_reproducible(snapshot):
+    """Tests running the same snapshot twice gives the same run."""
+    first = matching_snapshot.run_snapshot(snapshot)
+    second = matching_snapshot.run_snapshot(snapshot)
+
+    assert (
+        first["_id"]
+        == second["_id"]
+        == matching_snapshot.get_fingerprint(
+            {"s1": ["o1"], "s2": ["o1"]}, {"o1": {"positions": 1, "s2": 1, "s1": 2}}
+        )
+    )
+    assert first["status"] == matching_snapshot.COMPLETED
+    assert (
+        first["matches"]
+        == second["matches"]
+        == [{"opportunity": "o1", "students": ["s2"]}]
+    )
+    assert [entry["_id"] for entry in first["not_matched"]] == ["s3", "s1"]
+    assert first["stats"]["proposals"] == 2
+    assert "load_preferences" in first["stats"]["phases"]
+
+
+def test_export_snapshot_streams_the_documents(tmp_path, snapshot):
+    """Tests the exported snapshot is read back with the documents' fields."""
+    database = DatabaseMemoryManager(None, "matching_snapshot_testing")
+    for table in ("students", "opportunities"):
+        database.insert_many(table, snapshot[table])
+    path = tmp_path / "snapshot.json.gz"
+
+    counts = matching_snapshot.export_snapshot(database, path)
+    exported = matching_snapshot.load_snapshot(path)
+    for table in ("students", "opportunities"):
+        database.delete_all(table)
+
+    assert counts == {"students": 3, "opportunities": 2}
+    assert exported["students"] == snapshot["students"]
+    assert exported["opportunities"] == snapshot["opportunities"]
+
+
+def test_load_snapshot_rejects_other_versions(tmp_path, snapshot):
+    """Tests snapshots are read back and unknown versions are rejected."""
+    path = tmp_path / "snapshot.json.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        json.dump(snapshot, file)
+    assert matching_snapshot.load_snapshot(path) == snapshot
+
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        json.dump(dict(snapshot, version=0), file)
+    with pytest.raises(ValueError):
+        matching_snapshot.load_snapshot(path)
+
+
+def test_run_command_writes_output(tmp_path, snapshot):
+    """Tests the run command can write the run to a file without a database."""
+    path = tmp_path / "snapshot.json.gz"
+    output = tmp_path / "run.json"
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        json.dump(snapshot, file)
+
+    assert (
+        matching_snapshot.main(
+            ["run", str(path), "--no-store", "--output", str(output), "--validate"]
+        )
+        == 0
+    )
+    with open(output, encoding="utf-8") as file:
+        run = json.load(file)
+    assert run["matches"] == [{"opportunity": "o1", "students": ["s2"]}]
+    assert run["validation"]["stable"]
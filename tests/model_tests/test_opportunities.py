@@ -17,8 +17,8 @@ import pandas as pd
 sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
 
 os.environ["IS_TEST"] = "True"
 
@@ -56,7 +56,7 @@ def opportunity_model():
 def database():
     """Fixture to create a database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"),
         shared.getenv("MONGO_DB_TEST", "cs3528_testing"),
     )
@@ -67,7 +67,7 @@ def database():
     for opportunity in current_opportunities:
         database.insert("opportunities", opportunity)
 
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
@@ -130,8 +130,8 @@ def dummy_data(database):
     database.insert("modules", module3)
     database.insert("courses", course1)
     database.insert("courses", course2)
-    database.insert("employers", employer1)
-    database.insert("employers", employer2)
+    database.insert("employers", lookup_keys.add_keys("employers", employer1))
+    database.insert("employers", lookup_keys.add_keys("employers", employer2))
 
     yield data
 
@@ -238,7 +238,10 @@ def test_search_opportunities_by_company(opportunity_model, database, app):
     database.insert(
         "opportunities", {"_id": "123", "title": "SE", "employer_id": "456"}
     )
-    database.insert("employers", {"_id": "456", "company_name": "Company1"})
+    database.insert(
+        "employers",
+        lookup_keys.add_keys("employers", {"_id": "456", "company_name": "Company1"}),
+    )
 
     with app.app_context():  # Set up Flask application context
         # Call the function with only the company name
@@ -282,7 +285,10 @@ def test_get_opportunities_by_title(opportunity_model, database, app):
     database.insert(
         "opportunities", {"_id": "123", "title": "SE", "employer_id": "456"}
     )
-    database.insert("employers", {"_id": "456", "company_name": "Company1"})
+    database.insert(
+        "employers",
+        lookup_keys.add_keys("employers", {"_id": "456", "company_name": "Company1"}),
+    )
 
     with app.app_context():  # Set up Flask application context
         # Call the function with only the title
@@ -323,7 +329,10 @@ def test_get_opportunities_by_company(opportunity_model, database, app):
     database.insert(
         "opportunities", {"_id": "123", "title": "SE", "employer_id": "456"}
     )
-    database.insert("employers", {"_id": "456", "company_name": "Company1"})
+    database.insert(
+        "employers",
+        lookup_keys.add_keys("employers", {"_id": "456", "company_name": "Company1"}),
+    )
 
     with app.app_context():
         opportunities = opportunity_model.get_opportunities_by_company("Company1")
@@ -387,7 +396,10 @@ def test_get_employer_by_id(opportunity_model, database, app):
     database.delete_all_by_field("opportunities", "employer_id", "456")
     opportunity = {"_id": uuid.uuid4().hex, "employer_id": "456"}
     database.insert("opportunities", opportunity)
-    database.insert("employers", {"_id": "456", "company_name": "Company1"})
+    database.insert(
+        "employers",
+        lookup_keys.add_keys("employers", {"_id": "456", "company_name": "Company1"}),
+    )
 
     with app.app_context():
         with app.test_request_context():
@@ -473,7 +485,7 @@ def test_delete_opportunity_by_id(opportunity_model, database, app):
         database.insert("opportunities", op)
 
     for student in students:
-        database.insert("students", student)
+        database.insert("students", lookup_keys.add_keys("students", student))
 
 
 def test_delete_opportunity_by_id_no_opportunity(opportunity_model, database, app):
@@ -517,7 +529,7 @@ def test_get_valid_students(opportunity_model, database, app):
         database.insert("opportunities", op)
 
     for student in students:
-        database.insert("students", student)
+        database.insert("students", lookup_keys.add_keys("students", student))
 
 
 def test_rank_preferences(opportunity_model, database, app):
@@ -585,7 +597,7 @@ def test_delete_all_opportunity_admin(opportunity_model, database, app):
         database.insert("opportunities", op)
 
     for student in students:
-        database.insert("students", student)
+        database.insert("students", lookup_keys.add_keys("students", student))
 
 
 def test_delete_all_opportunity_employer(
@@ -619,7 +631,7 @@ def test_delete_all_opportunity_employer(
         database.insert("opportunities", op)
 
     for student in students:
-        database.insert("students", student)
+        database.insert("students", lookup_keys.add_keys("students", student))
 
 
 def test_download_opportunities_admin(opportunity_model, database, app):
@@ -632,7 +644,10 @@ def test_download_opportunities_admin(opportunity_model, database, app):
 
     database.insert(
         "employers",
-        {"_id": "456", "company_name": "Company1", "email": "dummy@dummy.com"},
+        lookup_keys.add_keys(
+            "employers",
+            {"_id": "456", "company_name": "Company1", "email": "dummy@dummy.com"},
+        ),
     )
     database.insert(
         "opportunities",
@@ -662,7 +677,7 @@ def test_download_opportunities_admin(opportunity_model, database, app):
         database.insert("opportunities", op)
 
     for employer in employers:
-        database.insert("employers", employer)
+        database.insert("employers", lookup_keys.add_keys("employers", employer))
 
 
 def test_download_opportunities_employer(
@@ -677,7 +692,10 @@ def test_download_opportunities_employer(
 
     database.insert(
         "employers",
-        {"_id": "456", "company_name": "Company1", "email": "dummy@dummy.com"},
+        lookup_keys.add_keys(
+            "employers",
+            {"_id": "456", "company_name": "Company1", "email": "dummy@dummy.com"},
+        ),
     )
     database.insert(
         "opportunities",
@@ -709,7 +727,7 @@ def test_download_opportunities_employer(
         database.insert("opportunities", op)
 
     for employer in employers:
-        database.insert("employers", employer)
+        database.insert("employers", lookup_keys.add_keys("employers", employer))
 
 
 def test_upload_opportunities(opportunity_model, database, app, dummy_data):
@@ -0,0 +1,220 @@
+"""Tests for the what-if matching scenarios."""
+
+import os
+import sys
+
+import pytest
+
+# flake8: noqa: F811
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from algorithm import scenarios
+from user import matching_snapshot
+
+
+@pytest.fixture()
+def snapshot():
+    """Fixture with two students competing for one position."""
+    return {
+        "students": {
+            "Student_1": {"preferences": ["company_1", "company_2"], "modules": []},
+            "Student_2": {"preferences": ["company_1"], "modules": ["CS1"]},
+        },
+        "opportunities": {
+            "company_1": {
+                "positions": 1,
+                "ranking": ["Student_2", "Student_1"],
+                "modules_required": [],
+            },
+            "company_2": {
+                "positions": 1,
+                "ranking": ["Student_1"],
+                "modules_required": ["CS2"],
+            },
+        },
+    }
+
+
+def test_apply_scenario_keeps_the_preferences(snapshot):
+    """Tests the base scenario keeps the preferences as they are."""
+    students, opportunities = scenarios.apply_scenario(
+        snapshot, {"name": "base", "perturbations": []}
+    )
+
+    assert students == {
+        "Student_1": ["company_1", "company_2"],
+        "Student_2": ["company_1"],
+    }
+    assert opportunities["company_1"] == {
+        "positions": 1,
+        "Student_2": 1,
+        "Student_1": 2,
+    }
+
+
+def test_apply_scenario_filters_by_added_modules(snapshot):
+    """Tests students lose opportunities requiring a module they do not have."""
+    add_module = {"type": "add_module", "opportunity": "company_1", "module": "CS1"}
+    drop_module = dict(add_module, type="drop_module")
+
+    students, _ = scenarios.apply_scenario(
+        snapshot, {"name": "add", "perturbations": [add_module]}
+    )
+    assert students == {"Student_1": ["company_2"], "Student_2": ["company_1"]}
+
+    undo = {"name": "undo", "perturbations": [add_module, drop_module]}
+    scenarios.validate_scenarios(snapshot, [undo])
+    students, _ = scenarios.apply_scenario(snapshot, undo)
+    assert students["Student_1"] == ["company_1", "company_2"]
+
+
+def test_base_scenario_matches_the_matching_input():
+    """Tests the base scenario is built from the same input as matching runs."""
+    students = [
+        {"_id": "s1", "preferences": ["o1", " o2 ", "o3"], "modules": ["CS1"]},
+        {"_id": "s2", "preferences": ["o1"]},
+        {"_id": "s3"},
+    ]
+    for student in students:
+        student.update(
+            student_id=student["_id"].upper(),
+            email=f"{student['_id']}@example.com",
+            first_name="Student",
+            last_name=student["_id"],
+        )
+    opportunities = [
+        {
+            "_id": "o1",
+            "spots_available": "1",
+            "preferences": ["s2", "s1"],
+            "modules_required": ["CS1", ""],
+        },
+        {"_id": "o2", "spots_available": 1, "preferences": ["s1"]},
+        {"_id": "o3", "spots_available": 1},
+    ]
+    students_preference, opportunities_preference, _ = (
+        matching_snapshot.build_preferences(students, opportunities)
+    )
+
+    snapshot = matching_snapshot.build_scenario_snapshot(students, opportunities)
+    base = scenarios.apply_scenario(snapshot, {"name": "base"})
+
+    assert base[0] == students_preference
+    assert {
+        opportunity: dict(ranking, positions=int(ranking["positions"]))
+        for opportunity, ranking in opportunities_preference.items()
+    } == base[1]
+    assert snapshot["opportunities"]["o1"]["modules_required"] == ["CS1"]
+    # Students left out of the matching input are kept to count as unmatched
+    assert snapshot["students"]["s3"] == {"preferences": [], "modules": []}
+    assert scenarios.run_scenario({"name": "base"}, snapshot)["students"] == 3
+
+
+def test_run_scenario(snapshot):
+    """Tests the summary of a single scenario."""
+    result = scenarios.run_scenario(
+        {
+            "name": "more spots",
+            "perturbations": [
+                {"type": "positions", "opportunity": "company_1", "change": 1}
+            ],
+        },
+        snapshot,
+    )
+
+    assert result["name"] == "more spots"
+    assert result["matched"] == 2
+    assert result["unmatched"] == 0
+    assert result["match_rate"] == 1.0
+    assert result["average_rank"] == 1.0
+
+
+def test_removed_opportunity_leaves_students_unmatched(snapshot):
+    """Tests students left without preferences stay in the totals as unmatched."""
+    base = scenarios.run_scenario({"name": "base"}, snapshot)
+    result = scenarios.run_scenario(
+        {
+            "name": "remove company",
+            "perturbations": [
+                {"type": "remove_opportunity", "opportunity": "company_1"}
+            ],
+        },
+        snapshot,
+    )
+
+    assert base["students"] == result["students"] == 2
+    assert base["unmatched"] == 0
+    assert result["unmatched"] == 1
+    assert result["match_rate"] == 0.5
+
+
+def test_run_scenarios_compares_to_base(snapshot):
+    """Tests scenarios run in a process pool and are compared to the base."""
+    results = scenarios.run_scenarios(
+        snapshot,
+        [
+            {
+                "name": "add module",
+                "perturbations": [
+                    {"type": "add_module", "opportunity": "company_1", "module": "CS1"}
+                ],
+            },
+            {
+                "name": "remove company",
+                "perturbations": [
+                    {"type": "remove_opportunity", "opportunity": "company_1"}
+                ],
+            },
+        ],
+        max_workers=2,
+    )
+
+    assert [result["name"] for result in results] == [
+        "base",
+        "add module",
+        "remove company",
+    ]
+    base, add_module, remove_company = results
+    assert base["match_rate"] == 1.0
+    assert base["average_rank"] == 1.5
+    assert base["changed_students"] == 0
+    assert add_module["unmatched_change"] == 0
+    assert add_module["average_rank_change"] == -0.5
+    assert add_module["changed_students"] == 0
+    assert remove_company["students"] == 2
+    assert remove_company["unmatched_change"] == 1
+    assert remove_company["match_rate_change"] == -0.5
+    assert remove_company["changed_students"] == 1
+
+
+@pytest.mark.parametrize(
+    "perturbation",
+    [
+        {"type": "unknown", "opportunity": "company_1"},
+        {"type": "positions", "opportunity": "company_9", "change": 1},
+        {"type": "positions", "opportunity": "company_1", "change": "1"},
+        {"type": "add_module", "opportunity": "company_1"},
+        {"type": "positions", "opportunity": "company_1", "change": True},
+        {"type": "remove_opportunity", "opportunity": ["company_1"]},
+        {"type": "drop_module", "opportunity": "company_2", "module": "CS2"},
+        {"type": "drop_module", "opportunity": "company_1", "module": "CS1"},
+        ["positions"],
+        "positions",
+    ],
+)
+def test_invalid_scenarios(snapshot, perturbation):
+    """Tests malformed scenarios are rejected before running."""
+    with pytest.raises(ValueError):
+        scenarios.run_scenarios(
+            snapshot, [{"name": "invalid", "perturbations": [perturbation]}]
+        )
+
+
+@pytest.mark.parametrize("scenario", [{"name": "invalid", "perturbations": {}}, []])
+def test_invalid_scenario_lists(snapshot, scenario):
+    """Tests scenarios that are not objects or without a perturbation list."""
+    with pytest.raises(ValueError):
+        scenarios.validate_scenarios(snapshot, [scenario])
@@ -14,8 +14,8 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
 
 os.environ["IS_TEST"] = "True"
 
@@ -34,7 +34,7 @@ def app():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"), shared.getenv("MONGO_DB_TEST", "cs3528_testing")
     )
     skills = database.get_all("skills")
@@ -50,7 +50,7 @@ def database():
     database.delete_all_by_field("users", "email", "dummy@dummy.com")
     database.delete_all_by_field("courses", "course_id", "CS101")
     # Cleanup code
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
@@ -345,7 +345,7 @@ def test_delete_skill_with_students(database, skill_model, app):
         "email": "student@example.com",
         "skills": [sample_skill["_id"]],
     }
-    database.insert("students", sample_student)
+    database.insert("students", lookup_keys.add_keys("students", sample_student))
 
     with app.app_context():
         with app.test_request_context():
@@ -537,7 +537,7 @@ def test_approve_skill_updates_students(database, skill_model, app):
         "skills": [],
         "attempted_skills": [attempted_skill["_id"]],
     }
-    database.insert("students", sample_student)
+    database.insert("students", lookup_keys.add_keys("students", sample_student))
 
     with app.app_context():
         with app.test_request_context():
@@ -602,7 +602,7 @@ def test_reject_skill_updates_students(database, skill_model, app):
         "skills": [],
         "attempted_skills": [attempted_skill["_id"]],
     }
-    database.insert("students", sample_student)
+    database.insert("students", lookup_keys.add_keys("students", sample_student))
 
     with app.app_context():
         with app.test_request_context():
@@ -0,0 +1,157 @@
+"""Tests for the matching stability verifier."""
+
+import os
+import random
+import sys
+
+# flake8: noqa: F811
+
+sys.path.append(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+)
+
+from algorithm.benchmark import generate_cohort
+from algorithm.matching import Matching
+from algorithm.stability import verify_matching
+
+
+def _blocking_pairs(students_preference, employer_preference, matches):
+    """Find blocking pairs by checking every preference in Python."""
+    assigned = {
+        student: placement
+        for placement, students in matches.items()
+        for student in students
+    }
+    blocking = []
+    for student, preferences in students_preference.items():
+        for placement in preferences:
+            if placement == assigned.get(student):
+                break
+            ranking = employer_preference.get(placement, {})
+            if student not in ranking:
+                continue
+            current = matches.get(placement, [])
+            if len(current) < ranking["positions"] or any(
+                ranking[student] < ranking[other] for other in current
+            ):
+                blocking.append((student, placement))
+    return sorted(blocking)
+
+
+def test_matching_is_stable():
+    """Tests that the matching algorithm produces stable matchings."""
+    students_preference, employer_preference = generate_cohort(
+        2000, 300, 5, seed=4, employer_rank_density=0.7
+    )
+    matches = Matching(students_preference, employer_preference).find_best_match()[1]
+
+    report = verify_matching(students_preference, employer_preference, matches)
+
+    assert report == {
+        "stable": True,
+        "blocking_pairs": [],
+        "over_capacity": [],
+        "invalid_matches": [],
+        "duplicate_students": [],
+    }
+
+
+def test_blocking_pair_is_reported():
+    """Tests that a student preferring a placement that prefers them is reported."""
+    students_preference = {
+        "Student_1": ["company_1", "company_2"],
+        "Student_2": ["company_2"],
+    }
+    employer_preference = {
+        "company_1": {"positions": 1, "Student_1": 1},
+        "company_2": {"positions": 1, "Student_1": 1, "Student_2": 2},
+    }
+
+    report = verify_matching(
+        students_preference, employer_preference, {"company_2": ["Student_1"]}
+    )
+
+    assert not report["stable"]
+    assert report["blocking_pairs"] == [("Student_1", "company_1")]
+
+
+def test_capacity_and_invalid_matches_are_reported():
+    """Tests that over capacity, unranked and duplicate matches are reported."""
+    students_preference = {
+        "Student_1": ["company_1"],
+        "Student_2": ["company_1"],
+        "Student_3": ["company_2"],
+    }
+    employer_preference = {
+        "company_1": {"positions": 1, "Student_1": 1, "Student_2": 2},
+        "company_2": {"positions": 2, "Student_1": 1},
+    }
+
+    report = verify_matching(
+        students_preference,
+        employer_preference,
+        {
+            "company_1": ["Student_1", "Student_2"],
+            "company_2": ["Student_1", "Student_3"],
+            "company_9": ["Student_2"],
+        },
+    )
+
+    assert not report["stable"]
+    assert report["over_capacity"] == ["company_1"]
+    assert sorted(report["invalid_matches"]) == [
+        ("Student_1", "company_2"),
+        ("Student_2", "company_9"),
+        ("Student_3", "company_2"),
+    ]
+    assert report["duplicate_students"] == ["Student_1"]
+
+
+def test_blocking_pairs_match_python_check():
+    """Tests the verifier against a pure Python check on random matchings."""
+    rng = random.Random(7)
+    for _ in range(50):
+        students = [f"Student_{i}" for i in range(rng.randint(1, 30))]
+        companies = [f"company_{i}" for i in range(rng.randint(1, 8))]
+        students_preference = {
+            student: rng.sample(companies, k=rng.randint(0, len(companies)))
+            for student in students
+        }
+        employer_preference = {}
+        for company in companies:
+            ranked = rng.sample(students, k=rng.randint(0, len(students)))
+            ranking = {student: i + 1 for i, student in enumerate(ranked)}
+            ranking["positions"] = rng.randint(0, 3)
+            employer_preference[company] = ranking
+        matches = {}
+        for student, preferences in students_preference.items():
+            if preferences and rng.random() < 0.5:
+                company = rng.choice(preferences)
+                ranking = employer_preference[company]
+                if (
+                    student in ranking
+                    and len(matches.get(company, [])) < ranking["positions"]
+                ):
+                    matches.setdefault(company, []).append(student)
+
+        report = verify_matching(students_preference, employer_preference, matches)
+
+        assert sorted(report["blocking_pairs"]) == _blocking_pairs(
+            students_preference, employer_preference, matches
+        )
+
+
+def test_validation_mode():
+    """Tests that the matching checks its own result in validation mode."""
+    students_preference = {"Student_1": ["company_1"], "Student_2": ["company_1"]}
+    employer_preference = {
+        "company_1": {"positions": 1, "Student_1": 2, "Student_2": 1}
+    }
+    match = Matching(students_preference, employer_preference, validate=True)
+
+    match.find_best_match()
+    assert match.validation["stable"]
+
+    match.update_student_preferences("Student_2", [])
+    assert match.validation["stable"]
+    assert match.get_matches() == (["Student_2"], {"company_1": ["Student_1"]})
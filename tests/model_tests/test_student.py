@@ -13,8 +13,8 @@ import pytest
 sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
 
 os.environ["IS_TEST"] = "True"
 
@@ -41,7 +41,7 @@ def client():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"), shared.getenv("MONGO_DB_TEST", "cs3528_testing")
     )
     current_students = database.get_all("students")
@@ -51,13 +51,13 @@ def database():
     yield database
     database.delete_all("students")
     for student in current_students:
-        database.insert("students", student)
+        database.insert("students", lookup_keys.add_keys("students", student))
     database.delete_all("opportunities")
     for opportunity in opportunities:
         database.insert("opportunities", opportunity)
 
     # Cleanup code
-    database.connection.close()
+    database.close_connection()
 
 
 def test_add_student_success(app, database):
@@ -99,7 +99,7 @@ def test_add_student_no_id(app, database):
         "student_id": "123",
     }
 
-    database.insert("students", student)
+    database.insert("students", lookup_keys.add_keys("students", student))
 
     with app.app_context():
         with app.test_request_context():
@@ -122,7 +122,7 @@ def test_add_student_duplicate(app, database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     student1 = {
         "_id": "124",
@@ -163,7 +163,7 @@ def test_add_student_duplicate_override(app, database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     student1 = {
         "_id": "124",
@@ -201,7 +201,7 @@ def test_get_student_by_id(database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     assert Student().get_student_by_id("123") == student1
 
@@ -247,7 +247,7 @@ def test_get_all_students_empty(database):
     assert result == []
 
     for student in current_students:
-        database.insert("students", student)
+        database.insert("students", lookup_keys.add_keys("students", student))
 
 
 def test_get_student_map(database):
@@ -264,17 +264,17 @@ def test_get_student_map(database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     student2 = {
         "_id": "124",
         "first_name": "dummy2",
         "last_name": "dummy2",
         "email": "dummy2@dummy.com",
-        "student_id": "123",
+        "student_id": "124",
     }
 
-    database.insert("students", student2)
+    database.insert("students", lookup_keys.add_keys("students", student2))
 
     student_map = Student().get_students_map()
     assert student_map["123"] == student1
@@ -311,7 +311,7 @@ def test_get_student_by_uuid(database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     assert Student().get_student_by_uuid("123") == student1
 
@@ -345,7 +345,7 @@ def test_update_student_by_id_success(app, database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     updated_student = {
         "first_name": "updated_dummy",
@@ -406,7 +406,7 @@ def test_update_student_by_uuid_success(app, database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     updated_student = {
         "first_name": "updated_dummy",
@@ -468,7 +468,7 @@ def test_delete_student_by_id(app, database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     with app.app_context():
         response = Student().delete_student_by_id("123")
@@ -500,7 +500,7 @@ def test_delete_student_by_id_opportunities(app, database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     opportunity1 = {
         "_id": "123",
@@ -569,7 +569,7 @@ def test_delete_students(app, database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     student2 = {
         "_id": "124",
@@ -579,7 +579,7 @@ def test_delete_students(app, database):
         "student_id": "124",
     }
 
-    database.insert("students", student2)
+    database.insert("students", lookup_keys.add_keys("students", student2))
 
     with app.app_context():
         response = Student().delete_students()
@@ -593,7 +593,7 @@ def test_delete_students(app, database):
     database.delete_all_by_field("students", "_id", "124")
 
     for student in current_students:
-        database.insert("students", student)
+        database.insert("students", lookup_keys.add_keys("students", student))
 
 
 def test_get_student_by_email(app, database):
@@ -610,7 +610,7 @@ def test_get_student_by_email(app, database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     with app.app_context():
         response = Student().get_student_by_email("dummy@dummy.com")
@@ -727,7 +727,7 @@ def test_student_login(app, database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     with app.app_context():
         with app.test_request_context():
@@ -775,7 +775,7 @@ def test_rank_preferences(app, database):
         "student_id": "123",
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     with app.app_context():
         with app.test_request_context():
@@ -878,7 +878,7 @@ def test_get_opportunities_by_student(app, database):
         "placement_duration": ["1_day", "1_week"],
     }
 
-    database.insert("students", student1)
+    database.insert("students", lookup_keys.add_keys("students", student1))
 
     with app.app_context():
         with app.test_request_context():
@@ -16,7 +16,7 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core.database_backends import create_database_manager
 
 
 @pytest.fixture()
@@ -31,14 +31,14 @@ def app():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"), shared.getenv("MONGO_DB_TEST", "cs3528_testing")
     )
 
     yield database
 
     # Cleanup code
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
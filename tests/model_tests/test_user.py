@@ -8,15 +8,14 @@ from passlib.hash import pbkdf2_sha512
 
 from flask import session
 
-
 # flake8: noqa: F811
 
 # Add the root directory to the Python path
 sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
 
 os.environ["IS_TEST"] = "True"
 
@@ -44,7 +43,7 @@ def user_model():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"), shared.getenv("MONGO_DB_TEST", "cs3528_testing")
     )
 
@@ -60,7 +59,7 @@ def database():
         database.delete_all_by_field(table, "email", "dummy@dummy.com")
 
     # Cleanup code
-    database.connection.close()
+    database.close_connection()
 
 
 def test_start_session(app, user_model):
@@ -114,7 +113,7 @@ def test_register_email_in_use(app, database, user_model):
         "password": "password",
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     with app.app_context():
         with app.test_request_context():
@@ -126,6 +125,22 @@ def test_register_email_in_use(app, database, user_model):
     database.delete_all_by_field("users", "email", "dummy@dummy.com")
 
 
+def test_register_superuser_email(app, user_model):
+    """Tests the superuser email cannot be registered in another case."""
+    user = {
+        "_id": "126",
+        "name": "Superuser",
+        "email": " " + os.getenv("SUPERUSER_EMAIL").upper(),
+        "password": "password",
+    }
+
+    with app.app_context():
+        with app.test_request_context():
+            response = user_model.register(user)
+            assert response[1] == 400
+            assert response[0].get_json()["error"] == "Email address already in use"
+
+
 def test_register_failure(app, user_model):
     """Tests the register method of the User model when
     the request is missing the email or password."""
@@ -149,7 +164,7 @@ def test_login_success(app, database, user_model):
     }
 
     # Insert the user into the database
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     attempt_user = {
         "email": "dummy@dummy.com",
@@ -180,7 +195,7 @@ def test_login_invalid_credentials(app, database, user_model):
     }
 
     # Insert the user into the database
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     attempt_user = {
         "email": "dummy@dummy.com",
@@ -345,7 +360,7 @@ def test_send_match_email(app, database, user_model):
         "last_name": "User",
         "email": "dummy@dummy.com",
     }
-    database.insert("students", student)
+    database.insert("students", lookup_keys.add_keys("students", student))
     opportunity_uuid = "opportunity-uuid"
     opportunity = {
         "_id": "opportunity-uuid",
@@ -359,7 +374,7 @@ def test_send_match_email(app, database, user_model):
         "company_name": "Employer",
         "email": "dummy@dummy.com",
     }
-    database.insert("employers", employer)
+    database.insert("employers", lookup_keys.add_keys("employers", employer))
 
     with app.app_context():
         with app.test_request_context():
@@ -385,7 +400,7 @@ def test_delete_user_success(app, database, user_model):
         "password": "password",
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     with app.app_context():
         with app.test_request_context():
@@ -423,7 +438,7 @@ def test_get_user_by_uuid_success(app, database, user_model):
     }
 
     # Insert the user into the database
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     with app.app_context():
         with app.test_request_context():
@@ -465,8 +480,8 @@ def test_get_users_without_passwords(app, database, user_model):
         "password": "password2",
     }
 
-    database.insert("users", user1)
-    database.insert("users", user2)
+    database.insert("users", lookup_keys.add_keys("users", user1))
+    database.insert("users", lookup_keys.add_keys("users", user2))
 
     with app.app_context():
         with app.test_request_context():
@@ -479,7 +494,7 @@ def test_get_users_without_passwords(app, database, user_model):
     database.delete_all_by_field("users", "email", "nopassword2@dummy.com")
 
     for user in existing_users:
-        database.insert("users", user)
+        database.insert("users", lookup_keys.add_keys("users", user))
 
 
 def test_update_user_success(app, database, user_model):
@@ -495,7 +510,7 @@ def test_update_user_success(app, database, user_model):
         "password": "password",
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     with app.app_context():
         with app.test_request_context():
@@ -533,8 +548,8 @@ def test_update_user_email_in_use(app, database, user_model):
         "password": "password",
     }
 
-    database.insert("users", user)
-    database.insert("users", existing_user)
+    database.insert("users", lookup_keys.add_keys("users", user))
+    database.insert("users", lookup_keys.add_keys("users", existing_user))
 
     with app.app_context():
         with app.test_request_context():
@@ -577,7 +592,7 @@ def test_change_password_success(app, database, user_model):
         "password": pbkdf2_sha512.hash("oldpassword"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     with app.app_context():
         with app.test_request_context():
@@ -605,7 +620,7 @@ def test_change_password_mismatch(app, database, user_model):
         "password": pbkdf2_sha512.hash("oldpassword"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     with app.app_context():
         with app.test_request_context():
@@ -636,3 +651,89 @@ def test_register_missing_name(app, database, user_model):
             assert json_data["error"] == "Missing name"
 
     database.delete_all_by_field("users", "email", "dummy@dummy.com")
+
+
+def test_dashboard_counts(app, database, user_model):
+    """Tests the dashboard counts are kept until the students are written."""
+    from app import DEADLINE_MANAGER
+    from students.models import Student
+    from user import dashboard
+
+    deadlines = [
+        deadline.strftime("%Y-%m-%d") for deadline in DEADLINE_MANAGER.get_deadlines()
+    ]
+    with app.test_request_context():
+        DEADLINE_MANAGER.update_deadlines("2099-01-01", "2099-01-08", "2099-01-15")
+    try:
+        dashboard.reset_cache()
+        with app.test_request_context():
+            name, date, students, opportunities = (
+                user_model.get_nearest_deadline_for_dashboard()
+            )
+        assert "Add Details" in name
+        assert date == "2099-01-01"
+
+        database.insert_many(
+            "students",
+            [
+                lookup_keys.add_keys("students", record)
+                for record in [
+                    {
+                        "_id": "dashboard1",
+                        "student_id": "d1",
+                        "email": "dummy@dummy.com",
+                    },
+                    {
+                        "_id": "dashboard2",
+                        "student_id": "d2",
+                        "email": "dummy@dummy.com",
+                        "course": "G401",
+                    },
+                ]
+            ],
+        )
+        with app.test_request_context():
+            assert user_model.get_nearest_deadline_for_dashboard()[2] == students
+
+        dashboard.reset_cache()
+        with app.test_request_context():
+            assert user_model.get_nearest_deadline_for_dashboard()[2:] == (
+                students + 1,
+                opportunities,
+            )
+
+        # Adding a student through the model counts the students again
+        with app.test_request_context():
+            Student().add_student(
+                {"_id": "dashboard3", "student_id": "d3", "email": "d3@dummy.com"}
+            )
+            assert user_model.get_nearest_deadline_for_dashboard()[2] == students + 2
+
+        # A write by another process is counted from the next request
+        database.insert(
+            "students",
+            lookup_keys.add_keys(
+                "students",
+                {"_id": "dashboard4", "student_id": "d4", "email": "d4@dummy.com"},
+            ),
+        )
+        database.bulk_write(
+            "cache_versions",
+            [
+                {
+                    "updateOne": {
+                        "filter": {"_id": "students"},
+                        "update": {"$inc": {"version": 1}},
+                        "upsert": True,
+                    }
+                }
+            ],
+        )
+        with app.test_request_context():
+            assert user_model.get_nearest_deadline_for_dashboard()[2] == students + 3
+    finally:
+        with app.test_request_context():
+            DEADLINE_MANAGER.update_deadlines(*deadlines)
+        for student_id in ("dashboard1", "dashboard2", "dashboard3", "dashboard4"):
+            database.delete_by_id("students", student_id)
+        dashboard.reset_cache()
@@ -15,8 +15,9 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
+from core.database_interface import DatabaseInterface
 
 os.environ["IS_TEST"] = "True"
 
@@ -36,7 +37,7 @@ def client():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"), shared.getenv("MONGO_DB_TEST", "cs3528_testing")
     )
 
@@ -46,11 +47,11 @@ def database():
     database.delete_all_by_field("courses", "course_id", "CS101")
     database.delete_all_by_field("courses", "course_id", "CS102")
 
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
-def user_logged_in_client(client, database: DatabaseMongoManager):
+def user_logged_in_client(client, database: DatabaseInterface):
     """Fixture to login a user."""
     database.add_table("users")
     database.delete_all_by_field("users", "email", "dummy@dummy.com")
@@ -62,7 +63,7 @@ def user_logged_in_client(client, database: DatabaseMongoManager):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     url = "/user/login"
     client.post(
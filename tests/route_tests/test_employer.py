@@ -16,8 +16,9 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
+from core.database_interface import DatabaseInterface
 
 os.environ["IS_TEST"] = "True"
 
@@ -37,7 +38,7 @@ def client():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"), shared.getenv("MONGO_DB_TEST", "cs3528_testing")
     )
     deadlines = database.get_all("deadline")
@@ -49,11 +50,11 @@ def database():
         database.insert("deadline", deadline)
 
     # Cleanup code
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
-def employer_logged_in_client(client, database: DatabaseMongoManager):
+def employer_logged_in_client(client, database: DatabaseInterface):
     """Fixture to login an employer."""
     database.add_table("employers")
     database.delete_all_by_field("employers", "email", "dummy@dummy.com")
@@ -64,7 +65,7 @@ def employer_logged_in_client(client, database: DatabaseMongoManager):
         "email": "dummy@dummy.com",
     }
 
-    database.insert("employers", employer)
+    database.insert("employers", lookup_keys.add_keys("employers", employer))
 
     url = "/employers/login"
     client.post(
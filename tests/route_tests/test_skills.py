@@ -17,8 +17,9 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
+from core.database_interface import DatabaseInterface
 
 os.environ["IS_TEST"] = "True"
 
@@ -38,7 +39,7 @@ def client():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"), shared.getenv("MONGO_DB_TEST", "cs3528_testing")
     )
 
@@ -56,11 +57,11 @@ def database():
 
     # Cleanup code
 
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
-def user_logged_in_client(client, database: DatabaseMongoManager):
+def user_logged_in_client(client, database: DatabaseInterface):
     """Fixture to login a user."""
     database.add_table("users")
     database.delete_all_by_field("users", "email", "dummy@dummy.com")
@@ -72,7 +73,7 @@ def user_logged_in_client(client, database: DatabaseMongoManager):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     url = "/user/login"
     client.post(
@@ -93,7 +94,7 @@ def user_logged_in_client(client, database: DatabaseMongoManager):
 
 
 @pytest.fixture()
-def student_logged_in_client(client, database: DatabaseMongoManager):
+def student_logged_in_client(client, database: DatabaseInterface):
     """Fixture to login a student."""
     database.add_table("students")
     database.delete_all_by_field("students", "email", "dummy@dummy.com")
@@ -106,7 +107,7 @@ def student_logged_in_client(client, database: DatabaseMongoManager):
         "student_id": "123456",
     }
 
-    database.insert("students", student)
+    database.insert("students", lookup_keys.add_keys("students", student))
 
     url = "/students/login"
 
@@ -16,8 +16,9 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
+from core.database_interface import DatabaseInterface
 
 os.environ["IS_TEST"] = "True"
 
@@ -37,7 +38,7 @@ def client():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"), shared.getenv("MONGO_DB_TEST", "cs3528_testing")
     )
 
@@ -63,11 +64,11 @@ def database():
             database.insert(collection, item)
 
     # Cleanup code
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
-def student_logged_in_client(client, database: DatabaseMongoManager):
+def student_logged_in_client(client, database: DatabaseInterface):
     """Fixture to login a student."""
     database.add_table("students")
     database.delete_all_by_field("students", "email", "dummy@dummy.com")
@@ -81,7 +82,7 @@ def student_logged_in_client(client, database: DatabaseMongoManager):
         "modules": [],
     }
 
-    database.insert("students", student)
+    database.insert("students", lookup_keys.add_keys("students", student))
     url = "/students/login"
 
     client.post(
@@ -108,7 +109,7 @@ def student_logged_in_client(client, database: DatabaseMongoManager):
 
 
 @pytest.fixture()
-def student_logged_in_client_after_details(client, database: DatabaseMongoManager):
+def student_logged_in_client_after_details(client, database: DatabaseInterface):
     """Fixture to login a student."""
     database.add_table("students")
     database.delete_all_by_field("students", "email", "dummy@dummy.com")
@@ -191,7 +192,7 @@ def student_logged_in_client_after_details(client, database: DatabaseMongoManage
 
     database.insert("attempted_skills", attempted_skill)
 
-    database.insert("students", student)
+    database.insert("students", lookup_keys.add_keys("students", student))
     url = "/students/login"
 
     client.post(
@@ -224,7 +225,7 @@ def student_logged_in_client_after_details(client, database: DatabaseMongoManage
 
 
 @pytest.fixture()
-def student_logged_in_client_after_preferences(client, database: DatabaseMongoManager):
+def student_logged_in_client_after_preferences(client, database: DatabaseInterface):
     """Fixture to login a student."""
     database.add_table("students")
     database.delete_all_by_field("students", "email", "dummy@dummy.com")
@@ -399,12 +400,12 @@ def student_logged_in_client_after_preferences(client, database: DatabaseMongoMa
     for attempted_skill in attempted_skills:
         database.insert("attempted_skills", attempted_skill)
 
-    database.insert("employers", employer)
+    database.insert("employers", lookup_keys.add_keys("employers", employer))
 
     for opportunity in opportunities:
         database.insert("opportunities", opportunity)
 
-    database.insert("students", student)
+    database.insert("students", lookup_keys.add_keys("students", student))
     url = "/students/login"
 
     client.post(
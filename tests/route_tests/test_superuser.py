@@ -14,7 +14,8 @@ sys.path.append(
 )
 
 from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core.database_backends import create_database_manager
+from core.database_interface import DatabaseInterface
 
 os.environ["IS_TEST"] = "True"
 
@@ -34,18 +35,18 @@ def client():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"), shared.getenv("MONGO_DB_TEST", "cs3528_testing")
     )
 
     yield database
 
     # Cleanup code
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
-def superuser_logged_in_client(client, database: DatabaseMongoManager):
+def superuser_logged_in_client(client, database: DatabaseInterface):
     """Fixture to login a superuser."""
     database.add_table("users")
 
@@ -111,6 +112,13 @@ def test_get_config_page(superuser_logged_in_client):
     assert response.status_code == 200
 
 
+def test_get_slow_queries_page(superuser_logged_in_client):
+    """Test getting the slow queries page."""
+    response = superuser_logged_in_client.get("/superuser/slow_queries?limit=10")
+    assert response.status_code == 200
+    assert b"Slow Queries" in response.data
+
+
 def test_configure_settings_invalid_input(superuser_logged_in_client):
     """Test configuring settings with invalid input."""
     response = superuser_logged_in_client.post(
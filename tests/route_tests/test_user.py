@@ -16,8 +16,9 @@ sys.path.append(
     os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 )
 
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
+from core.database_interface import DatabaseInterface
 
 os.environ["IS_TEST"] = "True"
 
@@ -37,7 +38,7 @@ def client():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"), shared.getenv("MONGO_DB_TEST", "cs3528_testing")
     )
     deadlines = database.get_all("deadline")
@@ -49,11 +50,11 @@ def database():
         database.insert("deadline", deadline)
 
     # Cleanup code
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
-def user_logged_in_client(client, database: DatabaseMongoManager):
+def user_logged_in_client(client, database: DatabaseInterface):
     """Fixture to login a user."""
     database.add_table("users")
     database.delete_all_by_field("users", "email", "dummy@dummy.com")
@@ -65,7 +66,7 @@ def user_logged_in_client(client, database: DatabaseMongoManager):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     url = "/user/login"
     client.post(
@@ -84,7 +85,7 @@ def user_logged_in_client(client, database: DatabaseMongoManager):
 
 
 @pytest.fixture()
-def superuser_logged_in_client(client, database: DatabaseMongoManager):
+def superuser_logged_in_client(client, database: DatabaseInterface):
     """Fixture to login a superuser."""
     database.add_table("users")
 
@@ -255,7 +256,7 @@ def test_email_already_in_use(superuser_logged_in_client, database):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     response = superuser_logged_in_client.post(
         url,
@@ -312,7 +313,7 @@ def test_update_user(superuser_logged_in_client, database):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     url = f"/user/update?uuid={user['_id']}"
     response = superuser_logged_in_client.post(
@@ -363,7 +364,7 @@ def test_update_user_get_request(superuser_logged_in_client, database):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     response = superuser_logged_in_client.get(url, query_string={"uuid": user["_id"]})
 
@@ -387,7 +388,7 @@ def test_login_user(client, database):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     url = "/user/login"
     response = client.post(
@@ -416,7 +417,7 @@ def test_login_user_invalid_password(client, database):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     url = "/user/login"
     response = client.post(
@@ -510,7 +511,7 @@ def test_delete_user(superuser_logged_in_client, database):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     response = superuser_logged_in_client.delete(
         url,
@@ -534,7 +535,7 @@ def test_change_password(superuser_logged_in_client, database):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     url = f"/user/change_password?uuid={user['_id']}"
     response = superuser_logged_in_client.post(
@@ -566,7 +567,7 @@ def test_change_password_mismatch(superuser_logged_in_client, database):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     response = superuser_logged_in_client.post(
         url,
@@ -596,7 +597,7 @@ def test_get_change_password_page(superuser_logged_in_client, database):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     response = superuser_logged_in_client.get(url, query_string={"uuid": user["_id"]})
 
@@ -632,9 +633,9 @@ def test_send_match_email(user_logged_in_client, database):
         "employer_id": employer["_id"],
     }
 
-    database.insert("students", student)
+    database.insert("students", lookup_keys.add_keys("students", student))
     database.insert("opportunities", opportunity)
-    database.insert("employers", employer)
+    database.insert("employers", lookup_keys.add_keys("employers", employer))
 
     deadlines = database.get_all("deadline")
     if deadlines:
@@ -642,12 +643,24 @@ def test_send_match_email(user_logged_in_client, database):
     database.insert("deadline", {"type": 0, "deadline": "2022-10-10"})
     database.insert("deadline", {"type": 1, "deadline": "2022-10-12"})
     database.insert("deadline", {"type": 2, "deadline": "2022-10-15"})
+    run_id = uuid.uuid4().hex
+    database.insert(
+        "matching_runs",
+        {
+            "_id": run_id,
+            "status": "completed",
+            "matches": [
+                {"opportunity": opportunity["_id"], "students": [student["_id"]]}
+            ],
+        },
+    )
 
     response = user_logged_in_client.post(
         url,
         data={
             "student": student["_id"],
             "opportunity": opportunity["_id"],
+            "run": run_id,
         },
         content_type="application/x-www-form-urlencoded",
     )
@@ -655,6 +668,7 @@ def test_send_match_email(user_logged_in_client, database):
     assert response.status_code == 200
     assert response.json["message"] == "Email Sent"
 
+    database.delete_by_id("matching_runs", run_id)
     database.delete_all_by_field("students", "email", "dummy_student@dummy.com")
     database.delete_all_by_field("employers", "email", "dummy_employer@dummy.com")
     database.delete_all_by_field("opportunities", "title", "dummy_opportunity")
@@ -663,6 +677,44 @@ def test_send_match_email(user_logged_in_client, database):
         database.insert("deadline", deadline)
 
 
+def test_send_match_email_not_in_run(user_logged_in_client, database):
+    """Test send match email for a pair that is not in the matching run."""
+    url = "/user/send_match_email"
+
+    deadlines = database.get_all("deadline")
+    if deadlines:
+        database.delete_all("deadline")
+    database.insert("deadline", {"type": 0, "deadline": "2022-10-10"})
+    database.insert("deadline", {"type": 1, "deadline": "2022-10-12"})
+    database.insert("deadline", {"type": 2, "deadline": "2022-10-15"})
+    run_id = uuid.uuid4().hex
+    database.insert(
+        "matching_runs", {"_id": run_id, "status": "completed", "matches": []}
+    )
+
+    response = user_logged_in_client.post(
+        url,
+        data={"student": "123", "opportunity": "456", "run": run_id},
+        content_type="application/x-www-form-urlencoded",
+    )
+
+    assert response.status_code == 400
+    assert response.json["error"] == "Student was not matched to opportunity"
+
+    response = user_logged_in_client.post(
+        url,
+        data={"student": "123", "opportunity": "456", "run": "missing"},
+        content_type="application/x-www-form-urlencoded",
+    )
+
+    assert response.status_code == 404
+
+    database.delete_by_id("matching_runs", run_id)
+    database.delete_all("deadline")
+    for deadline in deadlines:
+        database.insert("deadline", deadline)
+
+
 def test_user_home(user_logged_in_client):
     """Test user home page."""
     url = "/user/home"
@@ -720,7 +772,11 @@ def test_update_employer_post(user_logged_in_client, database):
     database.delete_all_by_field("employers", "email", "dummy@dummy.com")
 
     database.insert(
-        "employers", {"_id": "123", "company_name": "dummy", "email": "dummy@dummy.com"}
+        "employers",
+        lookup_keys.add_keys(
+            "employers",
+            {"_id": "123", "company_name": "dummy", "email": "dummy@dummy.com"},
+        ),
     )
 
     updated_data = {
@@ -747,7 +803,11 @@ def test_update_employer_post_wrong_id(user_logged_in_client, database):
     database.delete_all_by_field("employers", "email", "dummy@dummy.com")
 
     database.insert(
-        "employers", {"_id": "123", "company_name": "dummy", "email": "dummy@dummy.com"}
+        "employers",
+        lookup_keys.add_keys(
+            "employers",
+            {"_id": "123", "company_name": "dummy", "email": "dummy@dummy.com"},
+        ),
     )
 
     updated_data = {
@@ -789,7 +849,11 @@ def test_update_employer_get_method(user_logged_in_client, database):
     database.delete_all_by_field("employers", "email", "dummy@dummy.com")
 
     database.insert(
-        "employers", {"_id": "123", "company_name": "dummy", "email": "dummy@dummy.com"}
+        "employers",
+        lookup_keys.add_keys(
+            "employers",
+            {"_id": "123", "company_name": "dummy", "email": "dummy@dummy.com"},
+        ),
     )
 
     response = user_logged_in_client.get(url, query_string={"employer_id": "123"})
@@ -813,7 +877,7 @@ def test_delete_employer(user_logged_in_client, database):
     database.delete_all_by_field("employers", "email", "dummy@dummy.com")
 
     employer = {"_id": "123", "company_name": "dummy", "email": "dummy@dummy.com"}
-    database.insert("employers", employer)
+    database.insert("employers", lookup_keys.add_keys("employers", employer))
 
     response = user_logged_in_client.post(
         url,
@@ -871,7 +935,7 @@ def test_delete_student(user_logged_in_client, database):
         "first_name": "dummy",
         "email": "dummy@dummy.com",
     }
-    database.insert("students", student)
+    database.insert("students", lookup_keys.add_keys("students", student))
 
     # Send DELETE request
     response = user_logged_in_client.delete(url)
@@ -13,8 +13,8 @@ os.environ["IS_TEST"] = "True"
 # pylint: disable=redefined-outer-name
 # flake8: noqa: F811
 
-from core import shared
-from core.database_mongo_manager import DatabaseMongoManager
+from core import lookup_keys, shared
+from core.database_backends import create_database_manager
 
 
 @pytest.fixture()
@@ -30,7 +30,7 @@ def client():
 def database():
     """Fixture to create a test database."""
 
-    database = DatabaseMongoManager(
+    database = create_database_manager(
         shared.getenv("MONGO_URI"),
         shared.getenv("MONGO_DB_TEST", "cs3528_testing"),
     )
@@ -38,7 +38,7 @@ def database():
     yield database
 
     # Cleanup code
-    database.connection.close()
+    database.close_connection()
 
 
 @pytest.fixture()
@@ -54,7 +54,7 @@ def user_logged_in_client(client, database):
         "password": pbkdf2_sha512.hash("dummy"),
     }
 
-    database.insert("users", user)
+    database.insert("users", lookup_keys.add_keys("users", user))
 
     url = "/user/login"
     client.post(
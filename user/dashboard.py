@@ -0,0 +1,95 @@
+"""
+Admin dashboard statistics.
+
+The figures on the admin home page are counted by the database, with one
+$group aggregation per collection, instead of loading every student and
+opportunity. They are kept until the students or opportunities are written by
+any process, see core/cache_versions.py, and for at most CACHE_TIME so writes
+made outside the app are also counted.
+"""
+
+from datetime import datetime, timedelta
+import threading
+
+# How long the figures are kept before they are counted again
+CACHE_TIME = timedelta(seconds=30)
+
+# Cache to store the figures and the last update time
+dashboard_cache = {"data": None, "last_updated": None}
+cache_lock = threading.Lock()
+
+
+def count_missing(field):
+    """$sum argument counting the records where a field is missing or null."""
+    return {"$cond": [{"$eq": [{"$ifNull": [f"${field}", None]}, None]}, 1, 0]}
+
+
+STUDENTS_PIPELINE = [
+    {
+        "$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            # Students fill in their course with their details
+            "without_details": {
+                "$sum": {"$cond": [{"$in": [{"$ifNull": ["$course", ""]}, [""]]}, 1, 0]}
+            },
+            "without_preferences": {"$sum": count_missing("preferences")},
+        }
+    }
+]
+
+OPPORTUNITIES_PIPELINE = [
+    {
+        "$group": {
+            "_id": None,
+            "total": {"$sum": 1},
+            "without_preferences": {"$sum": count_missing("preferences")},
+        }
+    }
+]
+
+
+def count(database_manager, table, pipeline):
+    """Run a single $group pipeline, every count is 0 for an empty table."""
+    results = database_manager.aggregate(table, pipeline)
+    if results:
+        return results[0]
+    return {field: 0 for field in pipeline[0]["$group"] if field != "_id"}
+
+
+def get_stats():
+    """Counts of the students and opportunities shown on the dashboard.
+
+    Returns:
+        dict: "students" with the total and those without details or
+        preferences, "opportunities" with the total and those without
+        preferences
+    """
+    from app import CACHE_VERSIONS, DATABASE_MANAGER
+
+    CACHE_VERSIONS.check()
+    with cache_lock:
+        if (
+            dashboard_cache["data"]
+            and datetime.now() - dashboard_cache["last_updated"] < CACHE_TIME
+        ):
+            return dashboard_cache["data"]
+
+    stats = {
+        "students": count(DATABASE_MANAGER, "students", STUDENTS_PIPELINE),
+        "opportunities": count(
+            DATABASE_MANAGER, "opportunities", OPPORTUNITIES_PIPELINE
+        ),
+    }
+    with cache_lock:
+        dashboard_cache["data"] = stats
+        dashboard_cache["last_updated"] = datetime.now()
+    return stats
+
+
+def reset_cache(_table=None):
+    """Count the figures again on the next request, called when the students
+    or opportunities are written by any process."""
+    with cache_lock:
+        dashboard_cache["data"] = None
+        dashboard_cache["last_updated"] = None
@@ -0,0 +1,459 @@
+"""
+Matching runs.
+
+A matching run takes the students' and employers' preferences, runs the
+matching in a background worker and stores the result in the matching_runs
+collection together with a fingerprint of its input. The matching page and the
+match emails are served from the stored snapshot so the matching is only done
+again when the preferences change.
+
+What-if scenarios run the same way, in the same worker, and are stored in the
+scenario_runs collection under a fingerprint of the base snapshot and the
+scenarios.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import threading
+import time
+from pymongo.errors import DuplicateKeyError
+from algorithm import scenarios
+from algorithm.matching import Matching, MatchingStats
+from core import projections, shared
+from students.models import Student
+from .matching_snapshot import (
+    COMPLETED,
+    FAILED,
+    RUNNING,
+    build_preferences,
+    build_run_result,
+    build_scenario_snapshot,
+    get_fingerprint,
+    get_scenarios_fingerprint,
+)
+
+# A run still running after this long is assumed to have died with its worker
+RUN_TIMEOUT = timedelta(minutes=10)
+# Rows of the matches table shown per page
+MATCHES_PER_PAGE = 50
+MAX_MATCHES_PER_PAGE = 500
+
+# Single worker so runs never overlap and the last matching can be repaired
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="matching")
+run_lock = threading.Lock()
+# Last matching run, repaired by the next run instead of rerun from scratch
+matching_cache = {"matching": None}
+
+
+class MatchingRuns:
+    """Handles starting, running and loading matching runs."""
+
+    def build_preferences(self):
+        """Build the matching input from the students and opportunities.
+
+        Returns:
+            tuple: (students_preference, opportunities_preference,
+            students who could not be included with the reason why)
+        """
+        from app import DATABASE_MANAGER
+
+        return build_preferences(
+            DATABASE_MANAGER.iter_all("students", projections.MATCHING_STUDENT),
+            DATABASE_MANAGER.iter_all(
+                "opportunities", projections.MATCHING_OPPORTUNITY
+            ),
+        )
+
+    def build_residual_preferences(self, run):
+        """Build the matching input of a run's second round.
+
+        Only the students the run left unmatched are loaded, with the
+        opportunities they ranked that still have spots left, so the work
+        depends on what is left over rather than the whole cohort.
+
+        Returns:
+            tuple: (students_preference, opportunities_preference,
+            students who could not be included with the reason why)
+        """
+        from app import DATABASE_MANAGER
+
+        students = DATABASE_MANAGER.get_all_by_in_list(
+            "students",
+            "_id",
+            [student["_id"] for student in run["not_matched"]],
+            projections.MATCHING_STUDENT,
+        )
+        ranked = {
+            preference.strip()
+            for student in students
+            for preference in student.get("preferences", [])
+            if preference.strip()
+        }
+        filled = {
+            match["opportunity"]: len(match["students"]) for match in run["matches"]
+        }
+        opportunities = [
+            opportunity
+            for opportunity in DATABASE_MANAGER.get_all_by_in_list(
+                "opportunities",
+                "_id",
+                list(ranked),
+                projections.MATCHING_OPPORTUNITY,
+            )
+            if int(opportunity.get("spots_available", 0))
+            > filled.get(opportunity["_id"], 0)
+        ]
+        return build_preferences(students, opportunities)
+
+    def build_scenario_snapshot(self):
+        """Build the base snapshot for what-if scenarios from the matching input."""
+        from app import DATABASE_MANAGER
+
+        return build_scenario_snapshot(
+            DATABASE_MANAGER.iter_all("students", projections.SCENARIO_STUDENT),
+            DATABASE_MANAGER.iter_all(
+                "opportunities", projections.SCENARIO_OPPORTUNITY
+            ),
+        )
+
+    def start_run(self):
+        """Return the run for the current preferences, starting it if needed.
+
+        Runs are stored under the fingerprint of their input, so admins
+        triggering the matching at the same time all get the same run.
+        """
+        from app import DATABASE_MANAGER
+
+        start = time.perf_counter()
+        students_preference, opportunities_preference, unmatched_students = (
+            self.build_preferences()
+        )
+        load_time = time.perf_counter() - start
+        fingerprint = get_fingerprint(students_preference, opportunities_preference)
+
+        with run_lock:
+            run = DATABASE_MANAGER.get_one_by_id("matching_runs", fingerprint)
+            if run and not self.is_stale(run):
+                return run
+            if run:
+                DATABASE_MANAGER.delete_by_id("matching_runs", fingerprint)
+
+            run = {
+                "_id": fingerprint,
+                "status": RUNNING,
+                "started_at": datetime.now().isoformat(),
+            }
+            try:
+                DATABASE_MANAGER.insert("matching_runs", run)
+            except DuplicateKeyError:
+                # Another worker started the same run first
+                return DATABASE_MANAGER.get_one_by_id("matching_runs", fingerprint)
+
+        executor.submit(
+            self.execute_run,
+            fingerprint,
+            students_preference,
+            opportunities_preference,
+            unmatched_students,
+            load_time,
+        )
+        return run
+
+    def is_stale(self, run):
+        """Check if a run failed or its worker stopped before finishing."""
+        if run["status"] == FAILED:
+            return True
+        started_at = datetime.fromisoformat(run["started_at"])
+        return run["status"] == RUNNING and datetime.now() - started_at > RUN_TIMEOUT
+
+    def execute_run(
+        self,
+        run_id,
+        students_preference,
+        opportunities_preference,
+        unmatched_students,
+        load_time=None,
+    ):
+        """Run the matching and store the result on the run.
+
+        load_time is the time taken to load the preferences, added to the
+        run's stats.
+        """
+        from app import DATABASE_MANAGER
+
+        try:
+            if matching_cache["matching"] is None:
+                matching_cache["matching"] = Matching(
+                    students_preference, opportunities_preference
+                )
+            # Check the result for blocking pairs when validation mode is on
+            matching_cache["matching"].validate = (
+                shared.getenv("MATCHING_VALIDATION") == "True"
+            )
+            # Count proposals, evictions and time the phases unless turned off
+            matching_cache["matching"].stats = (
+                MatchingStats()
+                if shared.getenv("MATCHING_STATS", "True") == "True"
+                else None
+            )
+            changes = matching_cache["matching"].update(
+                students_preference, opportunities_preference
+            )
+            result = build_run_result(
+                matching_cache["matching"],
+                changes,
+                unmatched_students,
+                Student().get_students_map(projections.MATCHING_STUDENT),
+                load_time,
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            matching_cache["matching"] = None
+            DATABASE_MANAGER.update_one_by_id(
+                "matching_runs",
+                run_id,
+                {
+                    "status": FAILED,
+                    "error": str(e),
+                    "finished_at": datetime.now().isoformat(),
+                },
+            )
+            return
+
+        DATABASE_MANAGER.update_one_by_id("matching_runs", run_id, result)
+
+    def start_scenarios(self, scenario_list):
+        """Return the scenario run for the current preferences, starting it if
+        needed.
+
+        Raises:
+            ValueError: If a scenario or perturbation is malformed.
+        """
+        from app import DATABASE_MANAGER
+
+        snapshot = self.build_scenario_snapshot()
+        scenarios.validate_scenarios(snapshot, scenario_list)
+        fingerprint = get_scenarios_fingerprint(snapshot, scenario_list)
+
+        with run_lock:
+            run = DATABASE_MANAGER.get_one_by_id("scenario_runs", fingerprint)
+            if run and not self.is_stale(run):
+                return run
+            if run:
+                DATABASE_MANAGER.delete_by_id("scenario_runs", fingerprint)
+
+            run = {
+                "_id": fingerprint,
+                "status": RUNNING,
+                "started_at": datetime.now().isoformat(),
+            }
+            try:
+                DATABASE_MANAGER.insert("scenario_runs", run)
+            except DuplicateKeyError:
+                # Another worker started the same run first
+                return DATABASE_MANAGER.get_one_by_id("scenario_runs", fingerprint)
+
+        executor.submit(self.execute_scenarios, fingerprint, snapshot, scenario_list)
+        return run
+
+    def execute_scenarios(self, run_id, snapshot, scenario_list):
+        """Run the scenarios and store their results on the run."""
+        from app import DATABASE_MANAGER
+
+        max_workers = shared.getenv("SCENARIO_WORKERS")
+        try:
+            results = scenarios.run_scenarios(
+                snapshot,
+                scenario_list,
+                max_workers=int(max_workers) if max_workers else None,
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            DATABASE_MANAGER.update_one_by_id(
+                "scenario_runs",
+                run_id,
+                {
+                    "status": FAILED,
+                    "error": str(e),
+                    "finished_at": datetime.now().isoformat(),
+                },
+            )
+            return
+
+        DATABASE_MANAGER.update_one_by_id(
+            "scenario_runs",
+            run_id,
+            {
+                "status": COMPLETED,
+                "finished_at": datetime.now().isoformat(),
+                "results": results,
+            },
+        )
+
+    def get_scenario_run(self, run_id):
+        """Get a scenario run by its id."""
+        from app import DATABASE_MANAGER
+
+        return DATABASE_MANAGER.get_one_by_id("scenario_runs", run_id)
+
+    def run_residual(self, run):
+        """Match the students left unmatched by a run to its leftover positions.
+
+        The run's matches are kept as they are and the students' and
+        employers' current preferences are used for the second round.
+        """
+        from app import DATABASE_MANAGER
+
+        students_preference, opportunities_preference, _ = (
+            self.build_residual_preferences(run)
+        )
+        first_round = (
+            [student["_id"] for student in run["not_matched"]],
+            {match["opportunity"]: match["students"] for match in run["matches"]},
+        )
+        not_matched, matches = Matching.residual(
+            first_round, students_preference, opportunities_preference
+        ).find_best_match()
+
+        not_matched = set(not_matched) | {
+            student for student in first_round[0] if student not in students_preference
+        }
+        residual = {
+            "finished_at": datetime.now().isoformat(),
+            "matches": [
+                {"opportunity": opportunity, "students": students}
+                for opportunity, students in matches.items()
+            ],
+            "not_matched": [
+                student
+                for student in run["not_matched"]
+                if student["_id"] in not_matched
+            ],
+        }
+        DATABASE_MANAGER.update_one_by_id(
+            "matching_runs", run["_id"], {"residual": residual}
+        )
+        return residual
+
+    def build_rows(self, pairs):
+        """Build the rows of a matches table with only the displayed fields.
+
+        The students, opportunities and employers of the rows are loaded by id
+        in one query each instead of loading every document.
+        """
+        from app import DATABASE_MANAGER
+
+        students = {
+            student["_id"]: student
+            for student in DATABASE_MANAGER.get_all_by_in_list(
+                "students",
+                "_id",
+                list({pair["student"] for pair in pairs}),
+                projections.STUDENT_NAME,
+            )
+        }
+        opportunities = {
+            opportunity["_id"]: opportunity
+            for opportunity in DATABASE_MANAGER.get_all_by_in_list(
+                "opportunities",
+                "_id",
+                list({pair["opportunity"] for pair in pairs}),
+                projections.OPPORTUNITY_TITLE,
+            )
+        }
+        employer_ids = {
+            opportunity.get("employer_id") for opportunity in opportunities.values()
+        }
+        employers = {
+            employer["_id"]: employer
+            for employer in DATABASE_MANAGER.get_all_by_in_list(
+                "employers", "_id", list(employer_ids), projections.EMPLOYER_NAME
+            )
+        }
+
+        rows = []
+        for pair in pairs:
+            opportunity = opportunities.get(pair["opportunity"], {})
+            employer = employers.get(opportunity.get("employer_id"), {})
+            student = students.get(pair["student"], {})
+            rows.append(
+                {
+                    "opportunity": pair["opportunity"],
+                    "title": opportunity.get("title", ""),
+                    "company_name": employer.get("company_name", ""),
+                    "student": pair["student"],
+                    "name": f"{student.get('first_name', '')} {student.get('last_name', '')}",
+                }
+            )
+        return rows
+
+    def build_view(self, run, page=1, per_page=MATCHES_PER_PAGE):
+        """Build one page of a completed run for the matching page."""
+        pairs = [
+            {"student": student, "opportunity": match["opportunity"]}
+            for match in run["matches"]
+            for student in match["students"]
+        ]
+        per_page = max(1, min(per_page, MAX_MATCHES_PER_PAGE))
+        pages = max(1, -(-len(pairs) // per_page))
+        page = max(1, min(page, pages))
+        start = (page - 1) * per_page
+
+        residual = run.get("residual")
+        residual_pairs = (
+            [
+                {"student": student, "opportunity": match["opportunity"]}
+                for match in residual["matches"]
+                for student in match["students"]
+            ]
+            if residual
+            else []
+        )
+        return {
+            "stats": self.build_stats(run),
+            "rows": self.build_rows(pairs[start : start + per_page]),
+            "residual_rows": self.build_rows(residual_pairs),
+            "not_matched": (residual or run)["not_matched"],
+            "page": page,
+            "pages": pages,
+            "per_page": per_page,
+            "total": len(pairs),
+        }
+
+    def build_stats(self, run):
+        """Add the opportunity titles to a run's most contended opportunities."""
+        from app import DATABASE_MANAGER
+
+        stats = run.get("stats")
+        if not stats:
+            return None
+        titles = {
+            opportunity["_id"]: opportunity.get("title", "")
+            for opportunity in DATABASE_MANAGER.get_all_by_in_list(
+                "opportunities",
+                "_id",
+                [item["placement"] for item in stats["contention"]],
+                projections.OPPORTUNITY_TITLE,
+            )
+        }
+        return dict(
+            stats,
+            contention=[
+                dict(item, title=titles.get(item["placement"], ""))
+                for item in stats["contention"]
+            ],
+        )
+
+    def get_run(self, run_id):
+        """Get a matching run by its id."""
+        from app import DATABASE_MANAGER
+
+        return DATABASE_MANAGER.get_one_by_id("matching_runs", run_id)
+
+    def get_match_pairs(self, run):
+        """Get every (student, opportunity) match of a completed run,
+        including the matches of its second round."""
+        matches = run.get("matches", []) + run.get("residual", {}).get("matches", [])
+        return [
+            {"student": student, "opportunity": match["opportunity"]}
+            for match in matches
+            for student in match["students"]
+        ]
@@ -0,0 +1,369 @@
+"""
+Matching snapshots.
+
+A snapshot holds only the fields of the students and opportunities the
+matching needs, written to a gzip compressed JSON file. The matching can then
+be run from the snapshot outside the Flask app, on another core or machine,
+and its result written back as a stored matching run that the matching page
+serves like any other run. Running the same snapshot again gives the same
+result.
+
+The matching runs in the web app build their input and result with the same
+functions, so a run stored from a snapshot is identical to one run by the app.
+
+Run from the project root:
+    python -m user.matching_snapshot export snapshot.json.gz
+    python -m user.matching_snapshot run snapshot.json.gz
+    python -m user.matching_snapshot run snapshot.json.gz --no-store --output run.json
+"""
+
+import argparse
+from datetime import datetime
+import gzip
+import hashlib
+import json
+import sys
+import time
+from algorithm.matching import Matching, MatchingStats
+from core import projections, shared
+
+SNAPSHOT_VERSION = 1
+
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Blocking pairs kept on a run when validation finds the matching unstable
+MAX_REPORTED_PAIRS = 50
+# Most contended opportunities kept in a run's stats
+MAX_REPORTED_PLACEMENTS = 10
+
+
+def get_fingerprint(students_preference, opportunities_preference):
+    """Hash the matching input so identical input reuses the stored run."""
+    data = json.dumps(
+        {"students": students_preference, "opportunities": opportunities_preference},
+        sort_keys=True,
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def get_scenarios_fingerprint(snapshot, scenarios):
+    """Hash a scenario snapshot and its scenarios so identical runs are reused."""
+    data = json.dumps({"snapshot": snapshot, "scenarios": scenarios}, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def unmatched_entry(student, reason):
+    """Entry of a student in a run's not matched list."""
+    return {
+        "_id": student["_id"],
+        "student_id": student["student_id"],
+        "email": student["email"],
+        "name": f"{student['first_name']} {student['last_name']}",
+        "reason": reason,
+    }
+
+
+def build_preferences(students, opportunities):
+    """Build the matching input from the students and opportunities.
+
+    Returns:
+        tuple: (students_preference, opportunities_preference,
+        students who could not be included with the reason why)
+    """
+    opportunities_preference = {}
+    for opportunity in opportunities:
+        if "preferences" in opportunity:
+            temp = {}
+            temp["positions"] = opportunity["spots_available"]
+            for i, student in enumerate(opportunity["preferences"]):
+                temp[student] = i + 1
+            opportunities_preference[opportunity["_id"]] = temp
+
+    unmatched_students = []
+    students_preference = {}
+    for student in students:
+        if "preferences" in student:
+            filtered_preferences = [
+                pref.strip()
+                for pref in student["preferences"]
+                if pref.strip() and pref.strip() in opportunities_preference
+            ]
+            if filtered_preferences:
+                students_preference[student["_id"]] = filtered_preferences
+                continue
+        unmatched_students.append(
+            unmatched_entry(
+                student,
+                "Student has not ranked their opportunities or has invalid preferences",
+            )
+        )
+    return students_preference, opportunities_preference, unmatched_students
+
+
+def build_scenario_snapshot(students, opportunities):
+    """Build the base snapshot of what-if scenarios, see algorithm/scenarios.py.
+
+    The preferences and capacities are the matching input of
+    `build_preferences`, so the base scenario matches like a matching run.
+    Students it leaves out are kept without preferences so they count as
+    unmatched. The required modules and the students' modules are added for
+    scenarios that change them.
+    """
+    students = list(students)
+    opportunities = list(opportunities)
+    students_preference, opportunities_preference, _ = build_preferences(
+        students, opportunities
+    )
+
+    modules_required = {
+        opportunity["_id"]: [
+            module for module in opportunity.get("modules_required", []) if module
+        ]
+        for opportunity in opportunities
+    }
+    snapshot_opportunities = {}
+    for opportunity, ranking in opportunities_preference.items():
+        ranked = [student for student in ranking if student != "positions"]
+        snapshot_opportunities[opportunity] = {
+            "positions": int(ranking["positions"]),
+            "ranking": sorted(ranked, key=ranking.get),
+            "modules_required": modules_required[opportunity],
+        }
+
+    snapshot_students = {
+        student["_id"]: {
+            "preferences": students_preference.get(student["_id"], []),
+            "modules": list(student.get("modules", [])),
+        }
+        for student in students
+    }
+    return {"students": snapshot_students, "opportunities": snapshot_opportunities}
+
+
+def build_run_result(
+    matching, changes, unmatched_students, students_map, load_time=None
+):
+    """Build the stored result of a completed matching run.
+
+    Args:
+        matching: Matching that has been run
+        changes: (students, placements) whose matches changed in the run
+        unmatched_students: Students left out of the matching input
+        students_map: Students by id, used to list the unmatched students
+        load_time: Time taken to load the preferences, added to the stats
+    """
+    not_matched, matches = matching.get_matches()
+    unmatched_students = list(unmatched_students)
+    for student_id in not_matched:
+        student = students_map.get(student_id)
+        if student is not None:
+            unmatched_students.append(
+                unmatched_entry(student, "Student was not matched")
+            )
+
+    result = {
+        "status": COMPLETED,
+        "finished_at": datetime.now().isoformat(),
+        "matches": [
+            {"opportunity": opportunity, "students": students}
+            for opportunity, students in matches.items()
+        ],
+        "not_matched": unmatched_students,
+        "changed_students": len(changes[0]),
+        "changed_placements": len(changes[1]),
+    }
+    validation = matching.validation
+    if validation is not None:
+        result["validation"] = {
+            "stable": validation["stable"],
+            "blocking_pairs": len(validation["blocking_pairs"]),
+            "blocking_pairs_sample": [
+                {"student": student, "opportunity": opportunity}
+                for student, opportunity in validation["blocking_pairs"][
+                    :MAX_REPORTED_PAIRS
+                ]
+            ],
+            "over_capacity": validation["over_capacity"],
+            "invalid_matches": len(validation["invalid_matches"]),
+            "duplicate_students": validation["duplicate_students"],
+        }
+    if matching.stats is not None:
+        result["stats"] = matching.stats.to_dict(top=MAX_REPORTED_PLACEMENTS)
+        if load_time is not None:
+            result["stats"]["phases"]["load_preferences"] = load_time
+            result["stats"]["total_time"] += load_time
+    return result
+
+
+def connect(database_name=None):
+    """Connect to the database the app would use."""
+    from core.database_backends import create_database_manager
+
+    if database_name is None:
+        if shared.getenv("IS_TEST") == "True":
+            database_name = shared.getenv("MONGO_DB_TEST", "")
+        else:
+            database_name = shared.getenv("MONGO_DB_PROD", "")
+    return create_database_manager(shared.getenv("MONGO_URI"), database_name)
+
+
+def write_documents(file, documents):
+    """Write documents to a file as a JSON list, one at a time.
+
+    Returns:
+        int: The number of documents written
+    """
+    file.write("[")
+    count = 0
+    for document in documents:
+        if count:
+            file.write(", ")
+        json.dump(document, file)
+        count += 1
+    file.write("]")
+    return count
+
+
+def export_snapshot(database, path):
+    """Write the students and opportunities the matching needs to a snapshot.
+
+    The documents are streamed from the database to the file, so the export
+    does not hold the cohort in memory.
+
+    Returns:
+        dict: The number of students and opportunities written
+    """
+    counts = {}
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        file.write(
+            f'{{"version": {SNAPSHOT_VERSION}, '
+            f'"created_at": {json.dumps(datetime.now().isoformat())}'
+        )
+        for table, projection in (
+            ("students", projections.MATCHING_STUDENT),
+            ("opportunities", projections.MATCHING_OPPORTUNITY),
+        ):
+            file.write(f', "{table}": ')
+            counts[table] = write_documents(file, database.iter_all(table, projection))
+        file.write("}")
+    return counts
+
+
+def load_snapshot(path):
+    """Read a snapshot written by `export_snapshot`.
+
+    Raises:
+        ValueError: If the file is not a snapshot of a supported version.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        snapshot = json.load(file)
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version in {path}")
+    return snapshot
+
+
+def run_snapshot(snapshot, validate=False):
+    """Run the matching on a snapshot.
+
+    Returns:
+        dict: A completed matching run, stored under the fingerprint of the
+        snapshot's matching input like the runs started by the app
+    """
+    started_at = datetime.now().isoformat()
+    start = time.perf_counter()
+    students_preference, opportunities_preference, unmatched_students = (
+        build_preferences(snapshot["students"], snapshot["opportunities"])
+    )
+    load_time = time.perf_counter() - start
+
+    matching = Matching(students_preference, opportunities_preference, validate)
+    matching.stats = MatchingStats()
+    changes = matching.update(students_preference, opportunities_preference)
+
+    run = {
+        "_id": get_fingerprint(students_preference, opportunities_preference),
+        "started_at": started_at,
+        "snapshot_created_at": snapshot["created_at"],
+    }
+    run.update(
+        build_run_result(
+            matching,
+            changes,
+            unmatched_students,
+            {student["_id"]: student for student in snapshot["students"]},
+            load_time,
+        )
+    )
+    return run
+
+
+def store_run(database, run):
+    """Store a run, replacing any run with the same fingerprint."""
+    database.delete_by_id("matching_runs", run["_id"])
+    database.insert("matching_runs", run)
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Run the matching offline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser(
+        "export", help="export the matching input to a snapshot"
+    )
+    export_parser.add_argument("path")
+    export_parser.add_argument("--database", help="database to export from")
+
+    run_parser = subparsers.add_parser("run", help="run the matching on a snapshot")
+    run_parser.add_argument("path")
+    run_parser.add_argument("--database", help="database to store the run in")
+    run_parser.add_argument(
+        "--no-store", action="store_true", help="do not store the run in the database"
+    )
+    run_parser.add_argument("--output", help="also write the run to this JSON file")
+    run_parser.add_argument(
+        "--validate", action="store_true", help="check the matching for blocking pairs"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        database = connect(args.database)
+        counts = export_snapshot(database, args.path)
+        database.close_connection()
+        print(
+            f"Exported {counts['students']} students and "
+            f"{counts['opportunities']} opportunities to {args.path}"
+        )
+        return 0
+
+    try:
+        snapshot = load_snapshot(args.path)
+    except (OSError, ValueError) as e:
+        print(f"Could not load snapshot: {e}")
+        return 1
+    run = run_snapshot(snapshot, args.validate)
+    matched = sum(len(match["students"]) for match in run["matches"])
+    print(
+        f"Run {run['_id']}: {matched} matched, {len(run['not_matched'])} not matched "
+        f"in {run['stats']['total_time']:.3f}s"
+    )
+    failed = "validation" in run and not run["validation"]["stable"]
+    if failed:
+        print("  UNSTABLE matching")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(run, file, indent=2)
+        print(f"Run written to {args.output}")
+    if not args.no_store:
+        database = connect(args.database)
+        store_run(database, run)
+        database.close_connection()
+        print("Run stored in matching_runs")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
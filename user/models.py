@@ -9,10 +9,20 @@ from io import BytesIO
 from flask import jsonify, session
 import pandas as pd
 from passlib.hash import pbkdf2_sha512
-from core import email_handler, handlers, shared
+from pymongo.errors import DuplicateKeyError
+from core import email_handler, handlers, lookup_keys, projections, shared
 from employers.models import Employers
 from opportunities.models import Opportunity
 from students.models import Student
+from . import dashboard
+
+
+def is_superuser_email(email):
+    """Check if an email is the superuser's, ignoring case and whitespace."""
+    superuser_email = shared.getenv("SUPERUSER_EMAIL")
+    if superuser_email is None:
+        return False
+    return lookup_keys.normalise(email) == lookup_keys.normalise(superuser_email)
 
 
 class User:
@@ -36,13 +46,17 @@ class User:
             return jsonify({"error": "Missing email or password"}), 400
         if "name" not in user:
             return jsonify({"error": "Missing name"}), 400
-        if DATABASE_MANAGER.get_by_email("users", user["email"]):
+        if lookup_keys.find_by_key(DATABASE_MANAGER, "users", "email", user["email"]):
             return jsonify({"error": "Email address already in use"}), 400
-        if user["email"] == shared.getenv("SUPERUSER_EMAIL"):
+        if is_superuser_email(user["email"]):
             return jsonify({"error": "Email address already in use"}), 400
 
-        # Insert the user into the database
-        DATABASE_MANAGER.insert("users", user)
+        # Insert the user into the database, the unique email_key index
+        # rejects a concurrent registration of the same email
+        try:
+            DATABASE_MANAGER.insert("users", lookup_keys.add_keys("users", user))
+        except DuplicateKeyError:
+            return jsonify({"error": "Email address already in use"}), 400
 
         return jsonify({"message": "User registered successfully"}), 201
 
@@ -53,7 +67,9 @@ class User:
 
         handlers.clear_session_save_theme()
 
-        user = DATABASE_MANAGER.get_by_email("users", attempt_user["email"])
+        user = lookup_keys.find_by_key(
+            DATABASE_MANAGER, "users", "email", attempt_user["email"]
+        )
 
         if user and pbkdf2_sha512.verify(attempt_user["password"], user["password"]):
             return self.start_session(user)
@@ -146,14 +162,17 @@ class User:
     def send_all_match_email(self, student_map_to_placments):
         """Send match email to all students and employers."""
         employer_emails: dict[str, list] = dict()
-        students_map = Student().get_students_map()
+        students_map = Student().get_students_map(projections.STUDENT_NAME)
 
         opportunity_map = {
             opportunity["_id"]: opportunity
-            for opportunity in Opportunity().get_opportunities()
+            for opportunity in Opportunity().get_opportunities(
+                projections.OPPORTUNITY_TITLE
+            )
         }
         employer_map = {
-            employer["_id"]: employer for employer in Employers().get_employers()
+            employer["_id"]: employer
+            for employer in Employers().get_employers(projections.EMPLOYER_NAME)
         }
 
         for row, map_item in enumerate(student_map_to_placments["students"]):
@@ -333,78 +352,59 @@ class User:
         """Retrieves all users without passwords."""
         from app import DATABASE_MANAGER
 
-        users = DATABASE_MANAGER.get_all("users")
-        for user in users:
-            del user["password"]
-        return users
+        return DATABASE_MANAGER.get_all("users", projections.USER_WITHOUT_PASSWORD)
 
     def update_user(self, user_uuid, name, email):
         """Updates a user's name and email by their UUID."""
         from app import DATABASE_MANAGER
 
         original = DATABASE_MANAGER.get_one_by_id("users", user_uuid)
-        find_email = DATABASE_MANAGER.get_by_email("users", email)
+        find_email = lookup_keys.find_by_key(DATABASE_MANAGER, "users", "email", email)
         if find_email and find_email["_id"] != user_uuid:
             return jsonify({"error": "Email address already in use"}), 400
         if not original:
             return jsonify({"error": "User not found"}), 404
-        if email == shared.getenv("SUPERUSER_EMAIL"):
+        if is_superuser_email(email):
             return jsonify({"error": "Email address already in use"}), 400
 
         update_data = {"name": name, "email": email}
-        DATABASE_MANAGER.update_one_by_id("users", user_uuid, update_data)
+        try:
+            DATABASE_MANAGER.update_one_by_id(
+                "users", user_uuid, lookup_keys.add_keys("users", update_data)
+            )
+        except DuplicateKeyError:
+            return jsonify({"error": "Email address already in use"}), 400
         return jsonify({"message": "User updated successfully"}), 200
 
     def get_nearest_deadline_for_dashboard(self):
         """Retrieves the nearest deadline for the dashboard."""
-        from app import DEADLINE_MANAGER, DATABASE_MANAGER
-
-        students = DATABASE_MANAGER.get_all("students")
-        opportunities = DATABASE_MANAGER.get_all("opportunities")
-
-        number_of_students = 0
-        number_of_opportunities = 0
+        from app import DEADLINE_MANAGER
 
-        if not DEADLINE_MANAGER.is_past_details_deadline():
-            for student in students:
-                if student.get("course"):  # Ensure student has added details
-                    number_of_students += 1
-            number_of_students = len(students) - number_of_students
-            number_of_opportunities = len(DATABASE_MANAGER.get_all("opportunities"))
+        phase = DEADLINE_MANAGER.get_phase()
+        stats = dashboard.get_stats()
 
+        if not phase.is_past_details:
             return (
                 "Student and Employers Add Details/Opportunities Deadline",
-                DEADLINE_MANAGER.get_details_deadline(),
-                number_of_students,
-                number_of_opportunities,
+                phase.details_deadline.strftime("%Y-%m-%d"),
+                stats["students"]["without_details"],
+                stats["opportunities"]["total"],
             )
 
-        if not DEADLINE_MANAGER.is_past_student_ranking_deadline():
-            for student in students:
-                if student.get("preferences") is not None:
-                    number_of_students += 1
-
-            number_of_students = len(students) - number_of_students
-
+        if not phase.is_past_student_ranking:
             return (
                 "Students Ranking Opportunities Deadline",
-                DEADLINE_MANAGER.get_student_ranking_deadline(),
-                number_of_students,
+                phase.student_ranking_deadline.strftime("%Y-%m-%d"),
+                stats["students"]["without_preferences"],
                 None,
             )
 
-        if not DEADLINE_MANAGER.is_past_opportunities_ranking_deadline():
-            for opportunity in opportunities:
-                if opportunity.get("preferences") is not None:
-                    number_of_opportunities += 1
-
-            number_of_opportunities = len(opportunities) - number_of_opportunities
-
+        if not phase.is_past_opportunities_ranking:
             return (
                 "Employers Ranking Students Deadline",
-                DEADLINE_MANAGER.get_opportunities_ranking_deadline(),
+                phase.opportunities_ranking_deadline.strftime("%Y-%m-%d"),
                 None,
-                number_of_opportunities,
+                stats["opportunities"]["without_preferences"],
             )
 
         # 4️ No upcoming deadlines
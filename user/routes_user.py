@@ -7,12 +7,12 @@ from html import escape
 import uuid
 from flask import jsonify, redirect, render_template, session, request
 from passlib.hash import pbkdf2_sha512
-from algorithm.matching import Matching
-from core import handlers, shared
+from core import handlers, projections, shared
 from employers.models import Employers
 from opportunities.models import Opportunity
 from students.models import Student
 from superuser.model import Superuser
+from .matching_runs import COMPLETED, MATCHES_PER_PAGE, MatchingRuns
 from .models import User
 
 
@@ -131,7 +131,7 @@ def add_user_routes(app, cache):
         problems = []
         from app import DEADLINE_MANAGER
 
-        students = Student().get_students()
+        students = Student().get_students(projections.STUDENT_PROGRESS)
         passed_details_deadline = DEADLINE_MANAGER.is_past_details_deadline()
         passed_student_ranking_deadline = (
             DEADLINE_MANAGER.is_past_student_ranking_deadline()
@@ -171,7 +171,9 @@ def add_user_routes(app, cache):
                     }
                 )
 
-        opportunities = Opportunity().get_opportunities()
+        opportunities = Opportunity().get_opportunities(
+            projections.OPPORTUNITY_PROGRESS
+        )
 
         for opportunity in opportunities:
             if "preferences" not in opportunity:
@@ -218,6 +220,14 @@ def add_user_routes(app, cache):
             )
         student_uuid = request.form.get("student")
         opportunity_uuid = request.form.get("opportunity")
+        run = MatchingRuns().get_run(request.form.get("run"))
+        if not run or run["status"] != COMPLETED:
+            return jsonify({"error": "Matching run not found"}), 404
+        if {
+            "student": student_uuid,
+            "opportunity": opportunity_uuid,
+        } not in MatchingRuns().get_match_pairs(run):
+            return jsonify({"error": "Student was not matched to opportunity"}), 400
         return User().send_match_email(student_uuid, opportunity_uuid)
 
     @app.route("/user/send_all_emails", methods=["POST"])
@@ -233,12 +243,17 @@ def add_user_routes(app, cache):
                 ),
                 400,
             )
-        student_map_to_placements = request.get_json()
-        if not student_map_to_placements:
+        data = request.get_json(silent=True)
+        if not data:
             return jsonify({"error": "No data provided"}), 400
-        if not isinstance(student_map_to_placements, dict):
+        if not isinstance(data, dict):
             return jsonify({"error": "Invalid data format"}), 400
-        return User().send_all_match_email(student_map_to_placements)
+        run = MatchingRuns().get_run(data.get("run"))
+        if not run or run["status"] != COMPLETED:
+            return jsonify({"error": "Matching run not found"}), 404
+        return User().send_all_match_email(
+            {"students": MatchingRuns().get_match_pairs(run)}
+        )
 
     @app.route("/user/matching", methods=["GET"])
     @handlers.login_required
@@ -258,78 +273,118 @@ def add_user_routes(app, cache):
                 page="matching",
             )
 
-        opportunities = Opportunity().get_opportunities()
-        opportunities_preference = {}
-        used_opportunities = set()
-        for opportunity in opportunities:
-            if "preferences" in opportunity:
-                temp = {}
-                temp["positions"] = opportunity["spots_available"]
-                for i, student in enumerate(opportunity["preferences"]):
-                    temp[student] = i + 1
-                opportunities_preference[opportunity["_id"]] = temp
-                used_opportunities.add(opportunity["_id"])
-                continue
-
-        students = Student().get_students()
-        unmatched_students = []
-        students_preference = {}
-        for student in students:
-            if "preferences" in student:
-                filtered_preferences = [
-                    pref.strip()
-                    for pref in student["preferences"]
-                    if pref.strip() and pref.strip() in used_opportunities
-                ]
-                if filtered_preferences:
-                    students_preference[student["_id"]] = filtered_preferences
-                    continue
-            # Handle unmatched students
-            unmatched_students.append(
-                {
-                    "_id": student["_id"],
-                    "student_id": student["student_id"],
-                    "email": student["email"],
-                    "name": f"{student['first_name']} {student['last_name']}",
-                    "reason": "Student has not ranked their opportunities or has invalid preferences",
-                }
+        run_id = request.args.get("run")
+        run = MatchingRuns().get_run(run_id) if run_id else None
+        if run is None:
+            run = MatchingRuns().start_run()
+        if run["status"] != COMPLETED:
+            return render_template(
+                "user/matching.html",
+                run=run,
+                user_type="admin",
+                user=session["user"].get("name"),
+                page="matching",
             )
 
-        result = Matching(
-            students_preference, opportunities_preference
-        ).find_best_match()
-        matches_list = [
-            {"opportunity": opportunity, "students": students}
-            for opportunity, students in result[1].items()
-        ]
-        for student_id in result[0]:
-            student = next((s for s in students if s["_id"] == student_id), None)
-            if student is None:
-                continue
-            temp = {}
-            temp["_id"] = student_id
-            temp["student_id"] = student["student_id"]
-            temp["email"] = student["email"]
-            temp["name"] = f"{student['first_name']} {student['last_name']}"
-            temp["reason"] = "Student was not matched"
-            unmatched_students.append(temp)
-
+        page = request.args.get("page", "1")
+        per_page = request.args.get("per_page", "")
         return render_template(
             "user/matching.html",
-            not_matched=unmatched_students,
-            matches=matches_list,
-            students_map={student["_id"]: student for student in students},
-            employers_map={
-                employer["_id"]: employer for employer in Employers().get_employers()
-            },
-            opportunities_map={
-                opportunity["_id"]: opportunity for opportunity in opportunities
-            },
+            run=run,
+            view=MatchingRuns().build_view(
+                run,
+                page=int(page) if page.isdigit() else 1,
+                per_page=int(per_page) if per_page.isdigit() else MATCHES_PER_PAGE,
+            ),
+            changed_students=run["changed_students"],
+            changed_placements=run["changed_placements"],
             user_type="admin",
             user=session["user"].get("name"),
             page="matching",
         )
 
+    @app.route("/user/matching/status", methods=["GET"])
+    @handlers.login_required
+    def matching_status():
+        """Get the status of a matching run."""
+        run = MatchingRuns().get_run(request.args.get("run"))
+        if not run:
+            return jsonify({"error": "Matching run not found"}), 404
+        return jsonify({"status": run["status"], "error": run.get("error")}), 200
+
+    @app.route("/user/matching/stats", methods=["GET"])
+    @handlers.login_required
+    def matching_stats():
+        """Export the stats of a completed matching run."""
+        run = MatchingRuns().get_run(request.args.get("run"))
+        if not run or run["status"] != COMPLETED:
+            return jsonify({"error": "Matching run not found"}), 404
+        if "stats" not in run:
+            return jsonify({"error": "No stats were collected for this run"}), 404
+        return jsonify(run["stats"]), 200
+
+    @app.route("/user/matching/residual", methods=["POST"])
+    @handlers.login_required
+    def matching_residual():
+        """Run a second round for the students a matching run left unmatched."""
+        from app import DEADLINE_MANAGER
+
+        if not DEADLINE_MANAGER.is_past_opportunities_ranking_deadline():
+            return (
+                jsonify(
+                    {"error": "The final deadline must have passed to do matching"}
+                ),
+                400,
+            )
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid data format"}), 400
+        run = MatchingRuns().get_run(data.get("run"))
+        if not run or run["status"] != COMPLETED:
+            return jsonify({"error": "Matching run not found"}), 404
+        residual = MatchingRuns().run_residual(run)
+        matched = sum(len(match["students"]) for match in residual["matches"])
+        return (
+            jsonify({"message": f"{matched} student(s) matched in the second round"}),
+            200,
+        )
+
+    @app.route("/user/matching/scenarios", methods=["POST"])
+    @handlers.login_required
+    def matching_scenarios():
+        """Start comparing what-if scenarios against the current preferences."""
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get("scenarios"), list):
+            return jsonify({"error": "Invalid data format"}), 400
+        try:
+            run = MatchingRuns().start_scenarios(data["scenarios"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return scenario_run_response(run)
+
+    @app.route("/user/matching/scenarios", methods=["GET"])
+    @handlers.login_required
+    def matching_scenarios_status():
+        """Get the status, and once completed the results, of a scenario run."""
+        run = MatchingRuns().get_scenario_run(request.args.get("run"))
+        if not run:
+            return jsonify({"error": "Scenario run not found"}), 404
+        return scenario_run_response(run)
+
+    def scenario_run_response(run):
+        """Respond with a scenario run, 202 until it has completed."""
+        return (
+            jsonify(
+                {
+                    "run": run["_id"],
+                    "status": run["status"],
+                    "error": run.get("error"),
+                    "results": run.get("results"),
+                }
+            ),
+            200 if run["status"] == COMPLETED else 202,
+        )
+
     @app.route("/user/home")
     @handlers.login_required
     def user_home():